@@ -1,13 +1,17 @@
 import threading
-import time
 from utils.brick import (
     TouchSensor,
     EV3UltrasonicSensor,
     EV3ColorSensor,
     Motor,
     wait_ready_sensors,
+    read_sensors,
     reset_brick,
 )
+from utils.control import ControlLoop, EmergencyStop
+from utils.estimators import WallEstimator
+from utils.motion import DifferentialDrive
+from utils.odometry import Odometer
 from utils.sound import Sound
 from math import *
 
@@ -17,6 +21,7 @@ fires_extinguished = 0
 siren_stop = False
 in_room = False
 fire_detected = False
+angle = 0  # latest target of the colour sensor sweep, in degrees
 
 
 # Sensors & Motors (Check ports)
@@ -34,10 +39,39 @@ siren_sound = Sound(duration=0.5, pitch="C4", volume=100)
 # Constants for movement
 WHEEL_SEPARATION_CM = 15 
 WHEEL_DIAMETER_CM = 4.2
+TURN_SPEED = 525      # wheel deg/s, about the speed of the previous 50% power turns
+ROTATE_SPEED = 315    # wheel deg/s, about the speed of the previous 30% power rotations
+
+# Stops every motor within EmergencyStop.LATENCY_TARGET of a press, and interrupts ESTOP.sleep()
+ESTOP = EmergencyStop(EMERGENCY_STOP)
+
+DRIVE = DifferentialDrive(LEFT_MOTOR, RIGHT_MOTOR, WHEEL_SEPARATION_CM, WHEEL_DIAMETER_CM,
+                          stop_event=ESTOP.event)
+ODOMETER = Odometer(LEFT_MOTOR, RIGHT_MOTOR, WHEEL_SEPARATION_CM, WHEEL_DIAMETER_CM)
+# Filtered wall distances for the corrections; spikes are ignored and the odometry fills the gaps
+WALL = WallEstimator(ODOMETER)
+
+# Control loop rates (ticks per second)
+CONTROL = ControlLoop()
+CORRECTION_HZ = 20        # wall following; previously ran as fast as the sensors allowed
+SENSOR_ROTATION_HZ = 50   # previously a 0.02 s sleep
+FIRE_DETECTION_HZ = 10    # previously a 0.1 s sleep
+SIREN_HZ = 2              # one 0.5 s note per tick, previously a 0.5 s sleep
+SWEEP_ANGLES = list(range(0, 162, 10)) + list(range(160, -1, -10))
+SWEEP_SPEED = 25
 
 
 # Helper Functions
 
+def read_wall_distances():
+    """Read both ultrasonic sensors into WALL, and return its (front, left) distances,
+    or the raw readings until it has an estimate."""
+    readings = read_sensors(ULTRASONIC_SENSOR, ULTRASONIC_SENSOR_LEFT)
+    WALL.append(readings)
+    front_distance, distance_left = WALL.get_front_distance(), WALL.get_value()
+    return (readings[0] if front_distance is None else front_distance,
+            readings[1] if distance_left is None else distance_left)
+
 def drive_forward_with_correction(power=-20, Ldist=None, duration=0.1, Fdist=None, tolerance=0.3, correction_offset=5):
     if stop_signal:
         return
@@ -49,16 +83,18 @@ def drive_forward_with_correction(power=-20, Ldist=None, duration=0.1, Fdist=Non
         Fdist = ULTRASONIC_SENSOR_LEFT.get_cm()
 
     print(f"[DEBUG] Starting drive_forward_with_correction: Target Fdist = {Fdist} cm, Ldist = {Ldist} cm")
+    WALL.reset()
 
-    while not stop_signal:
-        
-        front_distance = ULTRASONIC_SENSOR.get_cm()
+    def correction_step():
+        if stop_signal:
+            return False
+
+        front_distance, distance_left = read_wall_distances()
         print(f"[DEBUG] Front sensor reading: {front_distance} cm")
         if front_distance is not None and front_distance <= Fdist:
             print(f"[DEBUG] Target front distance reached: {front_distance} cm")
-            break
+            return True
 
-        distance_left = ULTRASONIC_SENSOR_LEFT.get_cm()
         print(f"[DEBUG] Left sensor reading: {distance_left} cm")
 
         if distance_left > Ldist + tolerance:
@@ -76,10 +112,12 @@ def drive_forward_with_correction(power=-20, Ldist=None, duration=0.1, Fdist=Non
 
         print(f"[DEBUG] Correction applied: {correction} (Left sensor reading: {distance_left} cm)")
 
-    time.sleep(duration)
+    CONTROL.run("drive_forward_with_correction", correction_step, CORRECTION_HZ)
+
+    ESTOP.sleep(duration)
     LEFT_MOTOR.set_power(0)
     RIGHT_MOTOR.set_power(0)
-    time.sleep(duration)
+    ESTOP.sleep(duration)
 
 def drive_forward_with_correction_room(power=-6, duration=0.1, Ldist=None, Fdist=None, tolerance=0.3, correction_offset=2):
     global fires_extinguished
@@ -94,122 +132,114 @@ def drive_forward_with_correction_room(power=-6, duration=0.1, Ldist=None, Fdist
         Fdist = ULTRASONIC_SENSOR_LEFT.get_cm()
 
     print(f"[DEBUG] Starting drive_forward_with_correction_incremental: Target Fdist = {Fdist} cm, Ldist = {Ldist} cm")
-    stop = False
-    
-    while not stop_signal and not stop:
-        while not stop_signal and not fire_detected:
-            
-            if fires_extinguished >= 2:
-                power = -15
-                correction_offset = 5    
-
-            front_distance = ULTRASONIC_SENSOR.get_cm()
-            print(f"[DEBUG] Front sensor reading: {front_distance} cm")
-            
-            # If the current front distance is less than or equal to target, stop
-            if front_distance is not None and front_distance <= Fdist:
-                print(f"[DEBUG] Target front distance reached: {front_distance} cm")
-                stop = True
-                break
-    
-            distance_left = ULTRASONIC_SENSOR_LEFT.get_cm()
-            print(f"[DEBUG] Left sensor reading: {distance_left} cm")
-            
-            # Apply correction based on left sensor reading relative to Ldist
-            if distance_left > Ldist + tolerance:
-                LEFT_MOTOR.set_power(power)
-                RIGHT_MOTOR.set_power(power - correction_offset)
-                correction = "left"
-            elif distance_left < Ldist - tolerance:
-                LEFT_MOTOR.set_power(power - correction_offset)
-                RIGHT_MOTOR.set_power(power)
-                correction = "right"
-            else:
-                LEFT_MOTOR.set_power(power)
-                RIGHT_MOTOR.set_power(power)
-                correction = "straight"
-            
-            print(f"[DEBUG] Correction applied: {correction} (Left sensor reading: {distance_left} cm)")
-            time.sleep(duration)
-
-        time.sleep(0.1)
+    WALL.reset()
+    def correction_step():
+        nonlocal power, correction_offset
+        if stop_signal:
+            return False
+        if fire_detected:
+            # Hold while the fire is handled; detect_fires_and_respond owns the wheels
+            return None
+
+        if fires_extinguished >= 2:
+            power = -15
+            correction_offset = 5
+
+        front_distance, distance_left = read_wall_distances()
+        print(f"[DEBUG] Front sensor reading: {front_distance} cm")
+
+        # If the current front distance is less than or equal to target, stop
+        if front_distance is not None and front_distance <= Fdist:
+            print(f"[DEBUG] Target front distance reached: {front_distance} cm")
+            return True
+
+        print(f"[DEBUG] Left sensor reading: {distance_left} cm")
+
+        # Apply correction based on left sensor reading relative to Ldist
+        if distance_left > Ldist + tolerance:
+            LEFT_MOTOR.set_power(power)
+            RIGHT_MOTOR.set_power(power - correction_offset)
+            correction = "left"
+        elif distance_left < Ldist - tolerance:
+            LEFT_MOTOR.set_power(power - correction_offset)
+            RIGHT_MOTOR.set_power(power)
+            correction = "right"
+        else:
+            LEFT_MOTOR.set_power(power)
+            RIGHT_MOTOR.set_power(power)
+            correction = "straight"
+
+        print(f"[DEBUG] Correction applied: {correction} (Left sensor reading: {distance_left} cm)")
+
+    # One correction per duration, as the previous loop slept for duration after each one
+    CONTROL.run("drive_forward_with_correction_room", correction_step, 1 / duration)
 
     LEFT_MOTOR.set_power(0)
     RIGHT_MOTOR.set_power(0)
-    time.sleep(duration)
+    ESTOP.sleep(duration)
     print("[DEBUG] drive_forward_with_correction_incremental complete.")
 
     
 def turn_right_90():
     if stop_signal:
         return
-    LEFT_MOTOR.set_power(-50)
-    RIGHT_MOTOR.set_power(0)
-    time.sleep(1.15)
-    LEFT_MOTOR.set_power(0)
-    RIGHT_MOTOR.set_power(0)
-    print("[DEBUG] Turned right 90°.")
+    elapsed = DRIVE.pivot(-90, speed=TURN_SPEED)
+    print(f"[DEBUG] Turned right 90° in {elapsed:.2f}s.")
 
 def turn_left_90():
     if stop_signal:
         return
-    LEFT_MOTOR.set_power(0)
-    RIGHT_MOTOR.set_power(-50)
-    time.sleep(1.15)
-    LEFT_MOTOR.set_power(0)
-    RIGHT_MOTOR.set_power(0)
-    print("[DEBUG] Turned left 90°.")
+    elapsed = DRIVE.pivot(90, speed=TURN_SPEED)
+    print(f"[DEBUG] Turned left 90° in {elapsed:.2f}s.")
 
 def rotate_sensor_to_position(target, speed, threshold=2):
     if stop_signal:
         return
-    current = COLOUR_MOTOR.get_position()
-    while abs(current - target) > threshold and not stop_signal:
+
+    def rotation_step():
+        current = COLOUR_MOTOR.get_position()
+        if abs(current - target) <= threshold or stop_signal:
+            return current
         if current < target:
             COLOUR_MOTOR.set_power(speed)
         else:
             COLOUR_MOTOR.set_power(-speed)
-        time.sleep(0.02)
-        current = COLOUR_MOTOR.get_position()
+
+    current = CONTROL.run("rotate_sensor_to_position", rotation_step, SENSOR_ROTATION_HZ)
     COLOUR_MOTOR.set_power(0)
     print(f"[DEBUG] Sensor rotated to target angle {target}° (current: {current}°).")
 
 def rotate_robot(angle):
     if stop_signal:
         return
-    rotation_time = abs(angle) / 90.0
-    if angle > 0:
-        LEFT_MOTOR.set_power(30)
-        RIGHT_MOTOR.set_power(-30)
-    elif angle < 0:
-        LEFT_MOTOR.set_power(-30)
-        RIGHT_MOTOR.set_power(30)
-    time.sleep(rotation_time)
-    LEFT_MOTOR.set_power(0)
-    RIGHT_MOTOR.set_power(0)
-    time.sleep(0.1)
-    print("[DEBUG] Rotation complete.")
+    elapsed = DRIVE.rotate(angle, speed=ROTATE_SPEED)
+    print(f"[DEBUG] Rotation of {angle}° complete in {elapsed:.2f}s.")
 
 def drop_sandbag_with_alignment(angle):
 
     def deploy_sandbag():
+        if stop_signal:
+            return
         power = 30
         duration = 0.1
         FIRE_SUPPRESSION_MOTOR.set_power(power)
-        time.sleep(duration)
+        if ESTOP.sleep(duration):
+            return
         FIRE_SUPPRESSION_MOTOR.set_power(-power)
-        time.sleep(duration)
+        ESTOP.sleep(duration)
         FIRE_SUPPRESSION_MOTOR.set_power(0)
-        time.sleep(duration)
+        ESTOP.sleep(duration)
         print("[DEBUG] Sandbag deployed.")
 
     def movement(duration=0.3):
+        if stop_signal:
+            return
         LEFT_MOTOR.set_power(-20)
         RIGHT_MOTOR.set_power(-20)
-        time.sleep(duration)
+        ESTOP.sleep(duration)
         LEFT_MOTOR.set_power(0)
         RIGHT_MOTOR.set_power(0)
-        time.sleep(duration)
+        ESTOP.sleep(duration)
 
     if angle <= 30:
         print(f"[DEBUG] Angle {angle}° < 30°: Rotate -30° before deploy.")
@@ -249,7 +279,7 @@ def avoid_green_sticker(angle):
     # Initial forward bump backwards to clear the sticker area
     LEFT_MOTOR.set_power(30)
     RIGHT_MOTOR.set_power(30)
-    time.sleep(0.80)
+    ESTOP.sleep(0.80)
     LEFT_MOTOR.set_power(0)
     RIGHT_MOTOR.set_power(0)
     print("[DEBUG] Completed initial forward bump; robot stopped.")
@@ -285,104 +315,113 @@ def avoid_green_sticker(angle):
     print("[DEBUG] Avoidance maneuver complete.")
 
 
-def monitor_emergency_stop():
+def on_emergency_stop(reason):
+    "Called by ESTOP once every motor is at 0, before sleeping threads are woken up."
     global stop_signal
-    while not stop_signal:
-        if EMERGENCY_STOP.is_pressed():
-            print("[DEBUG] Emergency Stop Activated!")
-            stop_signal = True
-            LEFT_MOTOR.set_power(0)
-            RIGHT_MOTOR.set_power(0)
-            FIRE_SUPPRESSION_MOTOR.set_power(0)
-            reset_brick()
-            break
-        time.sleep(0.1)
-
-def play_siren():
-    global siren_stop, stop_signal
-    while not siren_stop and not stop_signal:
-        siren_sound.play()
-        time.sleep(0.5)
-
-def rotate_sensor_loop():
-
-    global angle, fires_extinguished, stop_signal, fire_detected
+    stop_signal = True
+    print(f"[DEBUG] Emergency Stop Activated! ({reason}, {ESTOP.latency or 0:.3f}s to stop motors)")
+    reset_brick()
 
+def siren_step():
+    if siren_stop or stop_signal:
+        return True
+    siren_sound.play()
+
+def start_sensor_sweep(threshold=2):
+    "Sweep the colour sensor back and forth over SWEEP_ANGLES, as a CONTROL task, until both fires are handled."
     COLOUR_MOTOR.reset_encoder()
     if in_room:
         print("[DEBUG] Fire scanning started...")
-    while not stop_signal and fires_extinguished < 2:
-        if not fire_detected:
-            angles = list(range(0, 162, 10)) + list(range(160, -1, -10))
-            for angle in angles:
-                if stop_signal or fire_detected:
-                    break
-                rotate_sensor_to_position(angle, speed=25)
-                time.sleep(0.03)
+    index = 0
+
+    def sweep_step():
+        global angle
+        nonlocal index
+        if stop_signal or fires_extinguished >= 2:
+            COLOUR_MOTOR.set_power(0)
+            return True
+        if fire_detected:
+            # Hold while the fire is handled; detect_fires_and_respond owns the colour motor
+            return None
+
+        angle = SWEEP_ANGLES[index]
+        current = COLOUR_MOTOR.get_position()
+        if abs(current - angle) <= threshold:
+            COLOUR_MOTOR.set_power(0)
+            index = (index + 1) % len(SWEEP_ANGLES)
+        elif current < angle:
+            COLOUR_MOTOR.set_power(SWEEP_SPEED)
         else:
-            time.sleep(4)
-            rotate_sensor_to_position(0, speed=25)
-        
-def detect_fires_and_respond():
+            COLOUR_MOTOR.set_power(-SWEEP_SPEED)
 
-    global angle, fires_extinguished, stop_signal, fire_detected
+    return CONTROL.add_task("sweep_colour_sensor", sweep_step, SENSOR_ROTATION_HZ)
 
-    while not stop_signal and fires_extinguished < 2:
-        color_val = COLOUR_SENSOR.get_value()        
-        
-        #print(f"[DEBUG] Sensor angle: {angle}°, Color: {color_val}")
+def fire_detection_step():
+    "Ends with True when red is seen, after stopping the wheels and the sweep, or False once there is nothing left to do."
+    global fire_detected
+    if stop_signal or fires_extinguished >= 2:
+        return False
 
-        if color_val == 5:  # red
+    color_val = COLOUR_SENSOR.get_value()
+    #print(f"[DEBUG] Sensor angle: {angle}°, Color: {color_val}")
 
-            fire_detected = True
-            LEFT_MOTOR.set_power(0)
-            RIGHT_MOTOR.set_power(0)
-            print(f"[DEBUG] Red detected at {angle}° - stopping motors")
-            time.sleep(0.2)
-            rotate_sensor_to_position(140, speed=50)
-            time.sleep(0.2)
-            drop_sandbag_with_alignment(angle)
-            fires_extinguished = 2
-            time.sleep(1)
-            fire_detected = False
+    if color_val == 5:  # red
+        fire_detected = True
+        LEFT_MOTOR.set_power(0)
+        RIGHT_MOTOR.set_power(0)
+        COLOUR_MOTOR.set_power(0)
+        return True
+
+def detect_fires_and_respond():
+    """Poll the colour sensor as a CONTROL task, and handle each fire found on the calling
+    thread, since the response blocks (it runs tasks of its own)."""
+    global fires_extinguished, fire_detected
+
+    while CONTROL.run("detect_fires", fire_detection_step, FIRE_DETECTION_HZ):
+        print(f"[DEBUG] Red detected at {angle}° - stopping motors")
+        ESTOP.sleep(0.2)
+        rotate_sensor_to_position(140, speed=50)
+        ESTOP.sleep(0.2)
+        drop_sandbag_with_alignment(angle)
+        fires_extinguished = 2
+        ESTOP.sleep(1)
+        fire_detected = False
 
         # elif detected_colour == 3:
         #     fire_detected = True
         #     LEFT_MOTOR.set_power(0)
         #     RIGHT_MOTOR.set_power(0)
         #     print(f"[DEBUG] Green detected at {angle}° - stopping motors for 2 seconds.")
-        #     time.sleep(0.2)
+        #     ESTOP.sleep(0.2)
         #     rotate_sensor_to_position(0, speed=50)
-        #     time.sleep(0.2)
+        #     ESTOP.sleep(0.2)
         #     avoid_green_sticker(angle)
-        #     time.sleep(1)
+        #     ESTOP.sleep(1)
         #     fire_detected = False
 
-        time.sleep(0.1)
-
 def move_backwards(power = 20, duration = 1.8):
     if stop_signal:
         return 
     LEFT_MOTOR.set_power(power)
     RIGHT_MOTOR.set_power(power)
-    time.sleep(duration)
+    ESTOP.sleep(duration)
     LEFT_MOTOR.set_power(0)
     RIGHT_MOTOR.set_power(0)
-    time.sleep(duration)
+    ESTOP.sleep(duration)
 
 
 def navigate_to_fire_room():
     global in_room
     print("[DEBUG] Navigation to fire room started...")
     drive_forward_with_correction(power=-20, duration=0.5, Ldist=8, Fdist=57)
-    time.sleep(0.2)
+    ESTOP.sleep(0.2)
     turn_right_90()
     print("[DEBUG] Turned right 90°.")
     drive_forward_with_correction(power=-20, duration=0.5, Ldist=51, Fdist=33)
-    time.sleep(0.2)
+    ESTOP.sleep(0.2)
     turn_left_90()
     print("[DEBUG] Turned left 90°.")
-    print("[DEBUG] Arrived at fire room.")
+    print(f"[DEBUG] Arrived at fire room. {ODOMETER.get_pose()}")
     in_room = True
 
 def navigate_to_base():
@@ -390,66 +429,68 @@ def navigate_to_base():
     # we can add a check for the orange threshold here, but i would recommend making it in the scan_and_extinguish_fires function
     # so when we scan it we trigger this
     drive_forward_with_correction(power=-20, duration=0.5, Ldist=30, Fdist=57)
-    time.sleep(0.2)
+    ESTOP.sleep(0.2)
     turn_right_90()
     print("[DEBUG] Turned right 90°.")
     drive_forward_with_correction(power=-20, duration=0.5, Ldist=55, Fdist=14)
-    time.sleep(0.2)
+    ESTOP.sleep(0.2)
     turn_left_90()
     print("[DEBUG] Turned left 90°.")
     drive_forward_with_correction(power=-20, duration=0.5, Ldist=99, Fdist=10)
-    time.sleep(0.2)
-    print("[DEBUG] Arrived at base.")
+    ESTOP.sleep(0.2)
+    print(f"[DEBUG] Arrived at base. {ODOMETER.get_pose()}")
 
 def navigate_inside_fire_room():
     global fires_extinguished
     print("[DEBUG] Navigation inside fire room started...")
     drive_forward_with_correction_room(duration=0.5, Ldist=76, Fdist=10)
-    time.sleep(0.2)
+    ESTOP.sleep(0.2)
     fires_extinguished = 2
-    time.sleep(0.2)
+    ESTOP.sleep(0.2)
     rotate_robot(180)
     
    
 
 def main_mission():
     global stop_signal, siren_stop
-    emergency_thread = threading.Thread(target=monitor_emergency_stop)
-    siren_thread = threading.Thread(target=play_siren)
-    emergency_thread.start()
-    siren_thread.start()
+    ESTOP.add_callback(on_emergency_stop)
+    ESTOP.start()
+    siren_task = CONTROL.add_task("siren", siren_step, SIREN_HZ)
+    ODOMETER.reset()
+    ODOMETER.start()
 
     navigate_to_fire_room()
 
     print("[DEBUG] Arrived at fire room. Stopping siren.")
     siren_stop = True
-    time.sleep(0.1)
-    siren_thread.join()
+    siren_task.wait()
     print("[DEBUG] Siren stopped.")
 
-    sweep_thread = threading.Thread(target=rotate_sensor_loop)
-    detect_thread = threading.Thread(target=detect_fires_and_respond)
+    # The sweep and the fire detection are CONTROL tasks; the navigation is a sequence of
+    # blocking moves, so it keeps a thread while this one handles the fires
+    print("[DEBUG] Starting sweep task.")
+    sweep_task = start_sensor_sweep()
     navigation_thread = threading.Thread(target=navigate_inside_fire_room)
-
-    print("[DEBUG] Starting sweep thread.")
-    sweep_thread.start()
-    print("[DEBUG] Starting detect thread.")
-    detect_thread.start()
     print("[DEBUG] Starting navigation inside fire room thread.")
     navigation_thread.start()
-    
-    sweep_thread.join()
-    detect_thread.join()
+    print("[DEBUG] Starting fire detection task.")
+    detect_fires_and_respond()
+
+    sweep_task.wait()
     navigation_thread.join()
-    print("[DEBUG] All threads joined.")
+    print("[DEBUG] Sweep, detection and navigation finished.")
 
     navigate_to_base()
 
-    emergency_thread.join()
-    print("[DEBUG] Mission completed.")
+    ESTOP.wait()
+    ODOMETER.stop()
+    CONTROL.stop()
+    print(f"[DEBUG] Mission completed. {ODOMETER.get_pose()}")
+    for name, stats in CONTROL.get_stats().items():
+        print(f"[DEBUG] {name}: {stats}")
 
 if __name__ == "__main__":
-    wait_ready_sensors(True)
+    wait_ready_sensors(True, parallel=True, timeout=10)
     print("[DEBUG] Firefighter Robot Full Mission Starting...")
     main_mission()
     print("[DEBUG] System shut down.")
\ No newline at end of file
@@ -0,0 +1,536 @@
+"""
+Module of microbenchmarks for the utils library. They run against the dummy
+BrickPi3, so they can be used on any computer. Run from the src directory:
+
+python3 -m utils.benchmark              (runs every benchmark)
+python3 -m utils.benchmark sensor_status
+"""
+
+from __future__ import annotations
+
+import asyncio
+import itertools
+import random
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+
+from . import brick, dummy, filters, rmi
+
+
+def calls_per_second(func, duration: float = 1.0) -> float:
+    """Call func repeatedly for about duration seconds and return the number of calls per second."""
+    calls = 0
+    batch = 1
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < duration:
+        for _ in range(batch):
+            func()
+        calls += batch
+        batch = min(batch * 2, 10000)
+        elapsed = time.perf_counter() - start
+    return calls / elapsed
+
+
+def _report(title: str, results: dict[str, float], unit: str = "calls/s"):
+    print(title)
+    baseline = None
+    for name, value in results.items():
+        ratio = "" if baseline is None else f"  ({value / baseline:.2f}x)"
+        print(f"  {name:<24} {value:>14,.0f} {unit}{ratio}")
+        if baseline is None:
+            baseline = value
+
+
+def _legacy_get_sensor_status(bp, port):
+    """The if/elif implementation of Brick.get_sensor_status that the table-driven one replaced.
+    Kept here only as the benchmark baseline."""
+    if port == bp.PORT_1:
+        message_type = bp.BPSPI_MESSAGE_TYPE.GET_SENSOR_1
+        port_index = 0
+    elif port == bp.PORT_2:
+        message_type = bp.BPSPI_MESSAGE_TYPE.GET_SENSOR_2
+        port_index = 1
+    elif port == bp.PORT_3:
+        message_type = bp.BPSPI_MESSAGE_TYPE.GET_SENSOR_3
+        port_index = 2
+    elif port == bp.PORT_4:
+        message_type = bp.BPSPI_MESSAGE_TYPE.GET_SENSOR_4
+        port_index = 3
+    else:
+        raise brick.IOError("get_sensor error. Must be one sensor port at a time.")
+
+    T = bp.SENSOR_TYPE
+    sensor_type = bp.SensorType[port_index]
+    if sensor_type == T.CUSTOM:
+        outArray = [bp.SPI_Address, message_type, 0, 0, 0, 0, 0, 0, 0, 0]
+    elif sensor_type == T.I2C:
+        outArray = [bp.SPI_Address, message_type, 0, 0, 0, 0]
+        for b in range(bp.I2CInBytes[port_index]):
+            outArray.append(0)
+    elif (sensor_type == T.TOUCH or sensor_type == T.NXT_TOUCH or sensor_type == T.EV3_TOUCH
+          or sensor_type == T.NXT_ULTRASONIC or sensor_type == T.EV3_COLOR_REFLECTED
+          or sensor_type == T.EV3_COLOR_AMBIENT or sensor_type == T.EV3_COLOR_COLOR
+          or sensor_type == T.EV3_ULTRASONIC_LISTEN or sensor_type == T.EV3_INFRARED_PROXIMITY):
+        outArray = [bp.SPI_Address, message_type, 0, 0, 0, 0, 0]
+        reply = bp.spi_transfer_array(outArray)
+        if reply[3] == 0xA5:
+            if (reply[4] == sensor_type or (sensor_type == T.TOUCH
+                                            and (reply[4] == T.NXT_TOUCH or reply[4] == T.EV3_TOUCH))):
+                return reply[5]
+            return brick.SENSOR_STATE.INCORRECT_SENSOR_PORT
+        raise brick.IOError("get_sensor error: No SPI response")
+    elif sensor_type == T.NXT_COLOR_FULL:
+        outArray = [bp.SPI_Address, message_type, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
+    elif (sensor_type == T.NXT_LIGHT_ON or sensor_type == T.NXT_LIGHT_OFF
+          or sensor_type == T.NXT_COLOR_RED or sensor_type == T.NXT_COLOR_GREEN
+          or sensor_type == T.NXT_COLOR_BLUE or sensor_type == T.NXT_COLOR_OFF
+          or sensor_type == T.EV3_GYRO_ABS or sensor_type == T.EV3_GYRO_DPS
+          or sensor_type == T.EV3_ULTRASONIC_CM or sensor_type == T.EV3_ULTRASONIC_INCHES):
+        outArray = [bp.SPI_Address, message_type, 0, 0, 0, 0, 0, 0]
+    elif sensor_type == T.EV3_COLOR_RAW_REFLECTED or sensor_type == T.EV3_GYRO_ABS_DPS:
+        outArray = [bp.SPI_Address, message_type, 0, 0, 0, 0, 0, 0, 0, 0]
+    elif sensor_type == T.EV3_COLOR_COLOR_COMPONENTS or sensor_type == T.EV3_INFRARED_SEEK:
+        outArray = [bp.SPI_Address, message_type, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
+    elif sensor_type == T.EV3_INFRARED_REMOTE:
+        outArray = [bp.SPI_Address, message_type, 0, 0, 0, 0, 0, 0, 0, 0]
+    else:
+        raise brick.IOError("get_sensor error: Sensor not configured or not supported.")
+
+    reply = bp.spi_transfer_array(outArray)
+    if reply[3] == 0xA5:
+        if reply[4] == sensor_type:
+            return reply[5]
+        return brick.SENSOR_STATE.INCORRECT_SENSOR_PORT
+    raise brick.IOError("get_sensor error: No SPI response")
+
+
+def bench_sensor_status(duration: float = 1.0):
+    """Compare get_sensor_status calls per second, if/elif ladder against the dispatch table,
+    for the sensor types used by main.py (touch, ultrasonic, color)."""
+    bp = brick.Brick(dummy.BrickPi3())
+    T = bp.SENSOR_TYPE
+    for port, sensor_type in ((bp.PORT_1, T.EV3_ULTRASONIC_CM), (bp.PORT_2, T.EV3_COLOR_COLOR),
+                              (bp.PORT_3, T.EV3_COLOR_COLOR_COMPONENTS), (bp.PORT_4, T.TOUCH)):
+        bp.set_sensor_type(port, sensor_type)
+
+    ports = (bp.PORT_1, bp.PORT_2, bp.PORT_3, bp.PORT_4)
+
+    def legacy():
+        for port in ports:
+            _legacy_get_sensor_status(bp.bp, port)
+
+    def table():
+        for port in ports:
+            bp.get_sensor_status(port)
+
+    _report("get_sensor_status, 4 ports per call (dummy brick)", {
+        "if/elif ladder": calls_per_second(legacy, duration) * len(ports),
+        "dispatch table": calls_per_second(table, duration) * len(ports),
+    })
+
+
+class _CopyingBrick(brick.BrickPi3):
+    """The per-device Brick wrapper replaced by get_brick, which copied every attribute
+    of the BrickPi3 onto itself. Kept here only as the benchmark baseline."""
+
+    def __init__(self, bp=None):
+        self.bp = brick.BP if bp is None else bp
+        child = self.__dict__
+        parent = self.bp.__dict__
+        for key in parent.keys():
+            setattr(self, str(key), child.get(key, parent.get(key)))
+
+
+def _configure_device_set():
+    "Build the devices of a full configure_ports call: 4 sensors and 4 motors."
+    return brick.configure_ports(PORT_1=brick.EV3UltrasonicSensor, PORT_2=brick.EV3ColorSensor,
+                                 PORT_3=brick.EV3UltrasonicSensor, PORT_4=brick.TouchSensor,
+                                 PORT_A=brick.Motor, PORT_B=brick.Motor,
+                                 PORT_C=brick.Motor, PORT_D=brick.Motor,
+                                 wait=False, print_status=False)
+
+
+def bench_startup(sets: int = 200):
+    """Compare the time and memory needed to build the configure_ports device set,
+    with one copied Brick per device against one shared Brick per BrickPi3."""
+    bp = dummy.BrickPi3()
+    get_brick = brick.get_brick
+    brick.restore_default_brick(bp)
+    times = {}
+    memory = {}
+    try:
+        for name, factory in (("copied Brick per device", lambda bp=None: _CopyingBrick(bp)),
+                              ("shared Brick", get_brick)):
+            brick.get_brick = factory
+            start = time.perf_counter()
+            devices = [_configure_device_set() for _ in range(sets)]
+            times[name] = (time.perf_counter() - start) / sets * 1e6
+            del devices
+
+            tracemalloc.start()
+            devices = [_configure_device_set() for _ in range(sets)]
+            memory[name] = tracemalloc.get_traced_memory()[0] / sets
+            tracemalloc.stop()
+            del devices
+    finally:
+        brick.get_brick = get_brick
+        brick.restore_default_brick()
+        for port in brick.Sensor.ALL_SENSORS:
+            brick.Sensor.ALL_SENSORS[port] = None
+
+    _report("Build configure_ports device set (4 sensors, 4 motors)", times, "us per set")
+    _report("Memory held by one device set", memory, "bytes")
+
+
+def bench_codec(duration: float = 1.0):
+    """Compare encoding and decoding a remote call and its reply, brickle (with the
+    uuid1 string ids it used) against a session's BinaryCodec, in calls per second
+    and bytes on the wire per call."""
+    codec = rmi.BinaryCodec(['brick.get_sensor', 'brick.set_motor_power'])
+    calls = [rmi.Command('brick.get_sensor', 1), rmi.Command('brick.set_motor_power', 1, -20)]
+    results = [255.0, None]
+
+    def frames(encode, legacy_ids):
+        "Encoded (call, reply) frames of every benchmark call."
+        out = []
+        for command, result in zip(calls, results):
+            command.id = str(uuid.uuid1()) if legacy_ids else 1
+            command.result, command._result_given = None, False
+            call = encode(command)
+            command.result, command._result_given = result, True
+            out.append((call, encode(command)))
+        return out
+
+    def round_trips(encode, decode, legacy_ids):
+        def run():
+            for call, reply in frames(encode, legacy_ids):
+                decode(call)
+                decode(reply)
+        return run
+
+    speed = {
+        "brickle": calls_per_second(round_trips(rmi.brickle.dumps, rmi.brickle.loads, True), duration) * len(calls),
+        "binary codec": calls_per_second(round_trips(codec.dumps, codec.loads, False), duration) * len(calls),
+    }
+    size = {
+        "brickle": sum(len(a) + len(b) for a, b in frames(rmi.brickle.dumps, True)) / len(calls),
+        "binary codec": sum(len(a) + len(b) for a, b in frames(codec.dumps, False)) / len(calls),
+    }
+    _report("Encode and decode a call and its reply (get_sensor, set_motor_power)", speed)
+    _report("Bytes per call and reply, without the 4-byte frame headers", size, "bytes")
+
+
+class _LoadTarget:
+    "The object served by the RMI load test."
+
+    def ping(self, value):
+        return value
+
+
+def _load_threaded(clients: int, port: int, duration: float) -> tuple[float, float, int]:
+    "Calls per second, memory (bytes) and threads of RemoteServer with clients RemoteClients."
+    server = rmi.RemoteServer('load', port)
+    server.register_object(_LoadTarget(), var_name='load')
+    time.sleep(0.2)
+    threads = threading.active_count()
+    tracemalloc.start()
+    remotes = [rmi.RemoteClient('localhost', 'load', port) for _ in range(clients)]
+    proxies = [remote.create_caller(_LoadTarget(), var_name='load') for remote in remotes]
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    threads = threading.active_count() - threads
+
+    counts = [0] * clients
+    end = time.perf_counter() + duration
+
+    def worker(i):
+        proxy = proxies[i]
+        while time.perf_counter() < end:
+            proxy.ping(i)
+            counts[i] += 1
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    for remote in remotes:
+        remote.close()
+    server.close()
+    time.sleep(0.5)  # let the connection and worker threads exit before the next measurement
+    return sum(counts) / duration, memory, threads
+
+
+def _load_asyncio(clients: int, port: int, duration: float) -> tuple[float, float, int]:
+    "Calls per second, memory (bytes) and threads of AsyncRemoteServer with clients AsyncRemoteClients."
+    async def run():
+        server = await rmi.AsyncRemoteServer('load', port).start()
+        server.register_object(_LoadTarget(), var_name='load')
+        threads = threading.active_count()
+        tracemalloc.start()
+        remotes = [await rmi.AsyncRemoteClient.connect('localhost', 'load', port) for _ in range(clients)]
+        proxies = [remote.create_caller(_LoadTarget(), var_name='load') for remote in remotes]
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        threads = threading.active_count() - threads
+
+        counts = [0] * clients
+        end = time.perf_counter() + duration
+
+        async def worker(i):
+            proxy = proxies[i]
+            while time.perf_counter() < end:
+                await proxy.ping(i)
+                counts[i] += 1
+
+        await asyncio.gather(*(worker(i) for i in range(clients)))
+        for remote in remotes:
+            await remote.close()
+        await server.close()
+        return sum(counts) / duration, memory, threads
+    return asyncio.run(run())
+
+
+def bench_rmi_load(duration: float = 1.0, client_counts=(1, 10, 50), port: int = 2150):
+    """Load test over localhost: every client calls a remote method in a loop. Compares
+    the thread-per-connection RemoteServer/RemoteClient against their asyncio versions
+    in total calls per second, memory allocated by the connections, and threads started."""
+    for clients in client_counts:
+        results = {}
+        for name, load in (("threads", _load_threaded), ("asyncio", _load_asyncio)):
+            results[name] = load(clients, port, duration)
+            port += 1
+        _report(f"RMI load test, {clients} client(s): total calls per second",
+                {name: r[0] for name, r in results.items()})
+        _report("  memory allocated for the connections", {name: r[1] / 1024 for name, r in results.items()}, "kB")
+        _report("  threads started", {name: r[2] for name, r in results.items()}, "threads")
+
+
+def _legacy_create_caller(obj, remote_client, var_name=''):
+    """The _RemoteCaller.create_caller that set a new closure on the object for every method
+    each time a remote object was created. Kept here only as the benchmark baseline."""
+    caller = rmi._RemoteCaller(remote_client, var_name)
+
+    def generate(func_name):
+        func_name = f'{var_name}.{func_name}'
+
+        def func(*args, wait_for_data=60, **kwargs):
+            res = remote_client._send_command(func_name, *args, wait_for_data=wait_for_data, **kwargs)
+            if rmi._RemoteCaller.TESTING:
+                return res
+            else:
+                if hasattr(res, 'result'):
+                    return res.result
+                else:
+                    return res
+        return func
+
+    for name in dir(obj):
+        attr = getattr(obj, name)
+        if callable(attr) and not name.startswith('__'):
+            setattr(obj, name, generate(name))
+    obj.__remote__ = caller
+    return obj
+
+
+class _NullClient:
+    "Stands in for a RemoteClient to measure only the Python overhead of the proxies."
+    _reply = rmi.Command('brick.get_sensor')
+    _reply.result = 255.0
+
+    def _send_command(self, func, *args, wait_for_data=True, **kwargs):
+        return self._reply
+
+
+def bench_remote_proxy(duration: float = 1.0, proxies: int = 200, port: int = 2140):
+    """Compare remote brick proxies made by patching every method of each instance against
+    generated proxy classes: proxy creation time, per-call overhead without a network,
+    and get_sensor calls per second through a loopback RemoteBrickClient."""
+    from . import remote
+
+    class Plain:
+        "A proxy target with the methods of dummy.Brick, without starting its fake motor threads."
+    for name in dir(dummy.Brick):
+        if callable(getattr(dummy.Brick, name)) and not name.startswith('__'):
+            setattr(Plain, name, getattr(dummy.Brick, name))
+
+    null = _NullClient()
+    create = {}
+    for name, make in (("patched per instance", lambda obj: _legacy_create_caller(obj, null, 'brick')),
+                       ("generated class", lambda obj: rmi._RemoteCaller.create_caller(obj, null, var_name='brick'))):
+        objects = [Plain() for _ in range(proxies)]
+        start = time.perf_counter()
+        for obj in objects:
+            make(obj)
+        create[name] = (time.perf_counter() - start) / proxies * 1e6
+    _report("Create a remote brick proxy", create, "us")
+
+    legacy = _legacy_create_caller(Plain(), null, 'brick')
+    generated = rmi._RemoteCaller.create_caller(Plain(), null, var_name='brick')
+    _report("Proxy call overhead, no network (get_sensor)", {
+        "patched per instance": calls_per_second(lambda: legacy.get_sensor(1), duration),
+        "generated class": calls_per_second(lambda: generated.get_sensor(1), duration),
+    })
+
+    server = remote.RemoteBrickServer('bench', port)
+    time.sleep(0.2)
+    client = remote.RemoteBrickClient('localhost', 'bench', port)
+    try:
+        client.get_brick().set_sensor_type(brick.BP.PORT_1, brick.BP.SENSOR_TYPE.EV3_ULTRASONIC_CM)
+        legacy = _legacy_create_caller(Plain(), client, 'brick')
+        generated = client.create_caller(Plain(), var_name='brick')
+        _report("Loopback RemoteBrickClient get_sensor", {
+            "patched per instance": calls_per_second(lambda: legacy.get_sensor(1), duration),
+            "generated class": calls_per_second(lambda: generated.get_sensor(1), duration),
+        })
+    finally:
+        client.close()
+        server.close()
+
+
+def bench_ring_buffer(duration: float = 0.2, sizes=(10, 100, 1000, 10000, 100000)):
+    """Compare RingBuffer with CircularList on the workloads of the CircularList doctests,
+    with the buffer full and wrapped around, at each window size."""
+    for size in sizes:
+        buffers = {
+            "CircularList": filters.CircularList(size),
+            "RingBuffer": filters.RingBuffer(size),
+            "RingBuffer lock-free": filters.RingBuffer(size, threadsafe=False),
+        }
+        values = [float(i) for i in range(size + size // 2)]
+        for buffer in buffers.values():
+            buffer.update(values)
+        workloads = {
+            "append": lambda b: b.append(1.0),
+            "update (size values)": lambda b: b.update(values[:size]),
+            "to_list": lambda b: b.to_list(),
+            "in (missing value)": lambda b: -1.0 in b,
+            "count": lambda b: b.count(1.0),
+            "[i]": lambda b: b[size // 2],
+        }
+        for workload, func in workloads.items():
+            _report(f"{workload}, size {size}", {
+                name: calls_per_second(lambda: func(buffer), duration) for name, buffer in buffers.items()
+            })
+
+
+class _LegacyMedianWindow(filters.WindowedFilter):
+    """The sort-on-every-sample MedianWindow that the two-heap one replaced.
+    Kept here only as the benchmark baseline."""
+
+    def __init__(self, window_size=10):
+        super().__init__(window_size)
+        self.data = []
+
+    def __appender__(self, in_value, out_value):
+        if out_value is not None:
+            self.data.remove(out_value)
+        if in_value is not None:
+            self.data.append(in_value)
+        self.data.sort()
+        return statistics.median(self.data)
+
+
+def bench_median_window(duration: float = 0.5, sizes=(10, 100, 1000, 10000, 100000)):
+    """Compare the per-sample cost of MedianWindow with the sort-based one, with the window full
+    of random ultrasonic-like readings, at each window size. The two-heap cost should stay flat."""
+    rng = random.Random(211)
+    for size in sizes:
+        values = [rng.uniform(5, 255) for _ in range(size)]
+        legacy = _LegacyMedianWindow(size)
+        legacy.circ.extend(values)
+        legacy.data = sorted(legacy.circ.to_list())
+        heaps = filters.MedianWindow(size)
+        heaps.circ.extend(values)
+        for value in heaps.circ:
+            heaps.quantile.add(value)
+        p90 = filters.QuantileWindow(size, q=0.9)
+        p90.circ.extend(values)
+        for value in p90.circ:
+            p90.quantile.add(value)
+        samples = [rng.uniform(5, 255) for _ in range(1024)]
+        for window in (legacy, heaps, p90):
+            window.samples = itertools.cycle(samples)
+        _report(f"MedianWindow.append, window {size}", {
+            name: calls_per_second(lambda: window.append(next(window.samples)), duration)
+            for name, window in (("sort per sample", legacy), ("two heaps", heaps), ("two heaps, q=0.9", p90))
+        }, unit="samples/s")
+
+
+def bench_append_many(samples: int = 100000):
+    """Compare replaying logged samples into the windowed filters one append at a time
+    with a single append_many call."""
+    rng = random.Random(211)
+    values = [rng.uniform(5, 255) for _ in range(samples)]
+    for name, make in (("MeanWindow(10)", lambda: filters.MeanWindow(10)),
+                       ("SumWindow(100)", lambda: filters.SumWindow(100)),
+                       ("MedianWindow(100)", lambda: filters.MedianWindow(100)),
+                       ("IntegrationTracker", lambda: filters.IntegrationTracker(0.02))):
+        window = make()
+        start = time.perf_counter()
+        for value in values:
+            window.append(value)
+        one_by_one = samples / (time.perf_counter() - start)
+        window = make()
+        start = time.perf_counter()
+        window.append_many(values)
+        batch = samples / (time.perf_counter() - start)
+        _report(f"{name}, {samples:,} samples", {"append": one_by_one, "append_many": batch}, unit="samples/s")
+
+
+def bench_recursive_filters(duration: float = 0.5, sample_rate: float = 50):
+    """Compare the per-sample cost and delay (at sample_rate Hz) of MeanWindow with the
+    recursive filters that smooth about as much."""
+    rng = random.Random(211)
+    samples = itertools.cycle([rng.uniform(5, 255) for _ in range(1024)])
+    ticks = itertools.count()
+    ema = filters.ExponentialFilter(alpha=0.2)
+    biquad = filters.BiquadLowPass(5, sample_rate)
+    one_euro = filters.OneEuroFilter(min_cutoff=2, beta=0.05)
+    debounce = filters.DebounceFilter(3)
+    mean_window = filters.MeanWindow(9)
+    results = {
+        "MeanWindow(9)": calls_per_second(lambda: mean_window.append(next(samples)), duration),
+        "ExponentialFilter(0.2)": calls_per_second(lambda: ema.append(next(samples)), duration),
+        "BiquadLowPass(5 Hz)": calls_per_second(lambda: biquad.append(next(samples)), duration),
+        "OneEuroFilter": calls_per_second(lambda: one_euro.append(next(samples), next(ticks) / sample_rate),
+                                          duration),
+        "DebounceFilter(3)": calls_per_second(lambda: debounce.append(round(next(samples)) % 7), duration),
+    }
+    _report("Smoothing filters, append", results, unit="samples/s")
+    delays = {
+        "MeanWindow(9)": (9 - 1) / 2 / sample_rate,
+        "ExponentialFilter(0.2)": ema.group_delay() / sample_rate,
+        "BiquadLowPass(5 Hz)": biquad.group_delay(),
+        "OneEuroFilter": one_euro.group_delay(),
+        "DebounceFilter(3)": debounce.group_delay() / sample_rate,
+    }
+    for name, delay in delays.items():
+        print(f"  {name:<24} delay {delay * 1000:4.0f} ms")
+
+
+BENCHMARKS = {
+    'sensor_status': bench_sensor_status,
+    'startup': bench_startup,
+    'codec': bench_codec,
+    'rmi_load': bench_rmi_load,
+    'remote_proxy': bench_remote_proxy,
+    'ring_buffer': bench_ring_buffer,
+    'median_window': bench_median_window,
+    'append_many': bench_append_many,
+    'recursive_filters': bench_recursive_filters,
+}
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or list(BENCHMARKS)
+    for name in names:
+        if name not in BENCHMARKS:
+            print(f"Unknown benchmark {name!r}. Choose from: {', '.join(BENCHMARKS)}", file=sys.stderr)
+            sys.exit(1)
+        BENCHMARKS[name]()
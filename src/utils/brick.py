@@ -12,8 +12,10 @@ import math
 import atexit
 import os
 import signal
+import threading
 import time
 import sys
+import weakref
 
 
 def busy_sleep(seconds: float):
@@ -66,6 +68,13 @@ PORTS: dict[str, int] = {
     'D': BrickPi3.PORT_D,
 }
 
+SENSOR_PORT_NAMES = ('1', '2', '3', '4')
+MOTOR_PORT_NAMES = ('A', 'B', 'C', 'D')
+_SENSOR_PORT_NAMES_BY_PORT = {PORTS[name]: name for name in SENSOR_PORT_NAMES}
+
+"""BUS_LOCK - held for the duration of a Brick.read_many burst."""
+BUS_LOCK = threading.RLock()
+
 
 def exception_handler(exception=Exception):
     def exception_handler_factory(func):
@@ -159,20 +168,178 @@ class Color:
 _color_names_by_code = {c.code: c.name for c in ColorMappings._all_mappings}
 
 
-class Brick(BrickPi3):
+def _build_status_decoding() -> dict[int, tuple[int, frozenset[int]]]:
+    """
+    Build the table used by Brick.get_sensor_status, mapping each sensor type to
+    (request message length, sensor types accepted in the reply).
+    I2C requests are extended by the number of I2C bytes expected on the port.
+    """
+    T = BrickPi3.SENSOR_TYPE
+    lengths = {
+        T.CUSTOM: 10,
+        T.I2C: 6,
+        T.NXT_COLOR_FULL: 12,
+        T.EV3_COLOR_RAW_REFLECTED: 10,
+        T.EV3_GYRO_ABS_DPS: 10,
+        T.EV3_COLOR_COLOR_COMPONENTS: 14,
+        T.EV3_INFRARED_SEEK: 14,
+        T.EV3_INFRARED_REMOTE: 10,
+    }
+    for sensor_type in (T.TOUCH, T.NXT_TOUCH, T.EV3_TOUCH, T.NXT_ULTRASONIC,
+                        T.EV3_COLOR_REFLECTED, T.EV3_COLOR_AMBIENT, T.EV3_COLOR_COLOR,
+                        T.EV3_ULTRASONIC_LISTEN, T.EV3_INFRARED_PROXIMITY):
+        lengths[sensor_type] = 7
+    for sensor_type in (T.NXT_LIGHT_ON, T.NXT_LIGHT_OFF, T.NXT_COLOR_RED, T.NXT_COLOR_GREEN,
+                        T.NXT_COLOR_BLUE, T.NXT_COLOR_OFF, T.EV3_GYRO_ABS, T.EV3_GYRO_DPS,
+                        T.EV3_ULTRASONIC_CM, T.EV3_ULTRASONIC_INCHES):
+        lengths[sensor_type] = 8
+
+    table = {sensor_type: (length, frozenset([sensor_type]))
+             for sensor_type, length in lengths.items()}
+    # A generic touch sensor may report itself as either kind of touch sensor
+    table[T.TOUCH] = (7, frozenset([T.TOUCH, T.NXT_TOUCH, T.EV3_TOUCH]))
+    return table
+
+
+_STATUS_DECODING = _build_status_decoding()
+_STATUS_PORTS: dict[int, tuple[int, int]] = {
+    BrickPi3.PORT_1: (0, BrickPi3.BPSPI_MESSAGE_TYPE.GET_SENSOR_1),
+    BrickPi3.PORT_2: (1, BrickPi3.BPSPI_MESSAGE_TYPE.GET_SENSOR_2),
+    BrickPi3.PORT_3: (2, BrickPi3.BPSPI_MESSAGE_TYPE.GET_SENSOR_3),
+    BrickPi3.PORT_4: (3, BrickPi3.BPSPI_MESSAGE_TYPE.GET_SENSOR_4),
+}
+
+_I2C_SENSOR_TYPE = BrickPi3.SENSOR_TYPE.I2C
+
+"""_BRICKS - the shared Brick of each BrickPi3, by id. Entries disappear with their last device."""
+_BRICKS: weakref.WeakValueDictionary[int, Brick] = weakref.WeakValueDictionary()
+
+
+def get_brick(bp=None) -> Brick:
+    """
+    Get the Brick shared by all devices of the given BrickPi3 (or remote brick),
+    creating it on first use. Uses the default brick BP when bp is None.
+    """
+    if bp is None:
+        bp = BP
+    if isinstance(bp, Brick):
+        return bp
+    brick = _BRICKS.get(id(bp))
+    if brick is None or brick.bp is not bp:
+        brick = Brick(bp)
+        _BRICKS[id(bp)] = brick
+    return brick
+
+
+class Brick:
     """
     Wrapper class for the BrickPi3 class. Comes with additional methods such get_sensor_status.
+
+    Every attribute that is not defined here is looked up on the wrapped BrickPi3
+    (or remote brick), so the wrapper holds no copy of its state. Use get_brick(bp)
+    to get the one Brick shared by every device of a BrickPi3.
     """
+    # Methods implemented by this wrapper. A remote brick runs them on its host instead.
+    _WRAPPER_METHODS = ('set_sensor_type', 'get_sensor_status', 'read_many', 'read_all_sensors')
 
     def __init__(self, bp=None):
         if bp is None:
             self.bp = BP
         else:
             self.bp = bp
-        child = self.__dict__
-        parent = self.bp.__dict__
-        for key in parent.keys():
-            setattr(self, str(key), child.get(key, parent.get(key)))
+        self._read_plans = {}
+        self._status_requests = [None] * 4
+        if hasattr(self.bp, '__remote__'):
+            for name in self._WRAPPER_METHODS:
+                if hasattr(self.bp, name):
+                    self.__dict__[name] = getattr(self.bp, name)
+
+    def __getattr__(self, name):
+        # Only called for attributes not found on the wrapper itself
+        if name == 'bp' or name.startswith('__'):
+            raise AttributeError(name)
+        attr = getattr(self.bp, name)
+        if callable(attr):
+            # Cache bound methods; plain state such as SensorType is always read from the BrickPi3
+            self.__dict__[name] = attr
+        return attr
+
+    def __dir__(self):
+        return sorted(set(super(Brick, self).__dir__()) | set(dir(self.bp)))
+
+    def read_many(self, ports: list[str]) -> tuple[float, tuple]:
+        """
+        Read several sensor and motor ports in one burst on the SPI bus.
+        The burst holds BUS_LOCK, so it is never interleaved with another burst.
+
+        Keyword arguments:
+        ports - port names, '1' to '4' for sensors and 'A' to 'D' for motors
+
+        Returns (timestamp, values), where values holds one entry per requested port,
+        in the same order: the sensor value (None if it is not ready), or the motor
+        status list [flags, power, encoder, dps] (None if it could not be read).
+        """
+        key = tuple(ports)
+        plan = self._read_plans.get(key)
+        if plan is None:
+            # Resolve the port names into bus calls once, and reuse the result buffer
+            calls = []
+            for name in key:
+                name = str(name).upper()
+                if name in SENSOR_PORT_NAMES:
+                    calls.append((self.get_sensor, PORTS[name]))
+                elif name in MOTOR_PORT_NAMES:
+                    calls.append((self.get_motor_status, PORTS[name]))
+                else:
+                    raise IOError(f"read_many error. Unknown port {name!r}, must be 1, 2, 3, 4, A, B, C, or D.")
+            plan = (tuple(calls), [None] * len(calls))
+            self._read_plans[key] = plan
+
+        calls, values = plan
+        with BUS_LOCK:
+            timestamp = time.time()
+            for i, (getter, port) in enumerate(calls):
+                try:
+                    values[i] = getter(port)
+                except (SensorError, IOError, OSError):
+                    values[i] = None
+            return (timestamp, tuple(values))
+
+    def read_all_sensors(self) -> tuple[float, tuple]:
+        """
+        Read the four sensor ports in one burst, see read_many.
+        Returns (timestamp, values) with None for ports that are not configured.
+        """
+        return self.read_many(SENSOR_PORT_NAMES)
+
+    def set_sensor_type(self, port: Literal[1, 2, 4, 8], type: int, params=0):
+        """
+        Set the sensor type, see BrickPi3.set_sensor_type.
+        Also prepares the request used by get_sensor_status for this port.
+        """
+        result = self.bp.set_sensor_type(port, type, params)
+        port_index, _ = _STATUS_PORTS.get(port, (None, None))
+        if port_index is not None:
+            self._build_status_request(port_index)
+        return result
+
+    def _build_status_request(self, port_index: int):
+        """Build the status request of one port from the _STATUS_DECODING table.
+        Returns None if the configured sensor type is not supported."""
+        bp = self.bp
+        sensor_type = bp.SensorType[port_index]
+        decoding = _STATUS_DECODING.get(sensor_type)
+        if decoding is None:
+            self._status_requests[port_index] = None
+            return None
+        length, accepted_types = decoding
+        i2c_bytes = bp.I2CInBytes[port_index] if sensor_type == _I2C_SENSOR_TYPE else 0
+        out_array = bytearray(length + i2c_bytes)
+        out_array[0] = bp.SPI_Address
+        out_array[1] = _STATUS_PORTS[1 << port_index][1]
+        request = (sensor_type, i2c_bytes, bp.SPI_Address, out_array, accepted_types)
+        self._status_requests[port_index] = request
+        return request
 
     def get_sensor_status(self, port: Literal[1, 2, 4, 8]):
         """
@@ -190,147 +357,29 @@ class Brick(BrickPi3):
         4: I2C_ERROR
         5: INCORRECT_SENSOR_PORT
         """
-        if port == self.PORT_1:
-            message_type = self.BPSPI_MESSAGE_TYPE.GET_SENSOR_1
-            port_index = 0
-        elif port == self.PORT_2:
-            message_type = self.BPSPI_MESSAGE_TYPE.GET_SENSOR_2
-            port_index = 1
-        elif port == self.PORT_3:
-            message_type = self.BPSPI_MESSAGE_TYPE.GET_SENSOR_3
-            port_index = 2
-        elif port == self.PORT_4:
-            message_type = self.BPSPI_MESSAGE_TYPE.GET_SENSOR_4
-            port_index = 3
-        else:
+        try:
+            port_index, _ = _STATUS_PORTS[port]
+        except (KeyError, TypeError):
             raise IOError(
                 "get_sensor error. Must be one sensor port at a time. PORT_1, PORT_2, PORT_3, or PORT_4.")
 
-        if self.SensorType[port_index] == self.SENSOR_TYPE.CUSTOM:
-            outArray = [self.SPI_Address, message_type, 0, 0, 0, 0, 0, 0, 0, 0]
-            reply = self.spi_transfer_array(outArray)
-            if reply[3] == 0xA5:
-                if reply[4] == self.SensorType[port_index]:
-                    return reply[5]
-                else:
-                    return SENSOR_STATE.INCORRECT_SENSOR_PORT
-            else:
-                raise IOError("get_sensor error: No SPI response")
-
-        elif self.SensorType[port_index] == self.SENSOR_TYPE.I2C:
-            outArray = [self.SPI_Address, message_type, 0, 0, 0, 0]
-            for b in range(self.I2CInBytes[port_index]):
-                outArray.append(0)
-            reply = self.spi_transfer_array(outArray)
-            if reply[3] == 0xA5:
-                if reply[4] == self.SensorType[port_index]:
-                    return reply[5]
-                else:
-                    return SENSOR_STATE.INCORRECT_SENSOR_PORT
-            else:
-                raise IOError("get_sensor error: No SPI response")
-
-        elif (self.SensorType[port_index] == self.SENSOR_TYPE.TOUCH
-              or self.SensorType[port_index] == self.SENSOR_TYPE.NXT_TOUCH
-              or self.SensorType[port_index] == self.SENSOR_TYPE.EV3_TOUCH
-              or self.SensorType[port_index] == self.SENSOR_TYPE.NXT_ULTRASONIC
-              or self.SensorType[port_index] == self.SENSOR_TYPE.EV3_COLOR_REFLECTED
-              or self.SensorType[port_index] == self.SENSOR_TYPE.EV3_COLOR_AMBIENT
-              or self.SensorType[port_index] == self.SENSOR_TYPE.EV3_COLOR_COLOR
-              or self.SensorType[port_index] == self.SENSOR_TYPE.EV3_ULTRASONIC_LISTEN
-              or self.SensorType[port_index] == self.SENSOR_TYPE.EV3_INFRARED_PROXIMITY):
-            outArray = [self.SPI_Address, message_type, 0, 0, 0, 0, 0]
-            reply = self.spi_transfer_array(outArray)
-            if (reply[3] == 0xA5):
-                if ((reply[4] == self.SensorType[port_index] or (self.SensorType[port_index] == self.SENSOR_TYPE.TOUCH
-                                                                 and (reply[4] == self.SENSOR_TYPE.NXT_TOUCH or reply[4] == self.SENSOR_TYPE.EV3_TOUCH)))):
-                    return reply[5]
-                else:
-                    return SENSOR_STATE.INCORRECT_SENSOR_PORT
-            else:
-                raise IOError("get_sensor error: No SPI response")
-
-        elif self.SensorType[port_index] == self.SENSOR_TYPE.NXT_COLOR_FULL:
-            outArray = [self.SPI_Address, message_type,
-                        0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-            reply = self.spi_transfer_array(outArray)
-            if reply[3] == 0xA5:
-                if reply[4] == self.SensorType[port_index]:
-                    return reply[5]
-                else:
-                    return SENSOR_STATE.INCORRECT_SENSOR_PORT
-            else:
-                raise IOError("get_sensor error: No SPI response")
-
-        elif (self.SensorType[port_index] == self.SENSOR_TYPE.NXT_LIGHT_ON
-              or self.SensorType[port_index] == self.SENSOR_TYPE.NXT_LIGHT_OFF
-              or self.SensorType[port_index] == self.SENSOR_TYPE.NXT_COLOR_RED
-              or self.SensorType[port_index] == self.SENSOR_TYPE.NXT_COLOR_GREEN
-              or self.SensorType[port_index] == self.SENSOR_TYPE.NXT_COLOR_BLUE
-              or self.SensorType[port_index] == self.SENSOR_TYPE.NXT_COLOR_OFF
-              or self.SensorType[port_index] == self.SENSOR_TYPE.EV3_GYRO_ABS
-              or self.SensorType[port_index] == self.SENSOR_TYPE.EV3_GYRO_DPS
-              or self.SensorType[port_index] == self.SENSOR_TYPE.EV3_ULTRASONIC_CM
-              or self.SensorType[port_index] == self.SENSOR_TYPE.EV3_ULTRASONIC_INCHES):
-            outArray = [self.SPI_Address, message_type, 0, 0, 0, 0, 0, 0]
-            reply = self.spi_transfer_array(outArray)
-            if reply[3] == 0xA5:
-                if reply[4] == self.SensorType[port_index]:
-                    return reply[5]
-                else:
-                    return SENSOR_STATE.INCORRECT_SENSOR_PORT
-            else:
-                raise IOError("get_sensor error: No SPI response")
-
-        elif (self.SensorType[port_index] == self.SENSOR_TYPE.EV3_COLOR_RAW_REFLECTED
-              or self.SensorType[port_index] == self.SENSOR_TYPE.EV3_GYRO_ABS_DPS):
-            outArray = [self.SPI_Address, message_type, 0, 0, 0, 0, 0, 0, 0, 0]
-            reply = self.spi_transfer_array(outArray)
-            if reply[3] == 0xA5:
-                if reply[4] == self.SensorType[port_index]:
-                    return reply[5]
-                else:
-                    return SENSOR_STATE.INCORRECT_SENSOR_PORT
-            else:
-                raise IOError("get_sensor error: No SPI response")
-
-        elif self.SensorType[port_index] == self.SENSOR_TYPE.EV3_COLOR_COLOR_COMPONENTS:
-            outArray = [self.SPI_Address, message_type,
-                        0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-            reply = self.spi_transfer_array(outArray)
-            if reply[3] == 0xA5:
-                if reply[4] == self.SensorType[port_index]:
-                    return reply[5]
-                else:
-                    return SENSOR_STATE.INCORRECT_SENSOR_PORT
-            else:
-                raise IOError("get_sensor error: No SPI response")
-
-        elif self.SensorType[port_index] == self.SENSOR_TYPE.EV3_INFRARED_SEEK:
-            outArray = [self.SPI_Address, message_type,
-                        0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-            reply = self.spi_transfer_array(outArray)
-            if reply[3] == 0xA5:
-                if reply[4] == self.SensorType[port_index]:
-                    return reply[5]
-                else:
-                    return SENSOR_STATE.INCORRECT_SENSOR_PORT
-            else:
-                raise IOError("get_sensor error: No SPI response")
-
-        elif self.SensorType[port_index] == self.SENSOR_TYPE.EV3_INFRARED_REMOTE:
-            outArray = [self.SPI_Address, message_type, 0, 0, 0, 0, 0, 0, 0, 0]
-            reply = self.spi_transfer_array(outArray)
-            if reply[3] == 0xA5:
-                if reply[4] == self.SensorType[port_index]:
-                    return reply[5]
-                else:
-                    return SENSOR_STATE.INCORRECT_SENSOR_PORT
-            else:
-                raise IOError("get_sensor error: No SPI response")
-
-        raise IOError(
-            "get_sensor error: Sensor not configured or not supported.")
+        bp = self.bp
+        request = self._status_requests[port_index]
+        sensor_type = bp.SensorType[port_index]
+        # The type may have been changed directly on the BrickPi3, bypassing set_sensor_type
+        if (request is None or request[0] != sensor_type or request[2] != bp.SPI_Address
+                or (sensor_type == _I2C_SENSOR_TYPE and request[1] != bp.I2CInBytes[port_index])):
+            request = self._build_status_request(port_index)
+            if request is None:
+                raise IOError(
+                    "get_sensor error: Sensor not configured or not supported.")
+
+        reply = self.spi_transfer_array(request[3])
+        if reply[3] != 0xA5:
+            raise IOError("get_sensor error: No SPI response")
+        if reply[4] in request[4]:
+            return reply[5]
+        return SENSOR_STATE.INCORRECT_SENSOR_PORT
 
 
 class Sensor:
@@ -349,7 +398,7 @@ class Sensor:
 
     def __init__(self, port: Literal[1, 2, 3, 4], bp=None):
         "Initialize sensor with a given port (1, 2, 3, or 4)."
-        self.brick = Brick(bp=bp)
+        self.brick = get_brick(bp)
         self.port = PORTS[str(port).upper()]
         Sensor.ALL_SENSORS[str(port)] = self
 
@@ -375,30 +424,326 @@ class Sensor:
             return error
 
     def get_value(self):
-        "Get the raw sensor value. May return a float, int, list or None if error."
+        """Get the raw sensor value. May return a float, int, list or None if error.
+
+        If a SensorPoller is running (see start_sensor_polling), the latest fresh
+        snapshot for this sensor is returned instead of reading the bus.
+        """
+        if POLLER is not None:
+            snapshot = POLLER.get_sensor_snapshot(self)
+            if snapshot is not None:
+                return snapshot.value
         try:
             return self.brick.get_sensor(self.port)
         except SensorError:
             return None
 
+    def get_snapshot(self) -> SensorSnapshot | None:
+        "Get the latest SensorSnapshot published for this sensor, or None if it is not being polled."
+        if POLLER is None:
+            return None
+        return POLLER.get_sensor_snapshot(self)
+
     def get_raw_value(self):
         "Get the raw sensor value. May return a float, int, list or None if error."
         return self.get_value()
 
-    def wait_ready(self):
-        "Wait (pause program) until the sensor is initialized."
+    def wait_ready(self, timeout: float = None) -> bool:
+        """
+        Wait (pause program) until the sensor is initialized.
+        Return True once it is ready, or False if timeout (seconds) elapsed first.
+        """
+        start = time.perf_counter()
         while self.get_status() != Sensor.Status.VALID_DATA:
+            if timeout is not None and time.perf_counter() - start >= timeout:
+                return False
             time.sleep(WAIT_READY_INTERVAL)
+        return True
+
+
+def wait_ready_sensors(debug=False, parallel=False, timeout: float | dict[str, float] = None) -> dict[str, float | None]:
+    """
+    Wait until every sensor in Sensor.ALL_SENSORS is initialized.
 
+    When parallel is False (the default), ports are waited on one after another.
+    When parallel is True, all ports are polled together in one loop, so the total
+    wait is that of the slowest sensor rather than the sum of all of them.
 
-def wait_ready_sensors(debug=False):
-    for port, sensor in Sensor.ALL_SENSORS.items():
-        if sensor is not None:
+    timeout - None to wait forever, seconds for every port, or a dict of port ('1' to '4') to seconds
+
+    Returns a report dict of port to the seconds it took to become ready, or None if it timed out.
+    """
+    sensors = {port: sensor for port, sensor in Sensor.ALL_SENSORS.items() if sensor is not None}
+    if parallel:
+        report = _wait_ready_parallel(sensors, timeout, debug)
+    else:
+        report = {}
+        for port, sensor in sensors.items():
             if debug:
                 print(f"Initializing Port {port}:", type(sensor).__name__)
-            sensor.wait_ready()
+            start = time.perf_counter()
+            ready = sensor.wait_ready(_port_timeout(timeout, port))
+            report[port] = time.perf_counter() - start if ready else None
     if debug:
-        print("All Sensors Initialized")
+        for port, elapsed in report.items():
+            if elapsed is None:
+                print(f"Port {port} timed out")
+        print("All Sensors Initialized" if None not in report.values() else "Sensor Initialization Incomplete")
+    return report
+
+
+def _port_timeout(timeout: float | dict[str, float] | None, port: str) -> float | None:
+    if isinstance(timeout, dict):
+        return timeout.get(port)
+    return timeout
+
+
+def _wait_ready_parallel(sensors: dict[str, Sensor], timeout, debug=False) -> dict[str, float | None]:
+    """
+    Poll the status of all given sensors together every WAIT_READY_INTERVAL,
+    until each one is ready or has reached its own timeout.
+    Returns a report of port to seconds taken (None if timed out).
+    """
+    report: dict[str, float | None] = {}
+    pending = dict(sensors)
+    if debug:
+        print("Initializing Ports", ", ".join(f"{port}: {type(sensor).__name__}"
+                                              for port, sensor in pending.items()))
+    start = time.perf_counter()
+    while pending:
+        for port, sensor in list(pending.items()):
+            try:
+                ready = sensor.get_status() == Sensor.Status.VALID_DATA
+            except IOError:
+                ready = False  # Not configured yet
+            elapsed = time.perf_counter() - start
+            port_timeout = _port_timeout(timeout, port)
+            if ready:
+                report[port] = elapsed
+                if debug:
+                    print(f"Port {port} ready after {elapsed:.3f}s")
+            elif port_timeout is not None and elapsed >= port_timeout:
+                report[port] = None
+            else:
+                continue
+            del pending[port]
+        if pending:
+            time.sleep(WAIT_READY_INTERVAL)
+    return {port: report[port] for port in sensors}
+
+
+def read_sensors(*sensors: Sensor) -> list:
+    """
+    Read the raw values of several sensors together, eg, both ultrasonic sensors
+    in one control loop tick. Fresh SensorPoller snapshots are used where available;
+    the rest are read in a single Brick.read_many burst per brick.
+
+    Returns the values in the same order as the sensors given (None if not ready).
+    """
+    values = [None] * len(sensors)
+    pending: dict[int, tuple[Brick, list[int], list[str]]] = {}
+    for i, sensor in enumerate(sensors):
+        snapshot = sensor.get_snapshot()
+        if snapshot is not None:
+            values[i] = snapshot.value
+            continue
+        brick, indices, names = pending.setdefault(id(sensor.brick), (sensor.brick, [], []))
+        indices.append(i)
+        names.append(_SENSOR_PORT_NAMES_BY_PORT[sensor.port])
+    for brick, indices, names in pending.values():
+        _, burst = brick.read_many(names)
+        for i, value in zip(indices, burst):
+            values[i] = value
+    return values
+
+
+class SensorSnapshot:
+    """
+    A timestamped reading of one sensor, published by the SensorPoller.
+    Snapshots are never modified after creation, so they can be shared between threads.
+    """
+    __slots__ = ('value', 'timestamp', 'sensor', 'mode')
+
+    def __init__(self, value, timestamp: float, sensor: Sensor, mode: str):
+        self.value = value
+        self.timestamp = timestamp
+        self.sensor = sensor
+        self.mode = mode
+
+    def age(self) -> float:
+        "Seconds elapsed since this snapshot was read (time.perf_counter based)."
+        return time.perf_counter() - self.timestamp
+
+    def __repr__(self):
+        return f"SensorSnapshot({self.value!r}, mode={self.mode!r}, age={self.age():.3f}s)"
+
+
+class SensorPoller:
+    """
+    Background service that owns the sensor bus. Every configured port in
+    Sensor.ALL_SENSORS is read on a single thread at its own rate, and the latest
+    reading is published as a SensorSnapshot. Readers never touch the bus or
+    wait on a lock; they pick up the most recent snapshot, so total bus traffic
+    depends only on the polling rates, not on the number of readers.
+
+    Example:
+
+    poller = start_sensor_polling(rates={'3': 100, '1': 100}, default_rate=20)
+    ULTRASONIC_SENSOR.get_cm()  # served from the latest snapshot
+    """
+    DEFAULT_RATE = 50  # reads per second, per port
+    DEFAULT_MAX_AGE = 0.5  # seconds before a snapshot is considered stale
+
+    def __init__(self, rates: dict[str, float] = None, default_rate: float = DEFAULT_RATE,
+                 max_age: float = DEFAULT_MAX_AGE):
+        """
+        rates - optional dict of port ('1' to '4') to reads per second
+        default_rate - reads per second for ports not listed in rates
+        max_age - snapshots older than this (seconds) are not served by get_sensor_snapshot
+        """
+        if default_rate <= 0:
+            raise ValueError("default_rate must be a positive number of reads per second")
+        self.default_rate = default_rate
+        self.max_age = max_age
+        self.rates: dict[str, float] = {}
+        for port, rate in ({} if rates is None else rates).items():
+            self.set_rate(port, rate)
+
+        self.snapshots: dict[str, SensorSnapshot] = {}
+        self._sensor_snapshots: dict[int, SensorSnapshot] = {}
+        self.read_count = 0
+        self.error_count = 0
+
+        self.run_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.thread = None
+
+    def set_rate(self, port: Literal[1, 2, 3, 4], rate: float):
+        "Set the number of reads per second for one port."
+        if rate <= 0:
+            raise ValueError("rate must be a positive number of reads per second")
+        self.rates[str(port)] = rate
+
+    def get_rate(self, port: Literal[1, 2, 3, 4]) -> float:
+        "Get the number of reads per second for one port."
+        return self.rates.get(str(port), self.default_rate)
+
+    def start(self) -> SensorPoller:
+        "Start the polling thread. Does nothing if it is already running."
+        if self.is_running():
+            return self
+        self.run_event.set()
+        self.wake_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        "Stop the polling thread and wait for it to finish its current read."
+        self.run_event.clear()
+        self.wake_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def is_running(self) -> bool:
+        return self.run_event.is_set()
+
+    def get_snapshot(self, port: Literal[1, 2, 3, 4]) -> SensorSnapshot | None:
+        "Get the latest snapshot of a port, however old it is. Never blocks."
+        return self.snapshots.get(str(port))
+
+    def get_sensor_snapshot(self, sensor: Sensor) -> SensorSnapshot | None:
+        """
+        Get the latest snapshot for this sensor object, if it is still valid.
+        Returns None if the port is not polled, the snapshot was taken by another
+        sensor object or in another mode, or it is older than max_age.
+        """
+        if not self.run_event.is_set():
+            return None
+        snapshot = self._sensor_snapshots.get(id(sensor))
+        if snapshot is None or snapshot.sensor is not sensor:
+            return None
+        if snapshot.mode != getattr(sensor, 'mode', None):
+            return None
+        if self.max_age is not None and snapshot.age() > self.max_age:
+            return None
+        return snapshot
+
+    def _poll(self, due: list[tuple[str, Sensor]]):
+        """Read the due sensors in one Brick.read_many burst per brick and publish the results.
+        Readings taken across a mode change are dropped."""
+        bursts: dict[int, list[tuple[str, Sensor, str]]] = {}
+        for port, sensor in due:
+            bursts.setdefault(id(sensor.brick), []).append(
+                (port, sensor, getattr(sensor, 'mode', None)))
+
+        for burst in bursts.values():
+            brick = burst[0][1].brick
+            try:
+                _, values = brick.read_many(
+                    [_SENSOR_PORT_NAMES_BY_PORT[sensor.port] for _, sensor, _ in burst])
+            except (SensorError, IOError, OSError):
+                self.error_count += len(burst)
+                continue
+            timestamp = time.perf_counter()
+            for (port, sensor, mode), value in zip(burst, values):
+                if value is None:
+                    self.error_count += 1
+                    continue
+                self.read_count += 1
+                if mode == getattr(sensor, 'mode', None):
+                    # Single dict assignments, so readers always see a complete snapshot
+                    snapshot = SensorSnapshot(value, timestamp, sensor, mode)
+                    self.snapshots[port] = snapshot
+                    self._sensor_snapshots[id(sensor)] = snapshot
+
+    def _run(self):
+        deadlines: dict[str, float] = {}
+        while self.run_event.is_set():
+            now = time.perf_counter()
+            next_deadline = now + 1 / self.default_rate
+            due = []
+            for port, sensor in list(Sensor.ALL_SENSORS.items()):
+                if sensor is None:
+                    continue
+                deadline = deadlines.get(port, now)
+                if deadline <= now:
+                    due.append((port, sensor))
+                    # Never try to catch up on missed reads; that would only burst the bus
+                    deadline = max(deadline + 1 / self.get_rate(port), now)
+                    deadlines[port] = deadline
+                next_deadline = min(next_deadline, deadline)
+            if due:
+                self._poll(due)
+            delay = next_deadline - time.perf_counter()
+            if delay > 0:
+                self.wake_event.wait(delay)
+
+
+POLLER: SensorPoller = None
+
+
+def start_sensor_polling(rates: dict[str, float] = None,
+                         default_rate: float = SensorPoller.DEFAULT_RATE,
+                         max_age: float = SensorPoller.DEFAULT_MAX_AGE) -> SensorPoller:
+    """
+    Start the background SensorPoller for all sensors in Sensor.ALL_SENSORS.
+    From then on, Sensor.get_value returns the latest snapshot instead of reading the bus.
+    Any previously started poller is stopped first.
+    """
+    global POLLER
+    stop_sensor_polling()
+    POLLER = SensorPoller(rates, default_rate, max_age).start()
+    return POLLER
+
+
+def stop_sensor_polling():
+    "Stop the background SensorPoller, so sensors read the bus directly again."
+    global POLLER
+    if POLLER is not None:
+        POLLER.stop()
+        POLLER = None
 
 
 class TouchSensor(Sensor):
@@ -639,6 +984,102 @@ class EV3GyroSensor(Sensor):
         return self.get_value()
 
 
+class ModeScheduler:
+    """
+    Serves reads in several modes of one sensor (eg, EV3ColorSensor in "component"
+    and "ambient" modes) while keeping mode switches rare. Every switch costs a
+    set_mode followed by a blocking wait_ready.
+
+    After switching into a mode, the scheduler stays there for at least batch live
+    reads. Meanwhile, reads in any other mode are served from the last value read in
+    that mode, as long as it is no older than max_stale seconds. A stale or missing
+    value always forces a switch, so cached values are never older than max_stale.
+
+    Example:
+
+    scheduler = ModeScheduler(COLOUR_SENSOR, batch=10, max_stale=0.25)
+    rgb = scheduler.read("component")
+    ambient = scheduler.read("ambient")
+    """
+    DEFAULT_BATCH = 5
+    DEFAULT_MAX_STALE = 0.5  # seconds
+
+    # The getter of each mode, for modes that post-process the raw value
+    GETTERS = {
+        EV3UltrasonicSensor.Mode.CM: 'get_cm',
+        EV3UltrasonicSensor.Mode.IN: 'get_inches',
+        EV3UltrasonicSensor.Mode.LISTEN: 'detects_other_us_sensor',
+        EV3ColorSensor.Mode.COMPONENT: 'get_rgb',
+        EV3ColorSensor.Mode.AMBIENT: 'get_ambient',
+        EV3ColorSensor.Mode.RED: 'get_red',
+        EV3GyroSensor.Mode.ABS: 'get_abs_measure',
+        EV3GyroSensor.Mode.DPS: 'get_dps_measure',
+        EV3GyroSensor.Mode.BOTH: 'get_both_measure',
+    }
+
+    def __init__(self, sensor: Sensor, batch: int = DEFAULT_BATCH, max_stale: float = DEFAULT_MAX_STALE):
+        """
+        sensor - the sensor to read, which must implement set_mode(mode)
+        batch - the minimum number of live reads made in a mode before switching away from it
+        max_stale - the maximum age in seconds of a cached value served for another mode
+        """
+        if type(batch) != int or batch <= 0:
+            raise ValueError("batch must be a positive integer")
+        self.sensor = sensor
+        self.batch = batch
+        self.max_stale = max_stale
+        self.cache: dict[str, tuple[object, float]] = {}
+        self.lock = threading.Lock()
+        self.held_reads = 0
+
+        self.mode_switches = 0
+        self.blocked_time = 0.0
+        self.live_reads = 0
+        self.cached_reads = 0
+
+    def read(self, mode: str):
+        """
+        Read the sensor in the given mode. Returns either a live value or, when the
+        sensor is held in another mode, a cached value no older than max_stale.
+        """
+        mode = mode.lower()
+        with self.lock:
+            if mode != self.sensor.mode:
+                cached = self.cache.get(mode)
+                if (cached is not None and self.held_reads < self.batch
+                        and time.perf_counter() - cached[1] <= self.max_stale):
+                    self.cached_reads += 1
+                    return cached[0]
+                self._switch(mode)
+
+            getter = self.GETTERS.get(mode)
+            value = getattr(self.sensor, getter)() if getter is not None else self.sensor.get_value()
+            self.cache[mode] = (value, time.perf_counter())
+            self.held_reads += 1
+            self.live_reads += 1
+            return value
+
+    def _switch(self, mode: str):
+        "Change the sensor mode and block until it is ready, counting the time spent."
+        start = time.perf_counter()
+        result = self.sensor.set_mode(mode)
+        if result is not True:
+            raise ValueError(f"Cannot set {type(self.sensor).__name__} to mode {mode!r}: {result}")
+        self.sensor.wait_ready()
+        self.blocked_time += time.perf_counter() - start
+        self.mode_switches += 1
+        self.held_reads = 0
+
+    def get_stats(self) -> dict[str, float]:
+        "Return the counters: mode switches, seconds blocked in switches, live and cached reads."
+        return {
+            'mode_switches': self.mode_switches,
+            'blocked_time': self.blocked_time,
+            'live_reads': self.live_reads,
+            'cached_reads': self.cached_reads,
+        }
+
+
 class Motor:
     "Motor class for any motor."
     INF = INF
@@ -651,7 +1092,7 @@ class Motor:
         You may also provide a list of these ports such as ["A", "C"] to run
         both motors at the exact same time (exact combined behavior unknown).
         """
-        self.brick = Brick(bp)
+        self.brick = get_brick(bp)
         self.set_port(port)
 
     def set_port(self, port):
@@ -961,6 +1402,7 @@ def configure_ports(*,
     ordered by sensor ports followed by motor ports.
 
     When wait is True (the default), the function will wait for the sensors to be ready before returning.
+    All sensors are configured first, then waited on together.
     When print_status is True (the default), the function will print two messages, the first to let the user
     know to wait until the ports are configured, and the second to indicate the port configuration is complete.
 
@@ -980,13 +1422,13 @@ def configure_ports(*,
     motors: list[Motor] = []
     for n, sensor_type in enumerate(sensor_ports, 1):
         if sensor_type:
-            sensor = sensor_type(n)
-            if wait:
-                if isinstance(sensor, (EV3UltrasonicSensor, EV3ColorSensor)):
-                    sensor.wait_ready()
-            if is_single_device:
-                return sensor
-            sensors.append(sensor)
+            sensors.append(sensor_type(n))
+    if wait:
+        # Bring up all the slow sensors together, instead of one after another
+        _wait_ready_parallel({_SENSOR_PORT_NAMES_BY_PORT[sensor.port]: sensor for sensor in sensors
+                              if isinstance(sensor, (EV3UltrasonicSensor, EV3ColorSensor))}, None)
+    if is_single_device and sensors:
+        return sensors[0]
     for letter, motor_type in zip("ABCD", motor_ports):
         if motor_type:
             if is_single_device:
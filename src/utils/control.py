@@ -0,0 +1,365 @@
+"""
+Module for running periodic control tasks, eg, wall following or sensor sweeps,
+at declared frequencies on a single deadline-based scheduler thread, instead of
+one thread with its own while/sleep loop per task, and for the emergency stop.
+
+Run "python3 -m utils.control" from the src directory to run its tests.
+"""
+
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+import time
+
+from .brick import MOTOR_PORT_NAMES, PORTS, SensorError, TouchSensor
+
+
+class ControlTask:
+    """
+    A function called periodically by a ControlLoop. Returning None keeps the task
+    running; returning any other value ends it, and that value becomes its result.
+
+    Timing statistics are kept for every tick:
+    latency - time spent inside the function
+    jitter - how late the tick started compared to its deadline
+    overruns - ticks that ended after the next tick was due (those deadlines are skipped)
+    """
+
+    def __init__(self, name: str, func, frequency: float, args: tuple = ()):
+        if frequency <= 0:
+            raise ValueError("frequency must be a positive number of ticks per second")
+        self.name = name
+        self.func = func
+        self.args = args
+        self.period = 1 / frequency
+        self.deadline = None
+
+        self.result = None
+        self.error: BaseException = None
+        self.done_event = threading.Event()
+        self.cancelled = False
+
+        self.ticks = 0
+        self.overruns = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+        self.total_jitter = 0.0
+        self.max_jitter = 0.0
+
+    def wait(self, timeout: float = None) -> bool:
+        "Wait until the task has ended. Returns False if timeout (seconds) elapsed first."
+        return self.done_event.wait(timeout)
+
+    def is_done(self) -> bool:
+        return self.done_event.is_set()
+
+    def cancel(self):
+        "End the task before its next tick. Its result stays None."
+        self.cancelled = True
+        self.done_event.set()
+
+    def get_stats(self) -> dict[str, float]:
+        "Return the tick count, overruns, and mean/max latency and jitter in seconds."
+        n = max(self.ticks, 1)
+        return {
+            'frequency': 1 / self.period,
+            'ticks': self.ticks,
+            'overruns': self.overruns,
+            'mean_latency': self.total_latency / n,
+            'max_latency': self.max_latency,
+            'mean_jitter': self.total_jitter / n,
+            'max_jitter': self.max_jitter,
+        }
+
+    def _finish(self, result=None, error: BaseException = None):
+        self.result = result
+        self.error = error
+        self.done_event.set()
+
+    def __repr__(self):
+        return f"ControlTask({self.name!r}, {1 / self.period:g}Hz, ticks={self.ticks})"
+
+
+class ControlLoop:
+    """
+    Runs registered ControlTasks at their frequencies on one scheduler thread.
+    Ticks of different tasks never overlap, so task functions must not block;
+    anything slow belongs in its own thread.
+
+    >>> loop = ControlLoop()
+    >>> counter = []
+    >>> def count_to_five():
+    ...     counter.append(len(counter))
+    ...     if len(counter) == 5:
+    ...         return "done"
+    >>> loop.run("count", count_to_five, 100)
+    'done'
+    >>> counter
+    [0, 1, 2, 3, 4]
+    >>> task = loop.add_task("forever", lambda: None, 200)
+    >>> time.sleep(0.1)
+    >>> 10 < task.get_stats()['ticks'] <= 21
+    True
+    >>> task.cancel()
+    >>> loop.stop()
+    """
+
+    def __init__(self):
+        self.tasks: list[ControlTask] = []
+        self.latest: dict[str, ControlTask] = {}
+        self._heap: list[tuple[float, int, ControlTask]] = []
+        self._counter = itertools.count()
+        self.condition = threading.Condition()
+        self.run_event = threading.Event()
+        self.thread = None
+
+    def add_task(self, name: str, func, frequency: float, *args) -> ControlTask:
+        """
+        Register func to be called frequency times per second with the given args,
+        starting as soon as possible. Starts the scheduler thread if needed.
+        """
+        task = ControlTask(name, func, frequency, args)
+        with self.condition:
+            task.deadline = time.perf_counter()
+            self.tasks.append(task)
+            self.latest[name] = task
+            heapq.heappush(self._heap, (task.deadline, next(self._counter), task))
+            self.condition.notify()
+        self.start()
+        return task
+
+    def run(self, name: str, func, frequency: float, *args, timeout: float = None):
+        """
+        Register a task and block until it ends. Returns the task's result, or raises
+        the exception raised by the task function. Cancels the task on timeout.
+        Cannot be called from inside a task function.
+        """
+        if threading.current_thread() is self.thread:
+            raise RuntimeError("ControlLoop.run cannot be called from a task; it would block the loop")
+        task = self.add_task(name, func, frequency, *args)
+        if not task.wait(timeout):
+            task.cancel()
+        if task.error is not None:
+            raise task.error
+        return task.result
+
+    def remove_task(self, task: ControlTask):
+        task.cancel()
+        with self.condition:
+            self.condition.notify()
+
+    def start(self) -> ControlLoop:
+        "Start the scheduler thread. Does nothing if it is already running."
+        with self.condition:
+            if self.run_event.is_set():
+                return self
+            self.run_event.set()
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        return self
+
+    def stop(self):
+        "Cancel every task and stop the scheduler thread."
+        with self.condition:
+            self.run_event.clear()
+            for task in self.tasks:
+                if not task.is_done():
+                    task.cancel()
+            self.condition.notify()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def is_running(self) -> bool:
+        return self.run_event.is_set()
+
+    def get_stats(self) -> dict[str, dict[str, float]]:
+        "Return the timing statistics of the latest task registered under each name, including ended ones."
+        with self.condition:
+            return {name: task.get_stats() for name, task in self.latest.items()}
+
+    def _next_task(self) -> ControlTask | None:
+        "Wait for the earliest deadline and pop its task. Returns None once stopped."
+        with self.condition:
+            while self.run_event.is_set():
+                if not self._heap:
+                    self.condition.wait()
+                    continue
+                deadline, _, task = self._heap[0]
+                if task.cancelled:
+                    heapq.heappop(self._heap)
+                    self.tasks.remove(task)
+                    continue
+                delay = deadline - time.perf_counter()
+                if delay > 0:
+                    self.condition.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+                return task
+            return None
+
+    def _run(self):
+        while (task := self._next_task()) is not None:
+            start = time.perf_counter()
+            try:
+                result = task.func(*task.args)
+            except Exception as err:
+                result = None
+                task._finish(error=err)
+            end = time.perf_counter()
+
+            latency = end - start
+            jitter = start - task.deadline
+            task.ticks += 1
+            task.total_latency += latency
+            task.max_latency = max(task.max_latency, latency)
+            task.total_jitter += jitter
+            task.max_jitter = max(task.max_jitter, jitter)
+
+            task.deadline += task.period
+            if end > task.deadline:
+                # Skip the deadlines that were missed instead of bursting to catch up
+                task.overruns += 1
+                task.deadline = end
+
+            with self.condition:
+                if result is not None and not task.is_done():
+                    task._finish(result)
+                if task.is_done():
+                    self.tasks.remove(task)
+                else:
+                    heapq.heappush(self._heap, (task.deadline, next(self._counter), task))
+
+
+class EmergencyStop:
+    """
+    Low-latency emergency stop for a touch sensor. A dedicated thread reads the sensor
+    every POLL_INTERVAL, bypassing any SensorPoller snapshot. When it is pressed (or
+    trigger() is called), every motor port of the sensor's brick is set to 0 power
+    first, then the registered callbacks run in order, then everything blocked in
+    sleep() or wait() is woken up, so it sees any flags set by the callbacks.
+
+    latency is the time from the last poll that saw the button released to all motors
+    being at 0, an upper bound of the time from the press itself. It should stay under
+    LATENCY_TARGET.
+
+    >>> from utils import dummy
+    >>> bp = dummy.BrickPi3()
+    >>> estop = EmergencyStop(TouchSensor(4, bp=bp)).start()
+    >>> for port in (bp.PORT_A, bp.PORT_B, bp.PORT_C, bp.PORT_D):
+    ...     bp.set_motor_power(port, -30)
+    >>> estop.sleep(0.05)
+    False
+    >>> pressed = time.perf_counter()
+    >>> bp.set_sensor(bp.PORT_4, 1)
+    >>> estop.wait(1)
+    True
+    >>> estop.stopped_at - pressed < EmergencyStop.LATENCY_TARGET
+    True
+    >>> estop.latency < EmergencyStop.LATENCY_TARGET
+    True
+    >>> [bp.get_motor_status(port)[1] for port in (bp.PORT_A, bp.PORT_B, bp.PORT_C, bp.PORT_D)]
+    [0, 0, 0, 0]
+    >>> estop.sleep(10)
+    True
+    >>> bp.set_sensor(bp.PORT_4, 0)
+    """
+    POLL_INTERVAL = 0.005  # seconds between touch sensor reads
+    LATENCY_TARGET = 0.02  # seconds from press to all motors at 0
+
+    def __init__(self, sensor: TouchSensor, motor_ports: tuple[str, ...] = MOTOR_PORT_NAMES):
+        self.sensor = sensor
+        self.brick = sensor.brick
+        self.motor_ports = tuple(PORTS[str(port).upper()] for port in motor_ports)
+        self.callbacks = []
+        self.triggered = False
+        self.event = threading.Event()
+        self.trigger_lock = threading.Lock()
+        self.run_event = threading.Event()
+        self.thread = None
+
+        self.released_at = None
+        self.stopped_at = None
+        self.latency = None
+        self.reason = None
+
+    def add_callback(self, func):
+        "Call func(reason) after the motors are stopped. Runs immediately if already triggered."
+        with self.trigger_lock:
+            self.callbacks.append(func)
+            triggered = self.triggered
+        if triggered:
+            func(self.reason)
+
+    def start(self) -> EmergencyStop:
+        "Start watching the touch sensor in a background thread."
+        if self.run_event.is_set():
+            return self
+        self.run_event.set()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        "Stop watching the touch sensor. Does not trigger the emergency stop."
+        self.run_event.clear()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def is_triggered(self) -> bool:
+        return self.triggered
+
+    def trigger(self, reason: str = "triggered"):
+        "Stop every motor, run the callbacks, then wake all waiting threads. Only acts once."
+        with self.trigger_lock:
+            if self.triggered:
+                return
+            self.triggered = True
+            for port in self.motor_ports:
+                try:
+                    self.brick.set_motor_power(port, 0)
+                except Exception:
+                    pass  # keep stopping the other motors
+            self.stopped_at = time.perf_counter()
+            if self.released_at is not None:
+                self.latency = self.stopped_at - self.released_at
+            self.reason = reason
+            callbacks = list(self.callbacks)
+        try:
+            for func in callbacks:
+                func(reason)
+        finally:
+            self.event.set()
+
+    def sleep(self, seconds: float) -> bool:
+        """
+        Sleep for the given number of seconds, waking up early if the emergency stop
+        is triggered. Returns True if it was triggered, ie, the caller should give up.
+        """
+        return self.event.wait(seconds)
+
+    def wait(self, timeout: float = None) -> bool:
+        "Block until the emergency stop is triggered. Returns False if timeout (seconds) elapsed first."
+        return self.event.wait(timeout)
+
+    def _run(self):
+        port = self.sensor.port
+        while self.run_event.is_set() and not self.triggered:
+            try:
+                pressed = self.brick.get_sensor(port) == 1
+            except SensorError:
+                pressed = False
+            if pressed:
+                self.trigger("touch sensor pressed")
+                break
+            self.released_at = time.perf_counter()
+            self.event.wait(self.POLL_INTERVAL)
+        self.run_event.clear()
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
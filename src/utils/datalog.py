@@ -0,0 +1,177 @@
+"""
+Module for recording timestamped sensor and motor samples into compact binary blocks,
+eg, to keep a full trace of a run for analysis afterwards. Logging a sample only
+appends a few bytes to a buffer, so it never blocks a control loop; blocks are
+compressed when they are taken from the log, normally by a background thread.
+
+Run "python3 -m utils.datalog" from the src directory to run its tests.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+import struct
+import threading
+import time
+import zlib
+
+# Ports that can be logged, in the order of their codes in a record
+PORT_NAMES = ('1', '2', '3', '4', 'A', 'B', 'C', 'D')
+_PORT_CODES = {name: i for i, name in enumerate(PORT_NAMES)}
+
+# A record is the time.time() timestamp, the port code and the number of values, then the values
+_RECORD = struct.Struct('!dBB')
+_VALUES = [struct.Struct(f'!{n}d') for n in range(256)]
+
+
+class SensorLog:
+    """
+    A log of (timestamp, port, value) samples, where value is a number, a list or tuple of
+    numbers (eg, color components or a motor status), or None.
+
+    Samples are packed into blocks of about block_size bytes. At most max_blocks finished
+    blocks are kept; when they are not taken fast enough the oldest is dropped, and counted
+    in dropped_blocks, so logging never waits.
+
+    >>> log = SensorLog(block_size=64)
+    >>> log.log('1', 25.5, timestamp=1.0)
+    >>> log.log('2', (10, 20, 30), timestamp=1.5)
+    >>> log.log('A', None, timestamp=2.0)
+    >>> log.log('3', [1, None, 3], timestamp=2.5)
+    Traceback (most recent call last):
+    ...
+    ValueError: cannot log [1, None, 3] for port 3: required argument is not a float
+    >>> log.flush()
+    >>> seq, data, count = log.pop_block()
+    >>> seq, count
+    (0, 3)
+    >>> SensorLog.decode(data)
+    [(1.0, '1', 25.5), (1.5, '2', (10.0, 20.0, 30.0)), (2.0, 'A', None)]
+    >>> log.pop_block(timeout=0) is None
+    True
+    """
+    DEFAULT_BLOCK_SIZE = 16384  # bytes before compression
+    DEFAULT_MAX_BLOCKS = 64
+    DEFAULT_FLUSH_INTERVAL = 1.0  # seconds before a partly filled block is shipped anyway
+    COMPRESSION_LEVEL = 1  # fast; sensor traces still compress well
+
+    def __init__(self, block_size: int = DEFAULT_BLOCK_SIZE, max_blocks: int = DEFAULT_MAX_BLOCKS,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL):
+        self.block_size = block_size
+        self.flush_interval = flush_interval
+        self.blocks = deque(maxlen=max_blocks)
+        self.condition = threading.Condition()
+
+        self.block = bytearray()
+        self.block_count = 0
+        self.block_started = None
+        self.next_seq = 0
+        self.samples = 0
+        self.dropped_blocks = 0
+
+    def log(self, port: str, value, timestamp: float = None):
+        """Record one sample of a port ('1' to '4' or 'A' to 'D'). timestamp defaults to time.time().
+        Raises ValueError for a value that cannot be logged, eg, a list containing None or
+        with more than 255 numbers; nothing is recorded then."""
+        code = _PORT_CODES[str(port).upper()]
+        if timestamp is None:
+            timestamp = time.time()
+        if value is None:
+            values = ()
+        elif isinstance(value, (list, tuple)):
+            values = value
+        else:
+            values = (value,)
+        if len(values) >= len(_VALUES):
+            raise ValueError(f"cannot log more than {len(_VALUES) - 1} values in one sample, not {len(values)}")
+        # Pack the whole record before it is added, so a bad value never leaves half a record in the block
+        try:
+            record = _RECORD.pack(timestamp, code, len(values)) + _VALUES[len(values)].pack(*values)
+        except struct.error as err:
+            raise ValueError(f"cannot log {value!r} for port {port}: {err}") from None
+
+        with self.condition:
+            if self.block_started is None:
+                self.block_started = time.perf_counter()
+            self.block += record
+            self.block_count += 1
+            self.samples += 1
+            if len(self.block) >= self.block_size:
+                self._finish_block()
+
+    def log_many(self, ports, values, timestamp: float = None):
+        """Record one sample for each port, with the same timestamp, eg, the result of Brick.read_many.
+        A value that cannot be logged is recorded as None, so one bad reading does not stop a sampler."""
+        if timestamp is None:
+            timestamp = time.time()
+        for port, value in zip(ports, values):
+            try:
+                self.log(port, value, timestamp)
+            except ValueError:
+                self.log(port, None, timestamp)
+
+    def flush(self):
+        "Finish the current block, even if it is not full, so that it can be taken."
+        with self.condition:
+            if self.block_count:
+                self._finish_block()
+
+    def pop_block(self, timeout: float = None) -> tuple[int, bytes, int] | None:
+        """
+        Take the oldest finished block, waiting up to timeout seconds for one (forever if None).
+        A partly filled block older than flush_interval is finished first.
+        Returns (sequence number, zlib compressed data, number of samples), or None on timeout.
+        Gaps in the sequence numbers are dropped blocks.
+        """
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        with self.condition:
+            while not self.blocks:
+                now = time.perf_counter()
+                if self.block_started is not None and now - self.block_started >= self.flush_interval:
+                    self._finish_block()
+                    break
+                wait = self.flush_interval
+                if self.block_started is not None:
+                    wait = self.block_started + self.flush_interval - now
+                if deadline is not None:
+                    if now >= deadline:
+                        return None
+                    wait = min(wait, deadline - now)
+                self.condition.wait(wait)
+            seq, raw, count = self.blocks.popleft()
+        # Compress outside the lock, so logging is never held up by it
+        return seq, zlib.compress(raw, self.COMPRESSION_LEVEL), count
+
+    def _finish_block(self):
+        if len(self.blocks) == self.blocks.maxlen:
+            self.dropped_blocks += 1
+        self.blocks.append((self.next_seq, bytes(self.block), self.block_count))
+        self.next_seq += 1
+        self.block = bytearray()
+        self.block_count = 0
+        self.block_started = None
+        self.condition.notify_all()
+
+    @staticmethod
+    def decode(data: bytes) -> list[tuple[float, str, float | tuple | None]]:
+        "Decode a compressed block from pop_block into its (timestamp, port, value) samples."
+        raw = zlib.decompress(data)
+        samples = []
+        offset = 0
+        while offset < len(raw):
+            timestamp, code, n = _RECORD.unpack_from(raw, offset)
+            offset += _RECORD.size
+            if n == 0:
+                value = None
+            else:
+                value = _VALUES[n].unpack_from(raw, offset)
+                offset += _VALUES[n].size
+                if n == 1:
+                    value = value[0]
+            samples.append((timestamp, PORT_NAMES[code], value))
+        return samples
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
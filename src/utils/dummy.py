@@ -477,6 +477,8 @@ class BrickPi3():
     def get_sensor(self, port):
         i, _ = self._convert_port(port)
         sensorType = self.SensorType[i]
+        if sensorType not in self._internal_data:
+            raise SensorError("get_sensor error: Sensor not configured or not supported.")
 
         return self._internal_data[sensorType]
 
@@ -525,6 +527,34 @@ class BrickPi3():
     def reset_all(self):
         pass
 
+    def read_many(self, ports):
+        """Read several sensor and motor ports in one burst.
+        Mirrors brick.Brick.read_many: ports are names '1' to '4' (sensors) or 'A' to 'D' (motors).
+
+        Returns (timestamp, values) with one value per requested port, in order.
+        """
+        calls = []
+        for name in ports:
+            name = str(name).upper()
+            if name in ('1', '2', '3', '4'):
+                calls.append((self.get_sensor, 2**(int(name)-1)))
+            elif name in ('A', 'B', 'C', 'D'):
+                calls.append((self.get_motor_status, 2**'ABCD'.index(name)))
+            else:
+                raise IOError(f"read_many error. Unknown port {name!r}, must be 1, 2, 3, 4, A, B, C, or D.")
+        values = []
+        for getter, port in calls:
+            try:
+                values.append(getter(port))
+            except (SensorError, IOError, ValueError):
+                values.append(None)
+        return (time.time(), tuple(values))
+
+    def read_all_sensors(self):
+        """Read the four sensor ports in one burst.
+        Returns (timestamp, values) with None for ports that are not configured."""
+        return self.read_many(('1', '2', '3', '4'))
+
 
 class Brick(BrickPi3):
     """
@@ -0,0 +1,366 @@
+"""
+Module for state estimators: alpha-beta and Kalman filters that track a distance and
+its rate of change, and a wall estimator that fuses both ultrasonic sensors with the
+odometry. Like the filters in utils.filters, values are added with append and the
+estimate is read with get_value.
+
+Unlike a moving average, these filters keep a rate estimate, so they follow a steadily
+changing distance (eg, while driving towards a wall) without lagging behind it.
+
+Run "python3 -m utils.estimators" from the src directory to run its tests.
+"""
+
+from __future__ import annotations
+
+import math
+import time
+
+from .odometry import Odometer, Pose
+
+ULTRASONIC_MAX_CM = 255  # reading of an EV3 ultrasonic sensor that sees nothing
+
+
+class AlphaBetaFilter:
+    """
+    Tracks a value and its rate of change (per second) with fixed gains: each measurement
+    corrects the predicted value by alpha times the residual, and the rate by beta times
+    the residual per second. Higher gains follow faster but smooth less.
+
+    >>> f = AlphaBetaFilter(0.5, 0.1)
+    >>> for i in range(50):
+    ...     f.append(100 - 2 * i, timestamp=i * 0.1)   # closing in at 20 cm/s
+    >>> round(f.get_value(), 1), round(f.get_rate(), 1)
+    (2.0, -20.0)
+    >>> round(f.predict_value(5.0), 1)
+    0.0
+    """
+    __slots__ = ('alpha', 'beta', 'value', 'rate', 'timestamp')
+
+    def __init__(self, alpha: float = 0.5, beta: float = 0.1):
+        if not 0 < alpha <= 1 or not 0 <= beta <= 2:
+            raise ValueError("alpha must be in (0, 1] and beta in [0, 2]")
+        self.alpha = alpha
+        self.beta = beta
+        self.value = None
+        self.rate = 0.0
+        self.timestamp = None
+
+    def append(self, value: float | None, timestamp: float = None):
+        """Add a measurement taken at timestamp (time.perf_counter() by default).
+        None only moves the estimate forward in time, eg, when the sensor was not ready."""
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        if self.value is None:
+            if value is not None:
+                self.value = value
+                self.timestamp = timestamp
+            return
+        dt = timestamp - self.timestamp
+        self.timestamp = timestamp
+        self.value += self.rate * dt
+        if value is None:
+            return
+        residual = value - self.value
+        self.value += self.alpha * residual
+        if dt > 0:
+            self.rate += self.beta * residual / dt
+
+    def get_value(self) -> float | None:
+        return self.value
+
+    def get_rate(self) -> float:
+        return self.rate
+
+    def predict_value(self, timestamp: float = None) -> float | None:
+        "The value extrapolated to timestamp (now by default)."
+        if self.value is None:
+            return None
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        return self.value + self.rate * (timestamp - self.timestamp)
+
+
+class KalmanFilter:
+    """
+    Constant-velocity Kalman filter of a value and its rate of change (per second).
+
+    process_noise - how much the rate can change, as the spectral density of a random
+        acceleration, in (units/s^2)^2 per Hz. Higher follows manoeuvres faster.
+    measurement_noise - variance of a measurement, in units^2
+    gate - reject measurements further than this many standard deviations from the
+        prediction, eg, ultrasonic spikes. None accepts everything. After MAX_REJECTED
+        rejections in a row, the estimate is assumed to be lost, and restarts from the
+        next measurement.
+
+    Besides measurements of the value (append, update), measurements of the rate can be
+    added with update_rate, eg, the speed of the robot from its odometry.
+
+    >>> f = KalmanFilter(process_noise=1, measurement_noise=0.25, gate=4)
+    >>> for i in range(50):
+    ...     reading = 100 - 2 * i + (0.5 if i % 2 else -0.5)
+    ...     _ = f.append(80 if i == 30 else reading, timestamp=i * 0.1)   # one spike
+    >>> round(f.get_value()), round(f.get_rate()), f.rejected
+    (2, -20, 1)
+    """
+    __slots__ = ('process_noise', 'measurement_noise', 'gate', 'value', 'rate',
+                 'p00', 'p01', 'p11', 'timestamp', 'rejected', 'rejected_in_row')
+
+    INITIAL_RATE_VARIANCE = 100.0
+    MAX_REJECTED = 5
+
+    def __init__(self, process_noise: float = 1.0, measurement_noise: float = 1.0, gate: float = None):
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.gate = gate
+        self.value = None
+        self.rate = 0.0
+        # Covariance of (value, rate)
+        self.p00 = self.p01 = self.p11 = 0.0
+        self.timestamp = None
+        self.rejected = 0
+        self.rejected_in_row = 0
+
+    def reset(self, value: float, variance: float = None, rate: float = 0.0,
+              rate_variance: float = INITIAL_RATE_VARIANCE, timestamp: float = None):
+        self.value = value
+        self.rate = rate
+        self.p00 = self.measurement_noise if variance is None else variance
+        self.p01 = 0.0
+        self.p11 = rate_variance
+        self.timestamp = time.perf_counter() if timestamp is None else timestamp
+
+    def predict(self, timestamp: float = None):
+        "Move the estimate forward to timestamp (time.perf_counter() by default)."
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        if self.value is None:
+            self.timestamp = timestamp
+            return
+        dt = timestamp - self.timestamp
+        self.timestamp = timestamp
+        if dt <= 0:
+            return
+        q = self.process_noise
+        self.value += self.rate * dt
+        self.p00 += dt * (2 * self.p01 + dt * self.p11) + q * dt ** 3 / 3
+        self.p01 += dt * self.p11 + q * dt ** 2 / 2
+        self.p11 += q * dt
+
+    def update(self, value: float, variance: float = None) -> bool:
+        """Correct the estimate with a measurement of the value, taken at the current timestamp.
+        Returns False if it was rejected by the gate."""
+        r = self.measurement_noise if variance is None else variance
+        if self.value is None or self.rejected_in_row >= self.MAX_REJECTED:
+            self.reset(value, r, timestamp=self.timestamp)
+            self.rejected_in_row = 0
+            return True
+        residual = value - self.value
+        s = self.p00 + r
+        if self.gate is not None and residual * residual > self.gate * self.gate * s:
+            self.rejected += 1
+            self.rejected_in_row += 1
+            return False
+        self.rejected_in_row = 0
+        k0 = self.p00 / s
+        k1 = self.p01 / s
+        self.value += k0 * residual
+        self.rate += k1 * residual
+        self.p11 -= k1 * self.p01
+        self.p01 -= k0 * self.p01
+        self.p00 -= k0 * self.p00
+        return True
+
+    def update_rate(self, rate: float, variance: float):
+        "Correct the estimate with a measurement of the rate, taken at the current timestamp."
+        if self.value is None:
+            return
+        residual = rate - self.rate
+        s = self.p11 + variance
+        k0 = self.p01 / s
+        k1 = self.p11 / s
+        self.value += k0 * residual
+        self.rate += k1 * residual
+        self.p00 -= k0 * self.p01
+        self.p01 -= k0 * self.p11
+        self.p11 -= k1 * self.p11
+
+    def append(self, value: float | None, timestamp: float = None) -> bool:
+        """Predict to timestamp (time.perf_counter() by default), then correct with the measurement.
+        None only predicts. Returns False if the measurement was rejected by the gate."""
+        self.predict(timestamp)
+        if value is None:
+            return False
+        return self.update(value)
+
+    def get_value(self) -> float | None:
+        return self.value
+
+    def get_rate(self) -> float:
+        return self.rate
+
+    def get_variance(self) -> float:
+        return self.p00
+
+    def predict_value(self, timestamp: float = None) -> float | None:
+        "The value extrapolated to timestamp (now by default), without changing the estimate."
+        if self.value is None:
+            return None
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        return self.value + self.rate * (timestamp - self.timestamp)
+
+
+class WallEstimator:
+    """
+    Estimates the distance to the wall on the left, the angle of the robot to that wall,
+    and the distance to and closing speed of the wall in front, by fusing the left and
+    front ultrasonic readings with the odometry.
+
+    Between readings, the odometry moves the estimates: driving ds cm at wall angle a
+    brings the robot ds * sin(a) closer to the left wall, and turning changes a directly.
+    Each left reading (wall distance / cos(a)) then corrects both the distance and the
+    angle, in an extended Kalman filter, so the angle is estimated even though a single
+    sensor cannot measure it. The front distance is a KalmanFilter whose rate is also
+    measured from the odometry. Readings that are out of range, or spikes further than
+    gate standard deviations from the prediction, are ignored (see KalmanFilter.MAX_REJECTED).
+
+    Every update is O(1), and the estimates are for the time of the latest pose, so
+    using them adds no window delay to a control loop.
+
+    Angles are in degrees, positive when the robot heads towards the left wall.
+
+    >>> est = WallEstimator(gate=None)
+    >>> angle = math.radians(5)   # heading 5 degrees towards a wall 30 cm to the left
+    >>> for i in range(100):
+    ...     t, s = i * 0.05, i * 0.5   # 10 cm/s
+    ...     pose = Pose(t, s * math.cos(angle), s * math.sin(angle), angle)
+    ...     left = (30 - pose.y) / math.cos(angle)
+    ...     front = (200 - pose.x) / math.cos(angle)
+    ...     est.update(front, left, pose)
+    >>> round(est.get_value(), 1), round(est.get_wall_angle(), 1)
+    (25.7, 5.0)
+    >>> round(est.get_front_distance()), round(est.get_closing_speed())
+    (151, 10)
+    """
+    # Standard deviations
+    ULTRASONIC_NOISE = 0.5  # cm, of a reading
+    DISTANCE_NOISE = 0.05  # cm per cm driven, of the odometry
+    HEADING_NOISE = 0.1  # fraction of each turn, of the odometry
+    WALL_NOISE = 0.005  # radians per sqrt(cm) driven, for walls that are not straight
+    INITIAL_ANGLE_NOISE = math.radians(20)
+    SPEED_NOISE = 2.0  # cm/s, of the speed from the odometry
+    FRONT_PROCESS_NOISE = 100.0  # (cm/s^2)^2 per Hz, accelerations of the closing speed
+
+    def __init__(self, odometer: Odometer = None, gate: float = 4.0, max_cm: float = ULTRASONIC_MAX_CM):
+        self.odometer = odometer
+        self.gate = gate
+        self.max_cm = max_cm
+        self.front = KalmanFilter(self.FRONT_PROCESS_NOISE, self.ULTRASONIC_NOISE ** 2, gate)
+
+        self.distance = None
+        self.angle = 0.0
+        # Covariance of (distance, angle)
+        self.pdd = self.pda = self.paa = 0.0
+        self.pose: Pose = None
+        self.rejected = 0
+        self.rejected_in_row = 0
+
+    def reset(self):
+        "Forget the estimates, eg, after turning to follow another wall."
+        self.front = KalmanFilter(self.FRONT_PROCESS_NOISE, self.ULTRASONIC_NOISE ** 2, self.gate)
+        self.distance = None
+        self.angle = 0.0
+        self.pose = None
+        self.rejected_in_row = 0
+
+    def update(self, front_cm: float | None, left_cm: float | None, pose: Pose = None):
+        """Add one reading of each ultrasonic sensor (None if not ready) taken at pose,
+        the odometer's latest pose by default."""
+        if pose is None:
+            pose = self.odometer.get_pose()
+        self._predict(pose)
+        if self._valid(left_cm):
+            self._update_left(left_cm)
+        if self._valid(front_cm):
+            self.front.update(front_cm)
+
+    def append(self, readings: tuple[float | None, float | None]):
+        "Add the (front_cm, left_cm) readings, eg, from read_sensors(front, left), at the latest pose."
+        self.update(*readings)
+
+    def _valid(self, reading) -> bool:
+        return reading is not None and 0 < reading < self.max_cm
+
+    def _predict(self, pose: Pose):
+        previous, self.pose = self.pose, pose
+        if previous is None:
+            self.front.predict(pose.timestamp)
+            return
+        dt = pose.timestamp - previous.timestamp
+        turn = math.remainder(pose.heading - previous.heading, math.tau)
+        mid_heading = previous.heading + turn / 2
+        ds = (pose.x - previous.x) * math.cos(mid_heading) + (pose.y - previous.y) * math.sin(mid_heading)
+
+        if self.distance is not None:
+            mid_angle = self.angle + turn / 2
+            a = -ds * math.cos(mid_angle)  # derivative of the new distance by the angle
+            self.distance -= ds * math.sin(mid_angle)
+            self.angle += turn
+            self.pdd += 2 * a * self.pda + a * a * self.paa + (self.DISTANCE_NOISE * ds) ** 2
+            self.pda += a * self.paa
+            self.paa += (self.HEADING_NOISE * turn) ** 2 + self.WALL_NOISE ** 2 * abs(ds)
+
+        self.front.predict(pose.timestamp)
+        if dt > 0:
+            self.front.update_rate(-ds / dt, self.SPEED_NOISE ** 2)
+
+    def _update_left(self, reading: float):
+        r = self.ULTRASONIC_NOISE ** 2
+        if self.distance is None or self.rejected_in_row >= KalmanFilter.MAX_REJECTED:
+            # First reading, or the estimate is lost: start again from this reading
+            self.rejected_in_row = 0
+            self.distance = reading
+            self.angle = 0.0
+            self.pdd, self.pda, self.paa = r, 0.0, self.INITIAL_ANGLE_NOISE ** 2
+            return
+        c = math.cos(self.angle)
+        # The reading is along the sensor's axis: distance / cos(angle)
+        h0 = 1 / c
+        h1 = self.distance * math.sin(self.angle) / (c * c)
+        residual = reading - self.distance / c
+        ph0 = self.pdd * h0 + self.pda * h1
+        ph1 = self.pda * h0 + self.paa * h1
+        s = h0 * ph0 + h1 * ph1 + r
+        if self.gate is not None and residual * residual > self.gate * self.gate * s:
+            self.rejected += 1
+            self.rejected_in_row += 1
+            return
+        self.rejected_in_row = 0
+        k0 = ph0 / s
+        k1 = ph1 / s
+        self.distance += k0 * residual
+        self.angle += k1 * residual
+        self.pdd -= k0 * ph0
+        self.pda -= k0 * ph1
+        self.paa -= k1 * ph1
+
+    def get_value(self) -> float | None:
+        "Distance to the left wall in cm, perpendicular to it, or None before the first reading."
+        return self.distance
+
+    def get_wall_angle(self) -> float:
+        "Angle of the robot to the left wall in degrees, positive when heading towards it."
+        return math.degrees(self.angle)
+
+    def get_front_distance(self) -> float | None:
+        "Distance to the wall in front in cm, along the front sensor's axis."
+        return self.front.get_value()
+
+    def get_closing_speed(self) -> float:
+        "Speed at which the front wall gets closer, in cm/s."
+        return -self.front.get_rate()
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
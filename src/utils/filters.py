@@ -5,9 +5,12 @@ Changes to the source list result in changes in the filters' results.
 Author: Ryan Au
 """
 
+import heapq
 import math
 import time
+from array import array
 from collections import UserList, deque
+from itertools import accumulate
 from statistics import mean, median
 import threading
 
@@ -452,15 +455,245 @@ class CircularList(AtomicActor):
         raise Exception("Unimplemented function")
 
 
+class RingBuffer:
+    """A fixed-size circular buffer of numbers, stored in a typed array.array.
+
+    Unlike CircularList, free slots hold no placeholder objects: the buffer keeps a head
+    index and a length, so append, pop and pophead are O(1), and extend, to_list, count
+    and the in operator work on whole array slices instead of looping in Python.
+
+    typecode - the array.array typecode of the elements, 'd' (float) by default
+    threadsafe - if True, every method holds a lock. Use False when a single thread
+        writes and reads the buffer, to skip the locking.
+
+    >>> r = RingBuffer(3)
+    >>> r.append(1)
+    >>> r.extend([2, 3, 4])
+    >>> r
+    RingBuffer([2.0, 3.0, 4.0])
+    >>> r.append(5)
+    2.0
+    >>> r[0], r[-1], len(r)
+    (3.0, 5.0, 3)
+    >>> r.pop(), r.pophead(), r.to_list()
+    (5.0, 3.0, [4.0])
+    >>> r = RingBuffer(4, typecode='i', threadsafe=False)
+    >>> r.extend(range(10))
+    >>> r.to_list(), 7 in r, 2 in r, r.count(9), r.index(8)
+    ([6, 7, 8, 9], True, False, 1, 2)
+    >>> r[1:3], list(reversed(r))
+    ([7, 8], [9, 8, 7, 6])
+    """
+
+    def __init__(self, size: int, typecode: str = 'd', threadsafe: bool = True):
+        if type(size) != int:
+            raise ValueError("size must be of type int")
+        if size <= 0:
+            raise ValueError("size must be positive non-zero value")
+        self.size = size
+        self.typecode = typecode
+        self.data = array(typecode, bytes(array(typecode).itemsize * size))
+        self.head = 0
+        self.length = 0
+        self.lock = threading.Lock() if threadsafe else None
+
+    def __repr__(self):
+        return f"RingBuffer({self.to_list()!r})"
+
+    def append(self, value):
+        """Append a value. Returns the oldest value if it was overwritten, otherwise None."""
+        if self.lock is None:
+            return self._append(value)
+        with self.lock:
+            return self._append(value)
+
+    def _append(self, value):
+        i = self.head + self.length
+        if i >= self.size:
+            i -= self.size
+        if self.length == self.size:
+            old = self.data[i]
+            self.data[i] = value
+            self.head = i + 1 if i + 1 < self.size else 0
+            return old
+        self.data[i] = value
+        self.length += 1
+        return None
+
+    def extend(self, iterable):
+        """Append every value of the iterable, overwriting the oldest values as needed.
+
+        >>> r = RingBuffer(5, typecode='i')
+        >>> r.extend([1, 2, 3])
+        >>> r.extend([4, 5, 6, 7])
+        >>> r.to_list(), r.head
+        ([3, 4, 5, 6, 7], 2)
+        >>> r.extend(range(100))
+        >>> r.to_list()
+        [95, 96, 97, 98, 99]
+        """
+        values = iterable if isinstance(iterable, array) and iterable.typecode == self.typecode \
+            else array(self.typecode, iterable)
+        if self.lock is None:
+            self._extend(values)
+        else:
+            with self.lock:
+                self._extend(values)
+
+    def _extend(self, values: array):
+        n = len(values)
+        size = self.size
+        if n >= size:
+            self.data[:] = values[n - size:]
+            self.head = 0
+            self.length = size
+            return
+        # Copy into at most two slices: up to the end of the array, then from its start
+        start = (self.head + self.length) % size
+        first = min(n, size - start)
+        self.data[start:start + first] = values[:first]
+        if first < n:
+            self.data[:n - first] = values[first:]
+        overflow = self.length + n - size
+        if overflow > 0:
+            self.head = (self.head + overflow) % size
+            self.length = size
+        else:
+            self.length += n
+
+    update = extend
+
+    def pop(self):
+        """Remove the last added value and return it."""
+        if self.lock is None:
+            return self._pop()
+        with self.lock:
+            return self._pop()
+
+    def _pop(self):
+        if self.length == 0:
+            raise RuntimeError("There are no items in this list")
+        self.length -= 1
+        return self.data[(self.head + self.length) % self.size]
+
+    poptail = pop
+
+    def pophead(self):
+        """Remove the first added value and return it."""
+        if self.lock is None:
+            return self._pophead()
+        with self.lock:
+            return self._pophead()
+
+    def _pophead(self):
+        if self.length == 0:
+            raise RuntimeError("There are no items in this list")
+        item = self.data[self.head]
+        self.head = self.head + 1 if self.head + 1 < self.size else 0
+        self.length -= 1
+        return item
+
+    def clear(self):
+        self.head = 0
+        self.length = 0
+
+    def _segments(self) -> tuple[array, array]:
+        """The values as one or two array slices, oldest first. Copies of the data."""
+        if self.lock is not None:
+            with self.lock:
+                return self._unlocked_segments()
+        return self._unlocked_segments()
+
+    def _unlocked_segments(self) -> tuple[array, array]:
+        end = self.head + self.length
+        if end <= self.size:
+            return self.data[self.head:end], self.data[:0]
+        return self.data[self.head:], self.data[:end - self.size]
+
+    def to_array(self) -> array:
+        "Returns the values in an array.array, oldest first."
+        first, second = self._segments()
+        first += second
+        return first
+
+    def to_list(self) -> list:
+        "Returns the values in a list, oldest first."
+        return self.to_array().tolist()
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return iter(self.to_list())
+
+    def __reversed__(self):
+        return reversed(self.to_list())
+
+    def _wrap(self, i: int) -> int:
+        if i < 0:
+            i += self.length
+        if not 0 <= i < self.length:
+            raise IndexError("Index out of bounds")
+        i += self.head
+        return i - self.size if i >= self.size else i
+
+    def __getitem__(self, i: slice | int):
+        if type(i) == slice:
+            return self.to_list()[i]
+        return self.data[self._wrap(i)]
+
+    def __setitem__(self, i: int, value):
+        self.data[self._wrap(i)] = value
+
+    def __contains__(self, value):
+        if self.length == self.size:
+            # Every slot holds a value, so search the array as is, without copying it
+            return value in self.data
+        first, second = self._segments()
+        return value in first or value in second
+
+    def count(self, value) -> int:
+        if self.length == self.size:
+            return self.data.count(value)
+        first, second = self._segments()
+        return first.count(value) + second.count(value)
+
+    def index(self, value) -> int:
+        return self.to_array().index(value)
+
+    def copy(self) -> 'RingBuffer':
+        c = RingBuffer(self.size, self.typecode, self.lock is not None)
+        c.extend(self.to_array())
+        return c
+
+
 class WindowedFilter(AtomicActor):
-    def __init__(self, window_size=10):
+    """A filter of the last window_size values appended.
+
+    history - the number of outputs kept in queue (see to_list), DEFAULT_HISTORY by default.
+        None keeps every output; at least the latest output is always kept, for get_value.
+
+    A None value, eg, from a sensor that is not ready, takes its place in the window
+    but is left out of the statistic (it is kept as NaN in the window's array).
+
+    >>> m = MeanWindow(2)
+    >>> m.append(1)
+    >>> m.append(None)
+    >>> m.get_value(), m.get_inner_list()
+    (0.5, [1.0, None])
+    >>> m.append_many([4, None]).tolist()
+    [2.0, 2.0]
+    """
+    DEFAULT_HISTORY = 1000
+
+    def __init__(self, window_size=10, history=DEFAULT_HISTORY):
         if type(window_size) != int or window_size <= 0:
             raise RuntimeError(
                 "window_size is an invalid value. Must be a positive integer.")
 
         self.window_size = window_size
-        self.queue = deque()
-        self.circ = CircularList(self.window_size)
+        self.queue = deque(maxlen=None if history is None else max(1, history))
+        self.circ = RingBuffer(self.window_size)
 
     def __appender__(self, in_value, out_value):
         """The method to be overriden, when subclassing WindowedFilter.
@@ -471,7 +704,7 @@ class WindowedFilter(AtomicActor):
         return in_value
 
     def get_inner_list(self):
-        return self.circ.to_list()
+        return [None if math.isnan(value) else value for value in self.circ]
 
     def to_list(self):
         return list(self.queue)
@@ -483,18 +716,48 @@ class WindowedFilter(AtomicActor):
             return None
 
     def append(self, value, **kwargs):
-        out_value = self.circ.append(value)
-        if isinstance(out_value, CircularList.Empty):
+        out_value = self.circ.append(math.nan if value is None else value)
+        if out_value is not None and math.isnan(out_value):
             out_value = None
         in_value = self.__appender__(value, out_value, **kwargs)
         self.queue.append(in_value)
 
+    def append_many(self, values, **kwargs) -> array:
+        """Append every value in order, eg, when replaying logged data.
+        Returns the output after each value, in an array of floats.
+
+        Subclasses compute all the outputs in one pass where they can.
+        """
+        outputs = array('d')
+        for value in values:
+            self.append(value, **kwargs)
+            output = self.queue[-1]
+            outputs.append(math.nan if output is None else output)
+        return outputs
+
+    def _all_present(self, values) -> bool:
+        """Whether neither the values nor the window hold a None value, so that
+        append_many can compute the outputs in one pass."""
+        return None not in values and not any(math.isnan(value) for value in self.circ)
+
+    def _window_sums(self, values) -> tuple[array, list]:
+        """Append the values to the window, and return them in an array, with the sum
+        of the window after each one, from prefix sums of the old window and the values."""
+        values = values if isinstance(values, array) and values.typecode == 'd' else array('d', values)
+        old = self.circ.to_array()
+        m = len(old)
+        w = self.window_size
+        prefix = list(accumulate(old + values, initial=0.0))
+        sums = [prefix[i] - prefix[i - w if i > w else 0] for i in range(m + 1, len(prefix))]
+        self.circ.extend(values)
+        return values, sums
+
     def pop(self):
         try:
             out_value = self.circ.pop()
-        except:
+        except RuntimeError:
             out_value = None
-        if isinstance(out_value, CircularList.Empty):
+        if out_value is not None and math.isnan(out_value):
             out_value = None
         _ = self.__appender__(None, out_value)
         try:
@@ -512,11 +775,38 @@ class WindowedFilter(AtomicActor):
 
 
 class MeanWindow(WindowedFilter):
-    def __init__(self, window_size=10):
-        super().__init__(window_size)
+    """The mean of the last window_size values.
+
+    >>> m = MeanWindow(3)
+    >>> m.append_many([1, 2, 3, 4, 5]).tolist()
+    [1.0, 1.5, 2.0, 3.0, 4.0]
+    >>> m.append(9)
+    >>> m.get_value(), m.to_list()
+    (6.0, [1.0, 1.5, 2.0, 3.0, 4.0, 6.0])
+    """
+
+    def __init__(self, window_size=10, history=WindowedFilter.DEFAULT_HISTORY):
+        super().__init__(window_size, history)
         self.running_sum = 0
         self.running_n = 0
 
+    def append_many(self, values) -> array:
+        values = values if isinstance(values, array) else list(values)
+        if not self._all_present(values):
+            return super().append_many(values)
+        n = self.running_n
+        w = self.window_size
+        values, sums = self._window_sums(values)
+        # Until the window is full, the count grows by one per value
+        ramp = max(0, min(len(sums), w - n))
+        outputs = array('d', [total / (n + i) for i, total in enumerate(sums[:ramp], 1)])
+        outputs.extend([total / w for total in sums[ramp:]])
+        if sums:
+            self.running_sum = sums[-1]
+            self.running_n = min(w, n + len(sums))
+        self.queue.extend(outputs)
+        return outputs
+
     def __appender__(self, in_value, out_value):
         if out_value is not None:
             self.running_sum -= out_value
@@ -529,10 +819,29 @@ class MeanWindow(WindowedFilter):
 
 
 class SumWindow(WindowedFilter):
-    def __init__(self, window_size=10):
-        super().__init__(window_size)
+    """The sum of the last window_size values.
+
+    >>> s = SumWindow(2)
+    >>> s.append(1)
+    >>> s.append_many([2, 3, 4]).tolist()
+    [3.0, 5.0, 7.0]
+    """
+
+    def __init__(self, window_size=10, history=WindowedFilter.DEFAULT_HISTORY):
+        super().__init__(window_size, history)
         self.running_sum = 0
 
+    def append_many(self, values) -> array:
+        values = values if isinstance(values, array) else list(values)
+        if not self._all_present(values):
+            return super().append_many(values)
+        values, sums = self._window_sums(values)
+        outputs = array('d', sums)
+        if sums:
+            self.running_sum = sums[-1]
+        self.queue.extend(outputs)
+        return outputs
+
     def __appender__(self, in_value, out_value):
         if out_value is not None:
             self.running_sum -= out_value
@@ -542,25 +851,239 @@ class SumWindow(WindowedFilter):
         return self.running_sum
 
 
-class MedianWindow(WindowedFilter):
-    def __init__(self, window_size=10):
-        super().__init__(window_size)
-        self.data = []
+class RunningQuantile:
+    """A quantile of a multiset of numbers that changes one value at a time, in O(log n).
+
+    The values are split between two heaps: a max-heap of the lowest values, up to the
+    quantile, and a min-heap of the rest. Removed values are only marked as deleted, and
+    dropped from a heap once they reach its top (lazy deletion).
+
+    q - the quantile, from 0 to 1. 0.5 is the median. Between two values, the quantile
+        is linearly interpolated, like statistics.median and statistics.quantiles(method='inclusive').
+
+    >>> r = RunningQuantile(0.5)
+    >>> for x in [5, 1, 9, 2]:
+    ...     r.add(x)
+    >>> r.get_value()
+    3.5
+    >>> r.remove(9)
+    >>> r.get_value()
+    2
+    >>> r = RunningQuantile(0.9)
+    >>> for x in range(11):
+    ...     r.add(x)
+    >>> r.get_value(), len(r)
+    (9, 11)
+    """
+
+    def __init__(self, q: float = 0.5):
+        if not 0 <= q <= 1:
+            raise ValueError("q must be between 0 and 1")
+        self.q = q
+        self.low = []  # negated values, so that the highest low value is on top
+        self.high = []
+        self.low_size = 0
+        self.high_size = 0
+        self.deleted = {}
+
+    def __len__(self):
+        return self.low_size + self.high_size
+
+    def add(self, value):
+        if self.low_size and value <= -self.low[0]:
+            heapq.heappush(self.low, -value)
+            self.low_size += 1
+        else:
+            heapq.heappush(self.high, value)
+            self.high_size += 1
+        self._balance()
+
+    def remove(self, value):
+        """Remove one occurrence of value, which must have been added."""
+        self.deleted[value] = self.deleted.get(value, 0) + 1
+        # The tops are never deleted values, so comparing with the top of low is exact
+        if self.low_size and value <= -self.low[0]:
+            self.low_size -= 1
+            if value == -self.low[0]:
+                self._prune(self.low, -1)
+        else:
+            self.high_size -= 1
+            if self.high and value == self.high[0]:
+                self._prune(self.high, 1)
+        self._balance()
+        if len(self.low) + len(self.high) > 2 * (self.low_size + self.high_size) + 16:
+            self._compact()
+
+    def get_value(self):
+        """The quantile of the values, or None if there are none."""
+        n = len(self)
+        if n == 0:
+            return None
+        h = self.q * (n - 1)
+        lower = -self.low[0]
+        fraction = h - int(h)
+        if fraction == 0:
+            return lower
+        return lower + fraction * (self.high[0] - lower)
+
+    def _balance(self):
+        n = self.low_size + self.high_size
+        # low holds the values up to rank floor(q * (n - 1)), counting from 0
+        k = int(self.q * (n - 1)) + 1 if n else 0
+        while self.low_size > k:
+            heapq.heappush(self.high, -heapq.heappop(self.low))
+            self.low_size -= 1
+            self.high_size += 1
+            self._prune(self.low, -1)
+        while self.low_size < k:
+            heapq.heappush(self.low, -heapq.heappop(self.high))
+            self.high_size -= 1
+            self.low_size += 1
+            self._prune(self.high, 1)
+
+    def _prune(self, heap, sign):
+        "Drop the deleted values from the top of a heap."
+        deleted = self.deleted
+        while heap:
+            value = sign * heap[0]
+            count = deleted.get(value, 0)
+            if not count:
+                return
+            if count == 1:
+                del deleted[value]
+            else:
+                deleted[value] = count - 1
+            heapq.heappop(heap)
+
+    def _compact(self):
+        "Rebuild both heaps without their deleted values, so they do not grow without bound."
+        deleted = self.deleted
+        for heap, sign in ((self.low, -1), (self.high, 1)):
+            kept = []
+            for item in heap:
+                value = sign * item
+                count = deleted.get(value, 0)
+                if count:
+                    if count == 1:
+                        del deleted[value]
+                    else:
+                        deleted[value] = count - 1
+                else:
+                    kept.append(item)
+            heapq.heapify(kept)
+            heap[:] = kept
+
+
+class QuantileWindow(WindowedFilter):
+    """The q quantile of the last window_size values, in O(log window_size) per value.
+
+    >>> w = QuantileWindow(4, q=0.25)
+    >>> for x in [8, 1, 4, 2, 9, 3]:
+    ...     w.append(x)
+    >>> w.get_value()
+    2.75
+    """
+
+    def __init__(self, window_size=10, q=0.5, history=WindowedFilter.DEFAULT_HISTORY):
+        super().__init__(window_size, history)
+        self.quantile = RunningQuantile(q)
 
     def __appender__(self, in_value, out_value):
         if out_value is not None:
-            self.data.remove(out_value)
+            self.quantile.remove(out_value)
         if in_value is not None:
-            self.data.append(in_value)
-        self.data.sort()
-        return median(self.data)
+            self.quantile.add(in_value)
+        return self.quantile.get_value()
+
+    def append_many(self, values) -> array:
+        """Append every value in order. Returns the output after each value, in an array of floats.
+
+        >>> m = MedianWindow(3)
+        >>> m.append_many([5, 1, 9, 2, 2]).tolist()
+        [5.0, 3.0, 5.0, 2.0, 2.0]
+        """
+        values = values if isinstance(values, array) else list(values)
+        if not self._all_present(values):
+            return super().append_many(values)
+        circ_append = self.circ.append
+        add = self.quantile.add
+        remove = self.quantile.remove
+        get_value = self.quantile.get_value
+        outputs = array('d')
+        for value in values:
+            out_value = circ_append(value)
+            if out_value is not None:
+                remove(out_value)
+            add(value)
+            outputs.append(get_value())
+        self.queue.extend(outputs)
+        return outputs
+
+
+class MedianWindow(QuantileWindow):
+    """The median of the last window_size values, in O(log window_size) per value.
+
+    >>> w = MedianWindow(3)
+    >>> for x in [5, 1, 9, 2]:
+    ...     w.append(x)
+    >>> w.get_value()
+    2
+    """
+
+    def __init__(self, window_size=10, history=WindowedFilter.DEFAULT_HISTORY):
+        super().__init__(window_size, 0.5, history)
 
 
 class IntegrationTracker(WindowedFilter):
-    def __init__(self, default_dx=1):
-        super().__init__(window_size=1)
+    """The running integral of the values appended, by the trapezoid rule,
+    where dx is the step since the previous value.
+
+    >>> t = IntegrationTracker(default_dx=0.5)
+    >>> t.append_many([0, 2, 4, 4]).tolist()
+    [0.0, 0.5, 2.0, 4.0]
+    >>> t.append_many([0, 0], dx=[1, 2]).tolist()
+    [6.0, 6.0]
+    """
+
+    def __init__(self, default_dx=1, history=WindowedFilter.DEFAULT_HISTORY):
+        super().__init__(window_size=1, history=history)
         self.default_dx = default_dx
 
+    def append_many(self, values, dx=None) -> array:
+        """Append every value in order. dx is the step before each value, either one number
+        for all of them or a sequence, default_dx by default. Returns the integral after each value."""
+        values = list(values)
+        if not values:
+            return array('d')
+        if not self._all_present(values):
+            if dx is None or isinstance(dx, (int, float)):
+                return super().append_many(values, dx=dx)
+            outputs = array('d')
+            for value, step in zip(values, dx):
+                self.append(value, dx=step)
+                outputs.append(self.queue[-1])
+            return outputs
+        if dx is None:
+            dx = self.default_dx
+        previous = self.circ.to_list()
+        old = self.get_value()
+        old = 0 if old is None else old
+        # Trapezoid areas between consecutive values; the first value has no area before it
+        # unless there was a previous value
+        points = previous + values
+        if isinstance(dx, (int, float)):
+            areas = [(a + b) / 2 * dx for a, b in zip(points, points[1:])]
+        else:
+            dx = list(dx) if previous else list(dx)[1:]
+            areas = [(a + b) / 2 * d for a, b, d in zip(points, points[1:], dx)]
+        if not previous:
+            areas.insert(0, 0.0)
+        outputs = array('d', accumulate(areas, initial=old))
+        del outputs[0]
+        self.circ.append(values[-1])
+        self.queue.extend(outputs)
+        return outputs
+
     def __appender__(self, in_value, out_value, dx=None):
         if dx is None:
             dx = self.default_dx
@@ -576,6 +1099,286 @@ class IntegrationTracker(WindowedFilter):
             return (out_value + in_value) / 2 * dx + old
 
 
+class ExponentialFilter:
+    """An exponential moving average, which keeps only its last output.
+    Each value moves the output alpha of the way towards it. With time_constant (seconds)
+    instead of alpha, alpha follows the time between timestamps, so irregular samples are
+    weighted by how long they cover.
+
+    Group delay: (1 - alpha) / alpha samples for slow changes, or time_constant seconds.
+    alpha = 2 / (N + 1) smooths white noise as much as a MeanWindow(N), with the same delay,
+    without keeping its N values.
+
+    >>> f = ExponentialFilter(alpha=0.5)
+    >>> f.append_many([10, 20, 20, 20]).tolist()
+    [10.0, 15.0, 17.5, 18.75]
+    >>> f.group_delay()
+    1.0
+    >>> f = ExponentialFilter(time_constant=0.1)
+    >>> round(f.append(0, timestamp=0.0), 3), round(f.append(1, timestamp=0.1), 3)
+    (0.0, 0.632)
+    """
+    __slots__ = ('alpha', 'time_constant', 'value', 'timestamp')
+
+    def __init__(self, alpha: float = None, time_constant: float = None):
+        if (alpha is None) == (time_constant is None):
+            raise ValueError("give exactly one of alpha and time_constant")
+        if alpha is not None and not 0 < alpha <= 1:
+            raise ValueError(f"alpha must be in (0, 1], not {alpha}")
+        if time_constant is not None and time_constant <= 0:
+            raise ValueError(f"time_constant must be positive, not {time_constant}")
+        self.alpha = alpha
+        self.time_constant = time_constant
+        self.value = None
+        self.timestamp = None
+
+    def append(self, value, timestamp: float = None):
+        """Add a value (None is ignored), taken at timestamp (time.perf_counter() by default,
+        only used with time_constant). Returns the new output."""
+        if value is None:
+            return self.value
+        alpha = self.alpha
+        if self.time_constant is not None:
+            if timestamp is None:
+                timestamp = time.perf_counter()
+            previous, self.timestamp = self.timestamp, timestamp
+            alpha = 1 if previous is None else 1 - math.exp(-(timestamp - previous) / self.time_constant)
+        if self.value is None:
+            self.value = float(value)
+        else:
+            self.value += alpha * (value - self.value)
+        return self.value
+
+    def append_many(self, values) -> array:
+        "Append every value in order, at the fixed alpha. Returns the output after each value."
+        if self.alpha is None:
+            raise ValueError("append_many needs a fixed alpha")
+        outputs = array('d')
+        alpha, value = self.alpha, self.value
+        for v in values:
+            if v is not None:
+                value = float(v) if value is None else value + alpha * (v - value)
+            outputs.append(math.nan if value is None else value)
+        self.value = value
+        return outputs
+
+    def get_value(self):
+        return self.value
+
+    def group_delay(self) -> float:
+        "Delay for slow changes: in samples with alpha, in seconds with time_constant."
+        if self.time_constant is not None:
+            return self.time_constant
+        return (1 - self.alpha) / self.alpha
+
+    def clear(self):
+        self.value = None
+        self.timestamp = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.value})"
+
+
+class BiquadLowPass:
+    """A second order low-pass filter (from the Audio EQ Cookbook), for a stream sampled at
+    sample_rate Hz. Changes slower than cutoff Hz pass, and noise above it falls off at
+    12 dB per octave, twice as steeply as ExponentialFilter; q=0.7071 is a Butterworth filter,
+    with no overshoot peak. The state is 2 numbers, whatever the cutoff.
+
+    Group delay: group_delay() seconds for slow changes, 0.225 / cutoff with the default q,
+    eg, 11 ms at 20 Hz.
+
+    The filter starts settled at the first value, so it does not ramp up from 0.
+
+    >>> f = BiquadLowPass(cutoff=5, sample_rate=50)
+    >>> [round(v, 2) for v in f.append_many([10, 10, 20, 20, 20, 20, 20, 20])]
+    [10.0, 10.0, 10.67, 12.79, 15.61, 17.96, 19.48, 20.25]
+    >>> round(f.group_delay() * 1000, 1)
+    43.5
+    """
+    __slots__ = ('cutoff', 'sample_rate', 'q', 'b0', 'b1', 'b2', 'a1', 'a2', 's1', 's2', 'value')
+
+    BUTTERWORTH_Q = 1 / math.sqrt(2)
+
+    def __init__(self, cutoff: float, sample_rate: float, q: float = BUTTERWORTH_Q):
+        if not 0 < cutoff < sample_rate / 2:
+            raise ValueError(f"cutoff must be between 0 and half the sample rate, not {cutoff}")
+        self.cutoff = cutoff
+        self.sample_rate = sample_rate
+        self.q = q
+        w0 = 2 * math.pi * cutoff / sample_rate
+        alpha = math.sin(w0) / (2 * q)
+        a0 = 1 + alpha
+        self.b1 = (1 - math.cos(w0)) / a0
+        self.b0 = self.b2 = self.b1 / 2
+        self.a1 = -2 * math.cos(w0) / a0
+        self.a2 = (1 - alpha) / a0
+        self.s1 = self.s2 = 0.0
+        self.value = None
+
+    def append(self, value):
+        "Add the next sample (None is ignored). Returns the new output."
+        if value is None:
+            return self.value
+        if self.value is None:
+            # Settled at the first value: the output equals the input
+            self.s2 = value * (self.b2 - self.a2)
+            self.s1 = value * (self.b1 - self.a1) + self.s2
+        # Transposed direct form II
+        out = self.b0 * value + self.s1
+        self.s1 = self.b1 * value - self.a1 * out + self.s2
+        self.s2 = self.b2 * value - self.a2 * out
+        self.value = out
+        return out
+
+    def append_many(self, values) -> array:
+        "Append every value in order. Returns the output after each value."
+        append = self.append
+        return array('d', (math.nan if v is None else append(v) for v in values))
+
+    def get_value(self):
+        return self.value
+
+    def group_delay(self) -> float:
+        "Delay for slow changes, in seconds."
+        b = (self.b0, self.b1, self.b2)
+        a = (1, self.a1, self.a2)
+        samples = ((b[1] + 2 * b[2]) / sum(b)) - ((a[1] + 2 * a[2]) / sum(a))
+        return samples / self.sample_rate
+
+    def clear(self):
+        self.s1 = self.s2 = 0.0
+        self.value = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.value})"
+
+
+class OneEuroFilter:
+    """The 1 Euro filter (Casiez et al., 2012): an exponential filter whose cutoff rises
+    with the speed of the signal, so it smooths heavily while the value holds still and
+    follows quickly when it moves. The cutoff is min_cutoff + beta * |speed| Hz, where the
+    speed (units per second) is itself smoothed with a d_cutoff Hz filter.
+
+    Group delay: 1 / (2 pi cutoff) seconds, ie, 159 ms at rest with min_cutoff=1 Hz, and
+    less while moving; group_delay() gives the current figure.
+
+    >>> f = OneEuroFilter(min_cutoff=1.0, beta=0.1)
+    >>> for i in range(20):
+    ...     _ = f.append(100, timestamp=i * 0.05)
+    >>> f.get_value()
+    100.0
+    >>> round(f.append(90, timestamp=1.0), 2), round(f.group_delay() * 1000)
+    (93.55, 28)
+    """
+    __slots__ = ('min_cutoff', 'beta', 'd_cutoff', 'value', 'speed', 'cutoff', 'timestamp')
+
+    def __init__(self, min_cutoff: float = 1.0, beta: float = 0.0, d_cutoff: float = 1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.value = None
+        self.speed = 0.0
+        self.cutoff = min_cutoff
+        self.timestamp = None
+
+    @staticmethod
+    def _alpha(cutoff: float, dt: float) -> float:
+        tau = 1 / (2 * math.pi * cutoff)
+        return 1 / (1 + tau / dt)
+
+    def append(self, value, timestamp: float = None):
+        """Add a value (None is ignored), taken at timestamp, time.perf_counter() by default.
+        Returns the new output."""
+        if value is None:
+            return self.value
+        if timestamp is None:
+            timestamp = time.perf_counter()
+        previous, self.timestamp = self.timestamp, timestamp
+        if self.value is None or timestamp <= previous:
+            if self.value is None:
+                self.value = float(value)
+            return self.value
+        dt = timestamp - previous
+        speed = (value - self.value) / dt
+        self.speed += self._alpha(self.d_cutoff, dt) * (speed - self.speed)
+        self.cutoff = self.min_cutoff + self.beta * abs(self.speed)
+        self.value += self._alpha(self.cutoff, dt) * (value - self.value)
+        return self.value
+
+    def get_value(self):
+        return self.value
+
+    def group_delay(self) -> float:
+        "Delay at the current cutoff, in seconds."
+        return 1 / (2 * math.pi * self.cutoff)
+
+    def clear(self):
+        self.value = None
+        self.speed = 0.0
+        self.cutoff = self.min_cutoff
+        self.timestamp = None
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.value})"
+
+
+class DebounceFilter:
+    """Holds a discrete value, eg, an EV3ColorSensor colour ID, until a different value has
+    been read count times in a row, so a single misread at the edge of a sticker does not
+    flip it. None readings are ignored.
+
+    Latency: count - 1 samples after a real change, eg, 40 ms with count=3 at 50 Hz.
+
+    >>> f = DebounceFilter(count=3)
+    >>> [f.append(v) for v in [5, 5, 3, 5, 3, 3, None, 3, 3]]
+    [5, 5, 5, 5, 5, 5, 5, 3, 3]
+    >>> f.group_delay()
+    2
+    """
+    __slots__ = ('count', 'value', 'candidate', 'seen')
+
+    def __init__(self, count: int = 3):
+        if count < 1:
+            raise ValueError(f"count must be at least 1, not {count}")
+        self.count = count
+        self.value = None
+        self.candidate = None
+        self.seen = 0
+
+    def append(self, value):
+        "Add a reading. Returns the debounced value."
+        if value is None:
+            return self.value
+        if self.value is None or value == self.value:
+            self.value = value
+            self.seen = 0
+            return value
+        if value == self.candidate:
+            self.seen += 1
+        else:
+            self.candidate = value
+            self.seen = 1
+        if self.seen >= self.count:
+            self.value = value
+            self.seen = 0
+        return self.value
+
+    def get_value(self):
+        return self.value
+
+    def group_delay(self) -> int:
+        "Samples between a real change and the output changing."
+        return self.count - 1
+
+    def clear(self):
+        self.value = self.candidate = None
+        self.seen = 0
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.value})"
+
+
 class ValueListWrapper(UserList):
     def __init__(self, iterable=None):
         super().__init__(None)
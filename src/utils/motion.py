@@ -0,0 +1,135 @@
+"""
+Module for encoder-based motion primitives of a differential drive robot,
+eg, turning by an exact angle instead of powering the motors for a set time.
+
+Run "python3 -m utils.motion" from the src directory to test it against the dummy brick.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+import time
+
+from .brick import Motor
+
+
+class DifferentialDrive:
+    """
+    Closed-loop motion of a robot driven by a left and a right wheel motor.
+
+    Angles are in degrees, positive to the left (counter-clockwise, seen from above).
+    forward_sign is the sign of the motor power/encoder direction that moves the robot
+    forwards (-1 for robots that drive forwards with negative power).
+    stop_event, if given, is a threading.Event that interrupts any motion when set,
+    eg, EmergencyStop.event.
+
+    >>> from utils import dummy
+    >>> bp = dummy.BrickPi3()
+    >>> drive = DifferentialDrive(Motor("A", bp=bp), Motor("B", bp=bp), 15, 4.2)
+    >>> round(drive.wheel_degrees_for_rotation(90))
+    321
+    >>> elapsed = drive.rotate(90, speed=500)
+    >>> round(drive.left.get_encoder()), round(drive.right.get_encoder())
+    (321, -321)
+    >>> elapsed < 2
+    True
+    >>> drive.left.reset_encoder()
+    >>> drive.right.reset_encoder()
+    >>> elapsed = drive.pivot(-90, speed=1000)
+    >>> round(drive.left.get_encoder()), round(drive.right.get_encoder())
+    (-643, 0)
+    >>> drive.drive(10, speed=0)
+    Traceback (most recent call last):
+    ...
+    ValueError: speed must be positive, not 0
+    """
+    DEFAULT_SPEED = 360  # wheel degrees per second
+    DEFAULT_TOLERANCE = 3  # wheel degrees
+    POLL_INTERVAL = 0.01  # seconds between encoder checks
+    TIMEOUT_FACTOR = 3  # give up after this many times the expected duration
+
+    def __init__(self, left: Motor, right: Motor, wheel_separation_cm: float,
+                 wheel_diameter_cm: float, forward_sign: int = -1, stop_event: threading.Event = None):
+        self.left = left
+        self.right = right
+        self.wheel_separation_cm = wheel_separation_cm
+        self.wheel_diameter_cm = wheel_diameter_cm
+        self.forward_sign = -1 if forward_sign < 0 else 1
+        self.stop_event = threading.Event() if stop_event is None else stop_event
+        self.last_duration = None
+
+    def wheel_degrees_for_distance(self, distance_cm: float) -> float:
+        "Wheel rotation in degrees that covers the given distance on the ground."
+        return distance_cm / (math.pi * self.wheel_diameter_cm) * 360
+
+    def wheel_degrees_for_rotation(self, angle: float, pivot: bool = False) -> float:
+        """Wheel rotation in degrees for the robot to turn by angle.
+        Both wheels turn by this amount when rotating in place; a single wheel
+        turns by this amount when pivoting around the other wheel."""
+        radius = self.wheel_separation_cm if pivot else self.wheel_separation_cm / 2
+        return self.wheel_degrees_for_distance(math.radians(abs(angle)) * radius)
+
+    def rotate(self, angle: float, speed: float = DEFAULT_SPEED, timeout: float = None) -> float:
+        """
+        Rotate in place by angle degrees (positive is left), with both wheels turning
+        in opposite directions. Returns the time taken in seconds.
+        """
+        degrees = math.copysign(self.wheel_degrees_for_rotation(angle), angle) * self.forward_sign
+        return self.move_wheels(-degrees, degrees, speed, timeout)
+
+    def pivot(self, angle: float, speed: float = DEFAULT_SPEED, timeout: float = None) -> float:
+        """
+        Turn by angle degrees (positive is left) around the stopped inner wheel,
+        driving only the outer wheel forwards. Returns the time taken in seconds.
+        """
+        degrees = self.wheel_degrees_for_rotation(angle, pivot=True) * self.forward_sign
+        if angle > 0:
+            return self.move_wheels(0, degrees, speed, timeout)
+        return self.move_wheels(degrees, 0, speed, timeout)
+
+    def drive(self, distance_cm: float, speed: float = DEFAULT_SPEED, timeout: float = None) -> float:
+        "Drive straight forwards (or backwards if negative) by distance_cm. Returns the time taken in seconds."
+        degrees = self.wheel_degrees_for_distance(distance_cm) * self.forward_sign
+        return self.move_wheels(degrees, degrees, speed, timeout)
+
+    def move_wheels(self, left_degrees: float, right_degrees: float,
+                    speed: float = DEFAULT_SPEED, timeout: float = None) -> float:
+        """
+        Turn each wheel by a relative number of degrees using the motors' position control,
+        and return as soon as both encoders are within DEFAULT_TOLERANCE of their targets,
+        or stop_event is set. The motors are stopped afterwards. Returns the time taken in seconds.
+
+        speed - wheel degrees per second, must be positive; the signs of the degrees give the directions
+        timeout - seconds before giving up, None to allow TIMEOUT_FACTOR times the expected duration
+        """
+        if speed <= 0:
+            raise ValueError(f"speed must be positive, not {speed}")
+        if timeout is None:
+            timeout = self.TIMEOUT_FACTOR * max(abs(left_degrees), abs(right_degrees)) / speed + 1
+
+        start = time.perf_counter()
+        targets = []
+        for motor, degrees in ((self.left, left_degrees), (self.right, right_degrees)):
+            if degrees == 0 or self.stop_event.is_set():
+                motor.set_power(0)
+                continue
+            targets.append((motor, motor.get_encoder() + degrees))
+            motor.set_limits(dps=speed)
+            motor.set_position_relative(degrees)
+
+        while targets and time.perf_counter() - start < timeout:
+            targets = [(motor, target) for motor, target in targets
+                       if abs(motor.get_encoder() - target) > self.DEFAULT_TOLERANCE]
+            if targets and self.stop_event.wait(self.POLL_INTERVAL):
+                break
+
+        self.left.set_power(0)
+        self.right.set_power(0)
+        self.last_duration = time.perf_counter() - start
+        return self.last_duration
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
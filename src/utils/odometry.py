@@ -0,0 +1,219 @@
+"""
+Module for differential drive odometry: tracking the pose (x, y, heading) of the
+robot by integrating the wheel motor encoders.
+
+Run "python3 -m utils.odometry" from the src directory to test it against the dummy brick.
+"""
+
+from __future__ import annotations
+
+from array import array
+import math
+import threading
+import time
+
+from .brick import Motor
+
+
+class Pose:
+    """
+    Position (cm) and heading (radians, counter-clockwise from the starting direction)
+    of the robot at a given time.perf_counter() timestamp. Never modified after creation.
+    """
+    __slots__ = ('timestamp', 'x', 'y', 'heading')
+
+    def __init__(self, timestamp: float, x: float, y: float, heading: float):
+        self.timestamp = timestamp
+        self.x = x
+        self.y = y
+        self.heading = heading
+
+    @property
+    def heading_degrees(self) -> float:
+        return math.degrees(self.heading)
+
+    def __repr__(self):
+        return f"Pose(x={self.x:.1f}cm, y={self.y:.1f}cm, heading={self.heading_degrees:.1f}°)"
+
+
+class PoseHistory:
+    """
+    Fixed-size ring buffer of poses. All storage is allocated up front in typed arrays,
+    so recording a pose allocates nothing; Pose objects are only created when reading.
+
+    >>> h = PoseHistory(3)
+    >>> for i in range(5):
+    ...     h.append(i, i, 0, 0)
+    >>> len(h)
+    3
+    >>> [p.x for p in h.get()]
+    [2.0, 3.0, 4.0]
+    >>> h.get(1)
+    [Pose(x=4.0cm, y=0.0cm, heading=0.0°)]
+    """
+
+    def __init__(self, size: int):
+        if type(size) != int or size <= 0:
+            raise ValueError("size must be a positive integer")
+        self.size = size
+        self.timestamps = array('d', bytes(8 * size))
+        self.xs = array('d', bytes(8 * size))
+        self.ys = array('d', bytes(8 * size))
+        self.headings = array('d', bytes(8 * size))
+        self.next = 0
+        self.length = 0
+
+    def append(self, timestamp: float, x: float, y: float, heading: float):
+        i = self.next
+        self.timestamps[i] = timestamp
+        self.xs[i] = x
+        self.ys[i] = y
+        self.headings[i] = heading
+        self.next = (i + 1) % self.size
+        self.length = min(self.length + 1, self.size)
+
+    def get(self, count: int = None) -> list[Pose]:
+        "Return the latest count poses (all of them by default), oldest first."
+        count = self.length if count is None else min(count, self.length)
+        start = self.next - count
+        return [Pose(self.timestamps[i], self.xs[i], self.ys[i], self.headings[i])
+                for i in (j % self.size for j in range(start, self.next))]
+
+    def clear(self):
+        self.next = 0
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+
+class Odometer:
+    """
+    Tracks the pose of a differential drive robot from its wheel encoders.
+    Call update() yourself, or start() a background thread that samples the
+    encoders at a fixed rate. The latest pose is published with get_pose(),
+    which never blocks, and recent poses are kept in history.
+
+    forward_sign is the sign of the motor encoder direction that moves the robot
+    forwards (-1 for robots that drive forwards with negative power).
+
+    >>> from utils import dummy
+    >>> from utils.motion import DifferentialDrive
+    >>> bp = dummy.BrickPi3()
+    >>> left, right = Motor("A", bp=bp), Motor("B", bp=bp)
+    >>> odometer = Odometer(left, right, 15, 4.2)
+    >>> drive = DifferentialDrive(left, right, 15, 4.2)
+    >>> _ = drive.drive(20, speed=1000)
+    >>> pose = odometer.update()
+    >>> round(pose.x), round(pose.y), round(pose.heading_degrees)
+    (20, 0, 0)
+    >>> _ = drive.rotate(90, speed=1000)
+    >>> round(odometer.update().heading_degrees)
+    90
+    >>> _ = drive.drive(10, speed=1000)
+    >>> pose = odometer.update()
+    >>> round(pose.x), round(pose.y)
+    (20, 10)
+    >>> len(odometer.history)
+    3
+    """
+    DEFAULT_RATE = 50  # samples per second
+    DEFAULT_HISTORY = 500  # poses kept
+
+    def __init__(self, left: Motor, right: Motor, wheel_separation_cm: float, wheel_diameter_cm: float,
+                 forward_sign: int = -1, rate: float = DEFAULT_RATE, history: int = DEFAULT_HISTORY):
+        if rate <= 0:
+            raise ValueError("rate must be a positive number of samples per second")
+        self.left = left
+        self.right = right
+        self.wheel_separation_cm = wheel_separation_cm
+        self.cm_per_degree = math.pi * wheel_diameter_cm / 360 * (-1 if forward_sign < 0 else 1)
+        self.rate = rate
+        self.history = PoseHistory(history)
+
+        self.lock = threading.Lock()
+        self.run_event = threading.Event()
+        self.wake_event = threading.Event()
+        self.thread = None
+        self.overruns = 0
+
+        self.pose: Pose = None
+        self.reset()
+
+    def reset(self, x: float = 0, y: float = 0, heading: float = 0):
+        "Set the current pose (heading in radians) and start integrating from the current encoders."
+        with self.lock:
+            self.last_left = self.left.get_encoder()
+            self.last_right = self.right.get_encoder()
+            self.pose = Pose(time.perf_counter(), x, y, heading)
+            self.history.clear()
+
+    def update(self) -> Pose:
+        "Sample both encoders once, integrate the motion since the last sample, and publish the new pose."
+        with self.lock:
+            left = self.left.get_encoder()
+            right = self.right.get_encoder()
+            timestamp = time.perf_counter()
+            if left is None or right is None:
+                return self.pose
+
+            distance_left = (left - self.last_left) * self.cm_per_degree
+            distance_right = (right - self.last_right) * self.cm_per_degree
+            self.last_left = left
+            self.last_right = right
+
+            distance = (distance_left + distance_right) / 2
+            turn = (distance_right - distance_left) / self.wheel_separation_cm
+            pose = self.pose
+            # Midpoint integration: move along the average heading over the interval
+            mid_heading = pose.heading + turn / 2
+            x = pose.x + distance * math.cos(mid_heading)
+            y = pose.y + distance * math.sin(mid_heading)
+            heading = math.remainder(pose.heading + turn, math.tau)
+
+            self.history.append(timestamp, x, y, heading)
+            self.pose = Pose(timestamp, x, y, heading)
+            return self.pose
+
+    def get_pose(self) -> Pose:
+        "Get the latest published pose. Never blocks."
+        return self.pose
+
+    def start(self) -> Odometer:
+        "Start sampling the encoders in a background thread at the configured rate."
+        if self.run_event.is_set():
+            return self
+        self.run_event.set()
+        self.wake_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.run_event.clear()
+        self.wake_event.set()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+        self.thread = None
+
+    def is_running(self) -> bool:
+        return self.run_event.is_set()
+
+    def _run(self):
+        period = 1 / self.rate
+        deadline = time.perf_counter()
+        while self.run_event.is_set():
+            self.update()
+            deadline += period
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                self.wake_event.wait(delay)
+            else:
+                # Missed at least one sample; restart the schedule from now
+                self.overruns += 1
+                deadline = time.perf_counter()
+
+
+if __name__ == '__main__':
+    import doctest
+    doctest.testmod()
@@ -1,18 +1,155 @@
 from typing import Literal
+import itertools
+import threading
+import time
 from . import brick
 from . import dummy
-from .rmi import RemoteClient, RemoteServer, isrelatedclass
+from .datalog import SensorLog
+from .rmi import HEARTBEAT_INTERVAL, Command, Connection, RemoteClient, RemoteServer, isrelatedclass, merge_lanes
+
+
+def _port_name(port) -> str:
+    "Sensor port name '1' to '4' of a port number, name, or Sensor."
+    if isinstance(port, brick.Sensor):
+        port = brick._SENSOR_PORT_NAMES_BY_PORT[port.port]
+    name = str(port)
+    if name not in brick.SENSOR_PORT_NAMES:
+        raise ValueError(f"Unknown sensor port {port!r}, must be 1, 2, 3, or 4.")
+    return name
+
+
+def _changed(old, new, threshold) -> bool:
+    "Whether a sensor value changed by more than threshold (in any component, for lists)."
+    if old is None or new is None or threshold <= 0:
+        return old != new
+    if isinstance(new, (list, tuple)):
+        return len(old) != len(new) or any(abs(a - b) > threshold for a, b in zip(old, new))
+    return abs(old - new) > threshold
 
 
 class RemoteBrickClient(RemoteClient):
-    def __init__(self, address, password, port=None, sock=None):
-        super(RemoteBrickClient, self).__init__(address, password, port, sock)
+    """Client of a RemoteBrickServer. By default, it sends heartbeats to detect a dead link
+    within HEARTBEAT_TIMEOUT, and reconnects in the background, subscribing again to the
+    sensor stream and the sensor log. See RemoteClient for the arguments."""
+
+    def __init__(self, address, password, port=None, sock=None, compact=True,
+                 heartbeat=HEARTBEAT_INTERVAL, reconnect=True):
+        # Latest (sensor_type, value, timestamp) pushed by the host for each subscribed port
+        self.sensor_cache = {}
+        self.expected_types = {}
+        self.subscription = None
+        self.subscription_args = None
+        self.log_subscribed = False
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+        super(RemoteBrickClient, self).__init__(address, password, port, sock, compact, heartbeat, reconnect)
         self._brick: dummy.Brick = self.create_caller(
             dummy.Brick(), var_name='brick')
 
+        self._remote_get_sensor = self._brick.get_sensor
+        self._remote_set_sensor_type = self._brick.set_sensor_type
+        self._brick.get_sensor = self._get_sensor
+        self._brick.set_sensor_type = self._set_sensor_type
+        self.register_handler('__sensor_update', self._sensor_update)
+
+        # Samples of the host's SensorLog, in the order they were logged
+        self.log_samples = []
+        self.log_callback = None
+        self.log_blocks = 0
+        self.log_missed_blocks = 0
+        self._log_next_seq = None
+        self.register_handler('__log_block', self._log_block)
+
     def get_brick(self):
         return self._brick
 
+    def subscribe(self, ports, rate: float = 50, threshold: float = 0):
+        """Ask the host to stream the values of the given sensor ports, so that
+        reading them (eg, RemoteEV3UltrasonicSensor.get_cm) costs no round trip.
+
+        ports - port numbers 1 to 4, or sensors
+        rate - samples per second taken by the host
+        threshold - only send a value when it changed by more than this
+
+        Replaces any previous subscription of this client.
+        """
+        names = tuple(_port_name(port) for port in ports)
+        self.sensor_cache.clear()
+        self.subscription_args = (names, rate, threshold)
+        self.subscription = self._send_command('__subscribe', names, rate, threshold).result
+
+    def unsubscribe(self):
+        "Stop the sensor stream. Sensors are read with a round trip again."
+        self.subscription_args = None
+        if self.subscription is not None:
+            self._send_command('__unsubscribe', self.subscription)
+            self.subscription = None
+        self.sensor_cache.clear()
+
+    def subscribe_log(self, callback=None):
+        """Ask the host to ship the blocks of its sensor log (see RemoteBrickServer.log)
+        to this client. Their samples are appended to log_samples as (timestamp, port, value).
+
+        callback - optional function called with the list of samples of each block
+        """
+        self.log_callback = callback
+        self.log_subscribed = True
+        self._send_command('__log_subscribe')
+
+    def unsubscribe_log(self):
+        "Stop receiving the host's sensor log. Blocks logged meanwhile stay buffered on the host."
+        self.log_subscribed = False
+        self._send_command('__log_unsubscribe')
+
+    def on_disconnect(self):
+        # Streamed values would go stale; reads fail fast with ConnectionError until reconnected
+        self.subscription = None
+        self.sensor_cache.clear()
+
+    def on_reconnect(self):
+        if self.subscription_args is not None:
+            self.subscription = self._send_command('__subscribe', *self.subscription_args).result
+        if self.log_subscribed:
+            self._send_command('__log_subscribe')
+
+    def get_cached(self, port):
+        "The latest (sensor_type, value, timestamp) streamed for a port number or sensor, or None."
+        return self.sensor_cache.get(brick.PORTS[_port_name(port)], None)
+
+    def _get_sensor(self, port, **kwargs):
+        entry = self.sensor_cache.get(port, None)
+        if entry is not None and entry[0] == self.expected_types.get(port, None):
+            self.cache_hits += 1
+            if entry[1] is None:
+                raise brick.SensorError("get_sensor error: sensor not ready (streamed value)")
+            return entry[1]
+        self.cache_misses += 1
+        return self._remote_get_sensor(port, **kwargs)
+
+    def _set_sensor_type(self, port, sensor_type, *args, **kwargs):
+        result = self._remote_set_sensor_type(port, sensor_type, *args, **kwargs)
+        # Streamed values of the previous type must not be mistaken for the new mode's values
+        self.expected_types[port] = sensor_type
+        return result
+
+    def _sensor_update(self, command: Command):
+        timestamp, updates = command.args
+        for name, sensor_type, value in updates:
+            self.sensor_cache[brick.PORTS[name]] = (sensor_type, value, timestamp)
+
+    def _log_block(self, command: Command):
+        seq, data, _ = command.args
+        if self._log_next_seq is not None and seq > self._log_next_seq:
+            # The host dropped blocks that were not shipped in time
+            self.log_missed_blocks += seq - self._log_next_seq
+        self._log_next_seq = seq + 1
+        self.log_blocks += 1
+        samples = SensorLog.decode(data)
+        self.log_samples.extend(samples)
+        if self.log_callback is not None:
+            self.log_callback(samples)
+
     def make_remote(self, sensor_or_motor, *args, **kwargs):
         """Creates a remote sensor or motor that is attached to the remote brick.
         sensor_or_motor - A class, such as Motor or EV3UltrasonicSensor
@@ -38,10 +175,217 @@ class RemoteBrickClient(RemoteClient):
         brick.BP = self._brick
 
 
+class _SensorSubscription:
+    """Samples sensor ports on the host at a fixed rate, and pushes the values that
+    changed to a client as '__sensor_update' commands, tagged with the sensor type."""
+
+    def __init__(self, sub_id, conn: Connection, bp, ports, rate, threshold):
+        self.id = sub_id
+        self.conn = conn
+        self.brick = brick.get_brick(bp)
+        self.ports = tuple(ports)
+        self.indices = tuple(brick.SENSOR_PORT_NAMES.index(name) for name in self.ports)
+        self.period = 1 / rate
+        self.threshold = threshold
+        self.last = {}
+        self.run_event = threading.Event()
+        self.run_event.set()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.run_event.clear()
+
+    def is_running(self):
+        return self.run_event.is_set() and not self.conn.isclosed()
+
+    def sample(self):
+        "Read every port once and return the (name, sensor_type, value) updates to send."
+        timestamp, values = self.brick.read_many(self.ports)
+        sensor_types = self.brick.SensorType
+        updates = []
+        for name, i, value in zip(self.ports, self.indices, values):
+            sensor_type = sensor_types[i]
+            old = self.last.get(name, None)
+            if old is None or old[0] != sensor_type or _changed(old[1], value, self.threshold):
+                self.last[name] = (sensor_type, value)
+                updates.append((name, sensor_type, value))
+        return timestamp, updates
+
+    def _run(self):
+        deadline = time.perf_counter()
+        while self.is_running():
+            timestamp, updates = self.sample()
+            if updates:
+                try:
+                    self.conn.send(Command('__sensor_update', timestamp, updates))
+                except OSError:
+                    break
+            deadline += self.period
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                deadline = time.perf_counter()
+        self.run_event.clear()
+
+
 class RemoteBrickServer(RemoteServer):
+    """Hosts the brick for RemoteBrickClients.
+
+    It also keeps a sensor log: samples recorded with log(), or sampled by start_logging(),
+    are packed into binary blocks, compressed and shipped in the background to the clients
+    that called subscribe_log(). Logging never blocks; when blocks cannot be shipped fast
+    enough (or nobody is subscribed), the oldest buffered blocks are dropped.
+    """
+    SESSION_COMMANDS = RemoteServer.SESSION_COMMANDS + (
+        '__subscribe', '__unsubscribe', '__sensor_update', '__log_subscribe', '__log_unsubscribe', '__log_block')
+    LOG_SHIP_TIMEOUT = 0.5  # seconds between checks for stopped shipping
+
     def __init__(self, password, port=None):
+        # Commands of different connections run on different workers
+        self.lock_subscriptions = threading.Lock()
+        self.subscriptions = {}
+        self._subscription_ids = itertools.count(1)
+        self.sensor_log = SensorLog()
+        self.log_subscribers = []
+        self.log_event = threading.Event()
+        self.log_run_event = threading.Event()
+        self.log_run_event.set()
+        self.log_thread = threading.Thread(target=self._ship_log, daemon=True)
+        self.log_thread.start()
+        self.sampler_event = threading.Event()
+        self.sampler_thread = None
         super(RemoteBrickServer, self).__init__(password, port)
         self.register_object(brick.BP, var_name='brick')
+        # The Brick wrapper adds read_many and get_sensor_status on top of the BrickPi3 methods
+        self.register_object(brick.get_brick(brick.BP), var_name='brick')
+
+    def command_lane(self, conn: Connection, command: Command):
+        """Reads (get_* and read_* methods) run in parallel. set_sensor_type and I2C
+        transactions are ordered per sensor port. Every other write, eg, the motor
+        commands, which may address several ports at once, shares one ordered lane.
+        A batch is ordered in every lane of its calls."""
+        if command.func_name == '__batch':
+            return merge_lanes(self._brick_lane(name, args) for name, args, _ in command.args[0])
+        if command.func_name.startswith('brick.'):
+            return self._brick_lane(command.func_name, command.args)
+        return super(RemoteBrickServer, self).command_lane(conn, command)
+
+    def log(self, port, value, timestamp: float = None):
+        "Record a sample of a port ('1' to '4', 'A' to 'D') in the sensor log. Never blocks."
+        self.sensor_log.log(port, value, timestamp)
+
+    def start_logging(self, ports=brick.SENSOR_PORT_NAMES + brick.MOTOR_PORT_NAMES, rate: float = 50):
+        """Sample the given ports with Brick.read_many rate times per second into the
+        sensor log, in a background thread. Replaces any previous sampling."""
+        self.stop_logging()
+        bp = brick.get_brick(brick.BP)
+        ports = tuple(str(port).upper() for port in ports)
+        self.sampler_event.set()
+        self.sampler_thread = threading.Thread(target=self._sample_log, args=(bp, ports, 1 / rate), daemon=True)
+        self.sampler_thread.start()
+
+    def stop_logging(self):
+        "Stop the sampling thread of start_logging, and finish the current log block."
+        self.sampler_event.clear()
+        if self.sampler_thread is not None:
+            self.sampler_thread.join()
+            self.sampler_thread = None
+        self.sensor_log.flush()
+
+    def _sample_log(self, bp, ports, period):
+        deadline = time.perf_counter()
+        while self.sampler_event.is_set():
+            timestamp, values = bp.read_many(ports)
+            self.sensor_log.log_many(ports, values, timestamp)
+            deadline += period
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                deadline = time.perf_counter()
+
+    def _ship_log(self):
+        """Send each finished log block to every subscribed client. A slow client only
+        holds up this thread; meanwhile the log keeps its newest blocks."""
+        while self.log_run_event.is_set():
+            if not self.log_event.wait(self.LOG_SHIP_TIMEOUT):
+                continue
+            block = self.sensor_log.pop_block(self.LOG_SHIP_TIMEOUT)
+            if block is None:
+                continue
+            command = Command('__log_block', *block)
+            with self.lock_subscriptions:
+                subscribers = list(self.log_subscribers)
+            for conn in subscribers:
+                try:
+                    conn.send(command)
+                except OSError:
+                    self._remove_log_subscriber(conn)
+
+    def _remove_log_subscriber(self, conn: Connection):
+        with self.lock_subscriptions:
+            if conn in self.log_subscribers:
+                self.log_subscribers.remove(conn)
+            if not self.log_subscribers:
+                self.log_event.clear()
+
+    @staticmethod
+    def _brick_lane(func_name, args):
+        method = func_name.partition('.')[2]
+        if method.startswith(('get_', 'read_')):
+            return None
+        if method in ('set_sensor_type', 'transact_i2c') and args:
+            return ('sensor', args[0])
+        return 'writes'
+
+    def _execute(self, conn: Connection, command: Command):
+        if command.func_name == '__subscribe':
+            ports, rate, threshold = command.args
+            sub_id = next(self._subscription_ids)
+            with self.lock_subscriptions:
+                # One subscription per connection; forget those of closed connections
+                for c in [c for c, sub in self.subscriptions.items() if not sub.is_running()]:
+                    del self.subscriptions[c]
+                old = self.subscriptions.pop(conn, None)
+                if old is not None:
+                    old.stop()
+                self.subscriptions[conn] = _SensorSubscription(sub_id, conn, brick.BP, ports, rate, threshold)
+            command.result = sub_id
+            command._result_given = True
+            conn.send(command)
+        elif command.func_name == '__unsubscribe':
+            with self.lock_subscriptions:
+                old = self.subscriptions.pop(conn, None)
+            if old is not None:
+                old.stop()
+            command._result_given = True
+            conn.send(command)
+        elif command.func_name == '__log_subscribe':
+            with self.lock_subscriptions:
+                self.log_subscribers[:] = [c for c in self.log_subscribers if not c.isclosed()]
+                if conn not in self.log_subscribers:
+                    self.log_subscribers.append(conn)
+                self.log_event.set()
+            command._result_given = True
+            conn.send(command)
+        elif command.func_name == '__log_unsubscribe':
+            self._remove_log_subscriber(conn)
+            command._result_given = True
+            conn.send(command)
+        else:
+            super(RemoteBrickServer, self)._execute(conn, command)
+
+    def close(self):
+        self.sampler_event.clear()
+        self.log_run_event.clear()
+        self.log_event.set()
+        with self.lock_subscriptions:
+            for subscription in self.subscriptions.values():
+                subscription.stop()
+            self.subscriptions.clear()
+        super(RemoteBrickServer, self).close()
 
 
 class RemoteEV3UltrasonicSensor(brick.EV3UltrasonicSensor):
@@ -3,15 +3,18 @@ try:
     from math import inf
 except:
     inf = float('inf')
+import asyncio
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
 from queue import Queue
 import socket
 import _socket
+import struct
 import sys
 import threading
 import time
 from collections import deque
 from typing import Dict, List
-import uuid
+import itertools
 
 import json
 import marshal
@@ -25,6 +28,15 @@ BUSY_WAITING = 0.001
 DEFAULT_PASSWORD = 'password'
 SERVER_START_RETRIES = 5
 DEBUG_DEFAULT = False
+RECV_SIZE = 65536
+SERVER_WORKERS = 4  # threads executing commands on a RemoteServer
+MAX_QUEUED_COMMANDS = 256  # commands waiting on a RemoteServer before connections stop being read
+FRAME_HEADER = struct.Struct('!I')  # Every message is sent as a 4-byte big-endian length, then the data
+HEARTBEAT_INTERVAL = 0.1  # seconds between the heartbeats of a RemoteClient
+HEARTBEAT_TIMEOUT = 0.5  # seconds without receiving anything before the link is considered dead
+RECONNECT_DELAY = 0.05  # seconds before the first reconnection attempt, doubled after each failure
+RECONNECT_MAX_DELAY = 2
+RTT_HISTORY = 100  # heartbeat round trip times kept for the link statistics
 
 
 def isrelatedclass(typ, cls):
@@ -105,6 +117,175 @@ class brickle:
         return obj
 
 
+class BinaryCodec:
+    """A compact encoding of Commands, used by a Connection once its session is authenticated,
+    so frames carry no password, class name or attribute names.
+
+    Calls are encoded as a tag byte, a 32-bit call id, the index of the method name in the
+    table negotiated at connect, then the type-tagged arguments. Replies are a tag byte,
+    the call id, a flags byte and the type-tagged result. dumps returns None for anything
+    it cannot encode (eg, a Message), which is then sent with brickle instead.
+
+    >>> codec = BinaryCodec(['brick.get_sensor', 'brick.set_motor_power'])
+    >>> c = Command('brick.set_motor_power', 1, -20.5, flag=True)
+    >>> data = codec.dumps(c)
+    >>> len(data) < len(brickle.dumps(c)) // 4
+    True
+    >>> d = codec.loads(data)
+    >>> d.id == c.id, d.func_name, d.args, d.kwargs
+    (True, 'brick.set_motor_power', (1, -20.5), {'flag': True})
+    >>> c.result, c._result_given = [255.0, (1, 2), None, 'x'], True
+    >>> r = codec.loads(codec.dumps(c))
+    >>> r.result, r._result_given, r._result_exception
+    ([255.0, (1, 2), None, 'x'], True, False)
+    >>> codec.dumps(Command('brick.unknown')) is None
+    True
+    """
+    CALL = 1
+    REPLY = 2
+    TAGS = (CALL, REPLY)  # first byte of a frame; brickle (marshal) frames never start with these
+    _CALL = struct.Struct('!BIHBB')  # tag, id, method index, number of args, number of kwargs
+    _REPLY = struct.Struct('!BIB')  # tag, id, flags
+    _EXCEPTION = 1
+    _INT8 = struct.Struct('!b')
+    _INT64 = struct.Struct('!q')
+    _FLOAT = struct.Struct('!d')
+    _SIZE = struct.Struct('!I')
+
+    class EncodingError(IdentifyingException):
+        pass
+
+    def __init__(self, methods):
+        self.methods = list(methods)
+        self.index = {name: i for i, name in enumerate(self.methods)}
+
+    def dumps(self, obj):
+        """Encode a Command, or return None if it cannot be encoded."""
+        if not isinstance(obj, Command) or type(obj.id) != int:
+            return None
+        out = bytearray()
+        try:
+            if obj._result_given:
+                out += BinaryCodec._REPLY.pack(BinaryCodec.REPLY, obj.id,
+                                               BinaryCodec._EXCEPTION if obj._result_exception else 0)
+                BinaryCodec._encode(obj.result, out)
+            else:
+                i = self.index.get(obj.func_name, None)
+                if i is None or len(obj.args) > 255 or len(obj.kwargs) > 255:
+                    return None
+                out += BinaryCodec._CALL.pack(BinaryCodec.CALL, obj.id, i, len(obj.args), len(obj.kwargs))
+                for value in obj.args:
+                    BinaryCodec._encode(value, out)
+                for key, value in obj.kwargs.items():
+                    BinaryCodec._encode(key, out)
+                    BinaryCodec._encode(value, out)
+        except (BinaryCodec.EncodingError, struct.error):
+            return None
+        return bytes(out)
+
+    def loads(self, data) -> 'Command':
+        """Decode a frame made by dumps."""
+        try:
+            if data[0] == BinaryCodec.CALL:
+                _, cid, i, nargs, nkwargs = BinaryCodec._CALL.unpack_from(data)
+                offset = BinaryCodec._CALL.size
+                args = []
+                for _ in range(nargs):
+                    value, offset = BinaryCodec._decode(data, offset)
+                    args.append(value)
+                kwargs = {}
+                for _ in range(nkwargs):
+                    key, offset = BinaryCodec._decode(data, offset)
+                    kwargs[key], offset = BinaryCodec._decode(data, offset)
+                c = Command(self.methods[i], *args, **kwargs)
+            else:
+                _, cid, flags = BinaryCodec._REPLY.unpack_from(data)
+                c = Command('')
+                c.result, _ = BinaryCodec._decode(data, BinaryCodec._REPLY.size)
+                c._result_given = True
+                c._result_exception = bool(flags & BinaryCodec._EXCEPTION)
+            c.id = cid
+            return c
+        except Exception as err:
+            raise brickle.UnpicklingError(err)
+
+    @staticmethod
+    def _encode(value, out: bytearray):
+        t = type(value)
+        if value is None:
+            out += b'N'
+        elif t == bool:
+            out += b'T' if value else b'F'
+        elif t == int:
+            if -128 <= value <= 127:
+                out += b'b'
+                out += BinaryCodec._INT8.pack(value)
+            else:
+                out += b'q'
+                out += BinaryCodec._INT64.pack(value)
+        elif t == float:
+            out += b'd'
+            out += BinaryCodec._FLOAT.pack(value)
+        elif t == str:
+            encoded = value.encode()
+            out += b's'
+            out += BinaryCodec._SIZE.pack(len(encoded))
+            out += encoded
+        elif t in (bytes, bytearray):
+            out += b'y'
+            out += BinaryCodec._SIZE.pack(len(value))
+            out += value
+        elif t in (list, tuple):
+            out += b'l' if t == list else b't'
+            out += BinaryCodec._SIZE.pack(len(value))
+            for item in value:
+                BinaryCodec._encode(item, out)
+        elif t == dict:
+            out += b'm'
+            out += BinaryCodec._SIZE.pack(len(value))
+            for key, item in value.items():
+                BinaryCodec._encode(key, out)
+                BinaryCodec._encode(item, out)
+        else:
+            raise BinaryCodec.EncodingError(f"Cannot encode {t.__name__}")
+
+    @staticmethod
+    def _decode(data, offset):
+        tag = data[offset]
+        offset += 1
+        if tag == 0x4E:  # N
+            return None, offset
+        if tag == 0x54:  # T
+            return True, offset
+        if tag == 0x46:  # F
+            return False, offset
+        if tag == 0x62:  # b
+            return BinaryCodec._INT8.unpack_from(data, offset)[0], offset + 1
+        if tag == 0x71:  # q
+            return BinaryCodec._INT64.unpack_from(data, offset)[0], offset + 8
+        if tag == 0x64:  # d
+            return BinaryCodec._FLOAT.unpack_from(data, offset)[0], offset + 8
+        size, = BinaryCodec._SIZE.unpack_from(data, offset)
+        offset += 4
+        if tag == 0x73:  # s
+            return bytes(data[offset:offset + size]).decode(), offset + size
+        if tag == 0x79:  # y
+            return bytes(data[offset:offset + size]), offset + size
+        if tag in (0x6C, 0x74):  # l, t
+            items = []
+            for _ in range(size):
+                item, offset = BinaryCodec._decode(data, offset)
+                items.append(item)
+            return (items if tag == 0x6C else tuple(items)), offset
+        if tag == 0x6D:  # m
+            result = {}
+            for _ in range(size):
+                key, offset = BinaryCodec._decode(data, offset)
+                result[key], offset = BinaryCodec._decode(data, offset)
+            return result, offset
+        raise ValueError(f"Unknown value tag {tag}")
+
+
 class PasswordProtected:
     def __init__(self, password=None):
         if password is None:
@@ -154,6 +335,7 @@ class Command(PasswordProtected):
 
     Utilized mainly by the Connection, RemoteClient, and RemoteServer classes in this module.
     """
+    _ids = itertools.count(1)  # Clients replace this id with one from their Connection
 
     def __init__(self, func_name, *args, **kwargs):
         """Accepts the function name and arguments of the function call."""
@@ -161,7 +343,7 @@ class Command(PasswordProtected):
         self.func_name = func_name
         self.args = args
         self.kwargs = kwargs
-        self.id = str(uuid.uuid1())
+        self.id = next(Command._ids) & 0xFFFFFFFF
         self.result = None
         self._result_given = False
         self._result_exception = False
@@ -199,80 +381,152 @@ class ConnectionFatalError(IdentifyingException):
     pass
 
 
+def _encode_frame(obj, codec: BinaryCodec, password) -> bytes:
+    """Encode an object with the session codec if possible, otherwise with brickle and the
+    password, and prefix it with its FRAME_HEADER."""
+    d = None if codec is None else codec.dumps(obj)
+    if d is None:
+        obj.password = password
+        d = brickle.dumps(obj)
+    return FRAME_HEADER.pack(len(d)) + d
+
+
+def _decode_frame(data, codec: BinaryCodec, password):
+    """Decode the data of one frame with the session codec or brickle.
+    Returns None if it cannot be decoded, or if a brickle frame has the wrong password.
+    Binary frames belong to the session, which was authenticated by password when it started."""
+    session = data[:1] and data[0] in BinaryCodec.TAGS
+    try:
+        if session:
+            if codec is None:
+                raise brickle.UnpicklingError("Binary frame received before the session started")
+            o = codec.loads(data)
+        else:
+            o = brickle.loads(data)
+    except brickle.UnpicklingError as err:
+        print('Data Unpickling Error:', err, file=sys.stderr)
+        return None
+    if isinstance(o, PasswordProtected) and (session or o.verify_password(password)):
+        return o
+    return None
+
+
 class Connection:
     """Objects that wrap TCP sockets and create a thread to listen for received data.
     It also allows for listeners to be added, that process the data when it is received.
+
+    Each message is framed by a FRAME_HEADER giving its length, so messages of any size
+    can be sent, and several messages arriving in one read are all decoded.
+
+    last_received is the time.perf_counter() of the last data received, for heartbeats.
     """
 
-    def __init__(self, sock, password="password", debug=None):
+    def __init__(self, sock, password="password", debug=None, start=True):
         self.sock: socket.socket = sock
         self.listeners = {}
         self.run_event = threading.Event()
         self.lock_listener = threading.Lock()
         self.lock_send = threading.Lock()
         self._isclosed = False
+        self.close_listeners = []
+        self.lock_close = threading.Lock()
+        self.last_received = time.perf_counter()
 
         self.password = password
+        # Set once the session is authenticated, see RemoteClient.start_session
+        self.codec: BinaryCodec = None
+        self.ids = itertools.count(1)
         self.run_event.set()
+        if start:
+            self.start()
+
+    def start(self):
+        """Start the thread receiving data. Create the Connection with start=False to register
+        listeners first, so the first messages received are not missed."""
         t = threading.Thread(target=Connection._func,
                              args=(self,), daemon=True)
         t.start()
 
     def _func(self):
         # self._debug('starting connection thread')
+        chunk = bytearray(RECV_SIZE)
+        view = memoryview(chunk)
+        buffer = bytearray()
+        header_size = FRAME_HEADER.size
         while self.run_event.is_set():
             try:
                 # self._debug('start receiving')
                 try:
-                    d = self.sock.recv(4096)
+                    n = self.sock.recv_into(view)
                 except:
                     # The read failed because the connection probably died.
                     self.close()
                     break
-                # self._debug('received. loading...')
-                if len(d) <= 0:
+                if n <= 0:
                     self.run_event.clear()
                     self.close()
                     break
-                o = brickle.loads(d)
-                # self._debug('received. loaded...')
-
-                self.lock_listener.acquire()
-
-                if isinstance(o, PasswordProtected) and o.verify_password(self.password):
-                    for key, val in self.listeners.items():
-                        listener, args = val
-                        try:
-                            # self._debug(f'running listener "{key}"')
-                            listener(*args, o, self)
-                            # self._debug(f'completed listener "{key}"')
-                        except Exception as err:
-                            c = ConnectionListenerError(
-                                f"Error: Listener {key} - {err} {val}")
-                            print(c, file=sys.stderr)
-                self.lock_listener.release()
+                self.last_received = time.perf_counter()
+                buffer += view[:n]
+
+                # Decode every complete frame in the buffer, keep the remainder for the next read
+                offset = 0
+                while len(buffer) - offset >= header_size:
+                    size, = FRAME_HEADER.unpack_from(buffer, offset)
+                    end = offset + header_size + size
+                    if len(buffer) < end:
+                        break
+                    data = bytes(buffer[offset + header_size:end])
+                    offset = end
+                    self._receive(data)
+                if offset:
+                    del buffer[:offset]
             except OSError as err:
                 if self.isclosed():
                     return
                 print('Warning:', err, file=sys.stderr)
-            except brickle.UnpicklingError as err:
-                print('Data Unpickling Error:', err, file=sys.stderr)
             except Exception as err:
                 c = ConnectionFatalError(f'Bad Error: {err}')
                 print(c, file=sys.stderr)
         # self._debug(f'connection thread ended')
 
+    def _receive(self, data):
+        """Decode one framed message and pass it to every listener."""
+        o = _decode_frame(data, self.codec, self.password)
+        # self._debug('received. loaded...')
+
+        with self.lock_listener:
+            if o is not None:
+                for key, val in self.listeners.items():
+                    listener, args = val
+                    try:
+                        # self._debug(f'running listener "{key}"')
+                        listener(*args, o, self)
+                        # self._debug(f'completed listener "{key}"')
+                    except Exception as err:
+                        c = ConnectionListenerError(
+                            f"Error: Listener {key} - {err} {val}")
+                        print(c, file=sys.stderr)
+
     def send(self, obj):
         """Send an object over the Connection. Only accepts objects of the type PasswordProtected."""
         if isinstance(obj, PasswordProtected):
-            self.lock_send.acquire()
-            obj.password = self.password
-            # self._debug(f'dumping data ({str(obj)})')
-            d = brickle.dumps(obj)
-            # self._debug(f'sending data dump ({str(obj)})')
-            self.sock.send(d)
-            # self._debug(f'data sent ({str(obj)})')
-            self.lock_send.release()
+            with self.lock_send:
+                # self._debug(f'sending data dump ({str(obj)})')
+                self.sock.sendall(_encode_frame(obj, self.codec, self.password))
+                # self._debug(f'data sent ({str(obj)})')
+
+    def start_session(self, reply, codec: BinaryCodec):
+        """Send the reply to '__session', the last brickle frame, and switch to the codec.
+        The codec is set first, since the client may answer with a binary frame as soon
+        as it receives the reply, before this thread runs again."""
+        with self.lock_send:
+            self.codec = codec
+            self.sock.sendall(_encode_frame(reply, None, self.password))
+
+    def next_id(self):
+        """A call id for a Command sent on this connection."""
+        return next(self.ids) & 0xFFFFFFFF
 
     def register_listener(self, name, listener, args=None):
         """Expects a listener of function type:
@@ -289,6 +543,16 @@ class Connection:
         self.listeners[name] = (listener, args)
         self.lock_listener.release()
 
+    def register_close_listener(self, listener):
+        """Call listener(connection) once, when this connection is closed, whether by close()
+        or because the socket died. Called immediately if it is already closed."""
+        with self.lock_close:
+            closed = self._isclosed
+            if not closed:
+                self.close_listeners.append(listener)
+        if closed:
+            listener(self)
+
     def __del__(self):
         self.close()
 
@@ -301,7 +565,15 @@ class Connection:
         except:
             pass
 
-        self._isclosed = True
+        with self.lock_close:
+            listeners = [] if self._isclosed else self.close_listeners
+            self._isclosed = True
+            self.close_listeners = []
+        for listener in listeners:
+            try:
+                listener(self)
+            except Exception as err:
+                print(ConnectionListenerError(f"Error: Close listener - {err}"), file=sys.stderr)
 
     def isclosed(self):
         """Checks if the socket is closed."""
@@ -453,11 +725,15 @@ class _RemoteCaller:
     It will then wait for a response from the RemoteClient object, and return the result of that instead.
     """
     TESTING = False
+    # Generated proxy classes by (class, var_name, custom method names)
+    PROXY_CLASSES = {}
 
     def create_caller(obj, remote_client, custom=None, var_name=''):
         """Alters the given object (obj) such it represents a Remote Object.
 
         Its functions will be modified to instead send Command objects through the RemoteClient (remote_client).
+        This is done by switching obj to a proxy subclass of its class, generated once per class
+        (see proxy_class), so only methods set on obj itself need patching.
 
         obj - the object to be altered to represent the Remote Object. Should be of the same type as the Remote Object.
             This action relies on this obj having at least the same methods as the Remote Object.
@@ -471,18 +747,56 @@ class _RemoteCaller:
         if custom is None:
             custom = []
 
-        for name in dir(obj):
-            attr = getattr(obj, name)
+        obj.__class__ = _RemoteCaller.proxy_class(obj.__class__, custom, var_name)
+        for name, attr in list(vars(obj).items()):
             if name in custom or (callable(attr) and not name.startswith('__')):
                 setattr(obj, name, caller._generate(name))
 
         obj.__remote__ = caller
         return obj
 
+    def proxy_class(cls, custom=(), var_name=''):
+        """The subclass of cls whose methods send their calls to the Remote Object named var_name,
+        through the _RemoteCaller set as the __remote__ attribute of the instance. Cached."""
+        key = (cls, var_name, tuple(custom))
+        proxy = _RemoteCaller.PROXY_CLASSES.get(key, None)
+        if proxy is None:
+            methods = {name: _RemoteCaller._proxy_method(f'{var_name}.{name}', name) for name in dir(cls)
+                       if name in custom or (callable(getattr(cls, name)) and not name.startswith('__'))}
+            proxy = type(f'Remote{cls.__name__}', (cls,), methods)
+            _RemoteCaller.PROXY_CLASSES[key] = proxy
+        return proxy
+
+    def _proxy_method(func_name, name):
+        """Creates a method of a proxy class, which calls func_name on the host."""
+        def method(self, *args, wait_for_data=60, **kwargs):
+            res = self.__remote__.remote_client._send_command(
+                func_name, *args, wait_for_data=wait_for_data, **kwargs)
+            if _RemoteCaller.TESTING or type(res) != Command:
+                return res
+            return res.result
+        method.__name__ = method.__qualname__ = name
+        return method
+
     def __init__(self, remote_client, var_name):
         self.remote_client = remote_client
         self.var_name = var_name
 
+    def call_async(self, func_name, *args, **kwargs) -> Future:
+        """Call a method of the Remote Object without waiting for the result.
+        Returns a Future for the result, see RemoteClient.call_async.
+
+        eg, brick.__remote__.call_async('get_sensor', brick.PORT_1)
+        """
+        return self.remote_client.call_async(f'{self.var_name}.{func_name}', *args, **kwargs)
+
+    def batch(self) -> 'RemoteBatch':
+        """Create a RemoteBatch of calls to the methods of the Remote Object.
+
+        eg, batch = brick.__remote__.batch()
+        """
+        return RemoteBatch(self.remote_client, self.var_name)
+
     def _generate(self, func_name):
         """Creates special methods that replace the existing methods in the remote object."""
         func_name = f'{self.var_name}.{func_name}'
@@ -505,6 +819,71 @@ class RemoteException(Exception):
     pass
 
 
+class RemoteBatch:
+    """Collects method calls and sends them to the host as one command, which the host runs
+    in order, in one pass, and answers with all the results together.
+
+    batch = client.batch('brick')
+    batch.call('get_sensor', brick.PORT_1)
+    batch.call('set_motor_power', brick.PORT_A, -20)
+    distance, _ = batch.send()
+    """
+
+    def __init__(self, remote_client, var_name=''):
+        """remote_client - the RemoteClient the calls are sent through
+        var_name - the key of the Remote Object, prefixed to the method names given to call.
+            Leave empty to give full method names, eg, 'brick.get_sensor'.
+        """
+        self.remote_client = remote_client
+        self.prefix = f'{var_name}.' if var_name else ''
+        self.calls = []
+
+    def call(self, func_name, *args, **kwargs) -> int:
+        """Add a method call to the batch. Returns its index in the results."""
+        self.calls.append((self.prefix + func_name, args, kwargs))
+        return len(self.calls) - 1
+
+    def send_async(self, raise_errors=True) -> Future:
+        """Send the batch and return a Future for the list of results, see send.
+        The batch is emptied, and can be reused."""
+        calls, self.calls = self.calls, []
+        future = Future()
+        future.set_running_or_notify_cancel()
+
+        def done(reply: Future):
+            try:
+                future.set_result(RemoteBatch._unpack(reply.result(), raise_errors))
+            except Exception as err:
+                future.set_exception(err)
+
+        self.remote_client._send_command_async('__batch', calls).add_done_callback(done)
+        return future
+
+    def send(self, timeout=None, raise_errors=True) -> list:
+        """Send the batch and wait for the results, one per call, in order.
+
+        raise_errors - if True, raise RemoteException for the first call that failed.
+            Otherwise, failed calls give a RemoteException as their result.
+        """
+        return self.send_async(raise_errors).result(timeout)
+
+    @staticmethod
+    def _unpack(command: Command, raise_errors):
+        if command._result_exception:
+            raise RemoteException(str(command.result))
+        results = []
+        for success, value in command.result:
+            if not success:
+                value = RemoteException(value)
+                if raise_errors:
+                    raise value
+            results.append(value)
+        return results
+
+    def __len__(self):
+        return len(self.calls)
+
+
 class RemoteClient(MessageReceiver):
     """The client for remote method invocation.
 
@@ -517,7 +896,8 @@ class RemoteClient(MessageReceiver):
 
     TESTING = False
 
-    def __init__(self, address, password, port=None, sock=None):
+    def __init__(self, address, password, port=None, sock=None, compact=True,
+                 heartbeat=None, reconnect=False):
         """Creates the client for remote method invocation.
 
         address - a string of either IP Address or Hostname of the Remote host
@@ -526,6 +906,15 @@ class RemoteClient(MessageReceiver):
             to connect to.
         sock - None creates a new socket based on the address and port. Otherwise, expects
             an opened socket that is ready for sending and receiving data.
+        compact - if True, start an authenticated session with the host to send
+            commands with the BinaryCodec instead of brickle. See start_session.
+        heartbeat - None for no heartbeats. Otherwise, the seconds between heartbeats sent
+            to the host. Their round trip times are kept, see get_link_stats, and the link
+            is closed when nothing was received for HEARTBEAT_TIMEOUT seconds.
+        reconnect - if True, reconnect to the host in the background whenever the link is closed.
+
+        Calls in flight when the link is closed fail immediately with ConnectionError,
+        as do calls made until it is reconnected.
         """
         super(RemoteClient, self).__init__()
 
@@ -535,17 +924,144 @@ class RemoteClient(MessageReceiver):
 
         self.buffer = {}
         self.lock_buffer = threading.Lock()
+        self.condition_buffer = threading.Condition(self.lock_buffer)
+        # Futures of the commands in flight by command id, with whether to resolve them to the result value
+        self.pending: Dict[str, tuple[Future, bool]] = {}
+        # Handlers of commands pushed by the host, by func_name, eg, '__sensor_update'
+        self.handlers = {}
 
         self.status = None
 
+        self.compact = compact
+        self.heartbeat = heartbeat
+        self.reconnect = reconnect
+        self.run_event = threading.Event()
+        self.run_event.set()
+        self.wake_event = threading.Event()
+        self.rtts = deque(maxlen=RTT_HISTORY)
+        self.heartbeats = 0
+        self.disconnects = 0
+        self.reconnects = 0
+
+        self._connect(sock)
+        self.monitor = None
+        if heartbeat is not None or reconnect:
+            self.monitor = threading.Thread(target=self._monitor, daemon=True)
+            self.monitor.start()
+
+    def _connect(self, sock=None, session_timeout=None):
+        """Open the connection to the host, with a new socket if sock is None, and start its session.
+        If session_timeout is given and the host does not answer in time, the connection is closed
+        and ConnectionError is raised."""
         if sock is None:
-            self.sock = socket.create_connection((self.address, self.port))
-        else:
-            self.sock = sock
-
-        self.conn = Connection(self.sock, self.password)
+            sock = socket.create_connection((self.address, self.port), session_timeout)
+            sock.settimeout(None)
+        self.sock = sock
+        self.conn = Connection(self.sock, self.password, start=False)
 
         self.conn.register_listener('main', RemoteClient._listener, (self,))
+        self.conn.register_close_listener(self._disconnected)
+        connected_at = self.conn.last_received
+        self.conn.start()
+        if self.compact and session_timeout is not None:
+            if not self.start_session(session_timeout) and self.conn.last_received == connected_at:
+                self.conn.close()
+                raise ConnectionError("The host did not answer")
+        elif self.compact:
+            self.start_session()
+
+    def is_connected(self) -> bool:
+        return not self.conn.isclosed()
+
+    def get_link_stats(self):
+        """Returns the heartbeat round trip times (seconds) of the last RTT_HISTORY heartbeats,
+        the time since anything was last received, and the disconnect and reconnect counts."""
+        rtts = sorted(self.rtts)
+        n = len(rtts)
+        return {
+            'connected': self.is_connected(),
+            'heartbeats': self.heartbeats,
+            'rtt_last': self.rtts[-1] if n else None,
+            'rtt_min': rtts[0] if n else None,
+            'rtt_mean': sum(rtts) / n if n else None,
+            'rtt_p95': rtts[min(n - 1, int(n * 0.95))] if n else None,
+            'rtt_max': rtts[-1] if n else None,
+            'since_received': time.perf_counter() - self.conn.last_received,
+            'disconnects': self.disconnects,
+            'reconnects': self.reconnects,
+        }
+
+    def _disconnected(self, conn: Connection):
+        """Close listener of the connection: fail every call in flight, and wake up the monitor to reconnect."""
+        with self.condition_buffer:
+            if conn is not self.conn:
+                return
+            pending, self.pending = self.pending, {}
+            self.buffer.clear()
+            self.condition_buffer.notify_all()
+        self.disconnects += 1
+        for future, _ in pending.values():
+            if not future.done():
+                future.set_exception(ConnectionError("The connection to the host was lost"))
+        self.wake_event.set()
+        self.on_disconnect()
+
+    def on_disconnect(self):
+        """Called once the connection to the host is lost. Override to clear state that depends on the host."""
+        pass
+
+    def on_reconnect(self):
+        """Called from the monitor thread once the client reconnected to the host, eg, to subscribe again."""
+        pass
+
+    def _monitor(self):
+        """Sends the heartbeats, closes the link when the host stopped answering, and reconnects."""
+        interval = HEARTBEAT_INTERVAL if self.heartbeat is None else self.heartbeat
+        delay = RECONNECT_DELAY
+        while self.run_event.is_set():
+            conn = self.conn
+            if conn.isclosed():
+                if not self.reconnect:
+                    break
+                try:
+                    self._connect(session_timeout=HEARTBEAT_TIMEOUT)
+                except OSError:
+                    self.wake_event.wait(delay)
+                    delay = min(delay * 2, RECONNECT_MAX_DELAY)
+                    continue
+                if not self.run_event.is_set():
+                    self.conn.close()
+                    break
+                delay = RECONNECT_DELAY
+                self.reconnects += 1
+                try:
+                    self.on_reconnect()
+                except Exception as err:
+                    print('Warning: reconnected, but', err, file=sys.stderr)
+                continue
+
+            if self.heartbeat is not None:
+                if time.perf_counter() - conn.last_received > HEARTBEAT_TIMEOUT:
+                    # The host has not answered the last heartbeats: the link is dead
+                    conn.close()
+                    continue
+                sent = time.perf_counter()
+                self.heartbeats += 1
+                self._send_command_async('__ping').add_done_callback(
+                    lambda future, sent=sent: future.exception() is None and self.rtts.append(time.perf_counter() - sent))
+            self.wake_event.wait(interval)
+            self.wake_event.clear()
+
+    def start_session(self, timeout=5):
+        """Authenticate once with the password and receive the table of method names of the host.
+        After that, commands are sent with the compact BinaryCodec, without the password.
+        Returns False (and keeps using brickle) if the host does not support sessions.
+        """
+        try:
+            self._send_command('__session', wait_for_data=timeout)
+        except RemoteException:
+            pass
+        return self.conn.codec is not None
 
     def create_caller(self, obj, custom=None, var_name=''):
         """Alters the given object (obj) such that it represents a Remote Object.
@@ -560,6 +1076,12 @@ class RemoteClient(MessageReceiver):
         """
         return _RemoteCaller.create_caller(obj, self, custom=custom, var_name=var_name)
 
+    def register_handler(self, func_name, handler):
+        """Handle the commands named func_name that the host pushes without being asked,
+        eg, '__sensor_update'. handler(command) runs on the connection's listener thread,
+        so it must not block."""
+        self.handlers[func_name] = handler
+
     def send_message(self, text):
         """Sends a string text message to the host"""
         self.conn.send(Message(text))
@@ -568,8 +1090,10 @@ class RemoteClient(MessageReceiver):
         self.close()
 
     def close(self):
-        """Closes this connection to the host."""
+        """Closes this connection to the host, without reconnecting."""
         try:
+            self.run_event.clear()
+            self.wake_event.set()
             self.conn.close()
         except:
             pass
@@ -581,56 +1105,317 @@ class RemoteClient(MessageReceiver):
             self.messages.append(obj)
             self.lock_messages.release()
         elif isinstance(obj, Command):
-            self.lock_buffer.acquire()
-            self.buffer[obj.id] = obj
-            self.lock_buffer.release()
+            if obj.func_name == '__session' and not obj._result_exception:
+                # Switch codecs here, before any frame that follows the reply is read
+                conn.codec = BinaryCodec(obj.result)
+            handler = self.handlers.get(obj.func_name, None)
+            if handler is not None:
+                handler(obj)
+                return
+            with self.condition_buffer:
+                future, unwrap = self.pending.pop(obj.id, (None, False))
+                if future is None:
+                    self.buffer[obj.id] = obj
+                    self.condition_buffer.notify_all()
+            if future is not None:
+                RemoteClient._resolve(future, obj, unwrap)
         else:
             pass
 
+    @staticmethod
+    def _resolve(future: Future, command: Command, unwrap: bool):
+        if not unwrap:
+            future.set_result(command)
+        elif command._result_exception:
+            future.set_exception(RemoteException(str(command.result)))
+        else:
+            future.set_result(command.result)
+
+    def batch(self, var_name='') -> RemoteBatch:
+        """Create a RemoteBatch, to send many method calls to the host in one command.
+        var_name is the key of the Remote Object whose methods are called, eg, 'brick'."""
+        return RemoteBatch(self, var_name)
+
+    def call_async(self, func, *args, **kwargs) -> Future:
+        """Send a command to the host without waiting for its reply, and return a
+        concurrent.futures.Future that is resolved with the result when it arrives.
+        If the call raised an exception on the host, the Future raises RemoteException.
+
+        Many calls can be in flight at once on the same connection, eg,
+        futures = [client.call_async('brick.get_sensor', port) for port in ports]
+        values = [f.result() for f in futures]
+
+        func - the full method name, eg, 'brick.get_sensor'
+        Thread-safe.
+        """
+        return self._send_command_async(func, *args, unwrap=True, **kwargs)
+
+    def _send_command_async(self, func, *args, unwrap=False, **kwargs) -> Future:
+        """Send a command object to the other brick, and return a Future for its reply.
+        Thread-safe.
+        """
+        c = Command(func, *args, **kwargs)
+        c.id = self.conn.next_id()
+        future = Future()
+        future.command_id = c.id
+        future.set_running_or_notify_cancel()
+        conn = self.conn
+        with self.lock_buffer:
+            self.pending[c.id] = (future, unwrap)
+        try:
+            if conn.isclosed():
+                raise ConnectionError("Not connected to the host")
+            conn.send(c)
+        except Exception as err:
+            with self.lock_buffer:
+                self.pending.pop(c.id, None)
+            if not future.done():
+                future.set_exception(err)
+        return future
+
     def _send_command(self, func, *args, wait_for_data=True, **kwargs):
         """Send a command object to the other brick.
         Thread-safe.
         """
-        c = Command(func, * args, **kwargs)
-        self.conn.send(c)
-        if wait_for_data:
-            res = self._get_result(c.id, wait_for_data)
-            if res._result_exception and not RemoteClient.TESTING:
-                raise RemoteException(str(res.result))
-        else:
-            res = c.id
-
+        if not wait_for_data:
+            c = Command(func, *args, **kwargs)
+            c.id = self.conn.next_id()
+            self.conn.send(c)
+            return c.id
+
+        timeout = wait_for_data if isinstance(wait_for_data, (int, float)) and wait_for_data is not True else None
+        future = self._send_command_async(func, *args, **kwargs)
+        try:
+            res = future.result(timeout)
+        except FutureTimeoutError:
+            # Give up on the reply; if it arrives later it is kept for _get_result
+            with self.lock_buffer:
+                self.pending.pop(future.command_id, None)
+            return None
+        if res._result_exception and not RemoteClient.TESTING:
+            raise RemoteException(str(res.result))
         return res
 
     def _get_result(self, cid, wait_for_data=True) -> Command:
-        """Get the result of the following command id.
+        """Get the result of the following command id, waiting for it to arrive if wait_for_data
+        is True or a number of seconds. Returns None if it did not arrive in time.
         Thread-safe.
         """
-        waiting = not not wait_for_data
-        if not isinstance(wait_for_data, (int, float)):
-            wait_for_data = inf
-
-        start = time.perf_counter()
-        end = time.perf_counter()
-        while waiting and wait_for_data > (end-start):
-            self.lock_buffer.acquire()
-            if cid in self.buffer:
-                self.lock_buffer.release()
-                break
-            self.lock_buffer.release()
-
-            time.sleep(BUSY_WAITING)
-            end = time.perf_counter()
+        timeout = wait_for_data if isinstance(wait_for_data, (int, float)) and wait_for_data is not True else None
+        with self.condition_buffer:
+            if wait_for_data:
+                self.condition_buffer.wait_for(lambda: cid in self.buffer or self.conn.isclosed(), timeout)
+            return self.buffer.pop(cid, None)
 
-        self.lock_buffer.acquire()
-        o = self.buffer.get(cid, None)
-        if o is not None:
-            del self.buffer[cid]
-        self.lock_buffer.release()
-        return o
 
+class _ObjectHost:
+    """The registered objects of a remote method invocation host, and the execution of the
+    Commands received for them. Shared by RemoteServer and AsyncRemoteServer, which must
+    set the _callers and _caller_methods attributes.
+
+    Replies are sent with conn.send(command), so conn can be any object with a send method
+    and a codec attribute, eg, a Connection.
+    """
+    # Special commands that sessions encode with the BinaryCodec
+    SESSION_COMMANDS = ('__batch', '__verify', '__ping')
+
+    def register_object(self, obj, custom=None, var_name=''):
+        """Accepts an object to be controlled by this remote method invocation host.
+
+        Does not modify the object given.
+
+        obj - the object to control
+        custom - Either None (default), or a list of string names of functions that would
+            also be included in the functions being exposed for remote method control.
+        var_name - Acts as a key, that can represent the Remote Object. Helps avoid name conflicts.
+        """
+        caller = _MethodCaller(obj, custom=custom, var_name=var_name)
+        for method in caller.methods:
+            self._caller_methods[method] = caller
+        self._callers.append(caller)
+
+    def _caller_retrieve_command(self, command: Command) -> _MethodCaller:
+        return self._caller_methods.get(command.func_name, None)
+
+    def _caller_supports_command(self, command: Command):
+        return command is not None and command.func_name in self._caller_methods.keys()
+
+    def _caller_execute(self, command: Command):
+        return self._caller_methods[command.func_name].execute(command)
+
+    def _execute(self, conn: Connection, command: Command):
+        """Executes a command and sends the result back to the remote brick (rem)"""
+        command._result_given = True
+
+        try:
+            if (caller := self._caller_retrieve_command(command)) is not None:
+                caller.execute(command)
+                conn.send(command)
+                return
+            elif command.func_name == '__batch':
+                self._execute_batch(command)
+                conn.send(command)
+                return
+            elif command.func_name == '__session':
+                command.result = self.session_methods()
+                conn.start_session(command, BinaryCodec(command.result))
+                return
+            elif command.func_name == '__ping':
+                # Heartbeat of a RemoteClient, echoed back as is
+                conn.send(command)
+                return
+            elif command.func_name == '__initialize':
+                return
+            elif command.func_name == '__verify':
+                command.result = (
+                    f"I am sending back the command for {command.id}")
+                conn.send(command)
+                return
+            else:
+                command.result = str(UnsupportedCommand(
+                    f"Command '{command.func_name}' is not supported."))
+        except Exception as err:
+            command.result = str(f'{err.__class__.__name__}: {err}')
+
+        command._result_exception = True
+        conn.send(command)
+
+    def _execute_batch(self, command: Command):
+        """Executes every call of a '__batch' command in order, in one pass.
+        The result is a list of (success, value) pairs, one per call, where value
+        is the string representation of the exception if the call failed.
+        """
+        results = []
+        for func_name, args, kwargs in command.args[0]:
+            caller = self._caller_methods.get(func_name, None)
+            if caller is None:
+                results.append((False, str(UnsupportedCommand(
+                    f"Command '{func_name}' is not supported."))))
+                continue
+            try:
+                results.append((True, caller.methods[func_name](caller.obj, *args, **kwargs)))
+            except Exception as err:
+                results.append((False, str(MethodCallerException(err))))
+        command.result = results
+
+    def session_methods(self):
+        """The method name table of a new session: every registered method and SESSION_COMMANDS."""
+        return sorted(self._caller_methods) + list(self.SESSION_COMMANDS)
+
+
+def merge_lanes(lanes):
+    """The lane of a command made of several calls (eg, a batch) in the given lanes:
+    None if none of them is ordered, the lane if they share one, else a frozenset of them all."""
+    lanes = frozenset(lanes) - {None}
+    if not lanes:
+        return None
+    if len(lanes) == 1:
+        return next(iter(lanes))
+    return lanes
+
+
+class _CommandExecutor:
+    """A bounded pool of worker threads for a RemoteServer.
+
+    Each job is submitted with a lane. Jobs of the same lane run one at a time, in
+    submission order; jobs without a lane (None) run in parallel with everything.
+    A job submitted with a frozenset of lanes is ordered in each of them: it waits for the
+    earlier jobs of all of them, and their later jobs wait for it.
+    Submitting blocks while max_queued jobs are waiting or running.
+    """
+
+    def __init__(self, workers=SERVER_WORKERS, max_queued=MAX_QUEUED_COMMANDS):
+        self.queue = Queue()
+        self.slots = threading.BoundedSemaphore(max_queued)
+        self.lanes = {}  # lane -> jobs waiting for the running job of that lane
+        self.lock = threading.Lock()
+
+        self.queued = 0
+        self.max_queued = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+        self.threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        for t in self.threads:
+            t.start()
+
+    def submit(self, lane, func, *args):
+        """Run func(*args) on a worker, after the earlier jobs of the same lane (or lanes)."""
+        self.slots.acquire()
+        if lane is None:
+            lanes = ()
+        elif isinstance(lane, frozenset):
+            lanes = tuple(lane)
+        else:
+            lanes = (lane,)
+        # The last item counts the lanes that the job still waits for
+        job = [lanes, func, args, time.perf_counter(), 0]
+        with self.lock:
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+            for lane in lanes:
+                if lane in self.lanes:
+                    self.lanes[lane].append(job)
+                    job[4] += 1
+                else:
+                    self.lanes[lane] = deque()
+            if job[4]:
+                return
+        self.queue.put(job)
+
+    def get_metrics(self):
+        """Returns the queue depth and the mean/max latency in seconds from submission to completion."""
+        with self.lock:
+            n = max(self.completed, 1)
+            return {
+                'queue_depth': self.queued,
+                'max_queue_depth': self.max_queued,
+                'completed': self.completed,
+                'mean_wait': self.total_wait / n,
+                'mean_latency': self.total_latency / n,
+                'max_latency': self.max_latency,
+                'busy_lanes': len(self.lanes),
+            }
+
+    def shutdown(self):
+        for _ in self.threads:
+            self.queue.put(None)
+
+    def _worker(self):
+        while (job := self.queue.get()) is not None:
+            lanes, func, args, submitted, _ = job
+            start = time.perf_counter()
+            with self.lock:
+                self.queued -= 1
+            try:
+                func(*args)
+            except Exception as err:
+                print(ConnectionFatalError(f'Bad Error: {err}'), file=sys.stderr)
+            end = time.perf_counter()
 
-class RemoteServer(MessageReceiver):
+            ready = []
+            with self.lock:
+                self.completed += 1
+                self.total_wait += start - submitted
+                self.total_latency += end - submitted
+                self.max_latency = max(self.max_latency, end - submitted)
+                for lane in lanes:
+                    waiting = self.lanes[lane]
+                    if waiting:
+                        next_job = waiting.popleft()
+                        next_job[4] -= 1
+                        if not next_job[4]:
+                            ready.append(next_job)
+                    else:
+                        del self.lanes[lane]
+            self.slots.release()
+            for next_job in ready:
+                self.queue.put(next_job)
+
+
+class RemoteServer(MessageReceiver, _ObjectHost):
     """The client for remote method invocation.
 
     Objects of this class can broadcast and receive textual messages 
@@ -640,7 +1425,6 @@ class RemoteServer(MessageReceiver):
     Messages received from clients, will have the sender attribute set, 
     such that through these Message objects one can reply to the client.
     """
-
     def __init__(self, password, port=None):
         """Simply accepts the password to authenticate received objects.
 
@@ -657,7 +1441,7 @@ class RemoteServer(MessageReceiver):
         self._isclosed = False
         self.connections: List[RemoteClient] = []
         self.commands = []
-        self.lock_commands = threading.Lock()
+        self.executor = _CommandExecutor()
         self.lock_connections = threading.Lock()
         self.run_event = threading.Event()
         self.run_event.set()
@@ -685,73 +1469,45 @@ class RemoteServer(MessageReceiver):
                     self.connections = list(
                         filter(lambda s: not s.isclosed(), self.connections))
 
-                    connection = Connection(conn, self.password)
+                    connection = Connection(conn, self.password, start=False)
                     connection.register_listener(
                         'main', self._thread_listener)
+                    connection.start()
                     self.connections.append(connection)
                     self.lock_connections.release()
                 self.close_connections()
             self.close()
 
     def _thread_listener(self, obj, conn):
-        if isinstance(obj, Command):
-            self.lock_commands.acquire()
+        if isinstance(obj, Command) and obj.func_name == '__ping':
+            # Answer heartbeats right away, so a busy lane never makes the link look dead
             self._execute(conn, obj)
-            self.lock_commands.release()
+        elif isinstance(obj, Command):
+            self.executor.submit(self.command_lane(conn, obj), self._execute, conn, obj)
         if isinstance(obj, Message):
             self.lock_messages.acquire()
             obj.sender = conn
             self.messages.append(obj)
             self.lock_messages.release()
 
-    def register_object(self, obj, custom=None, var_name=''):
-        """Accepts an object to be controlled by this remote method invocation host.
+    def command_lane(self, conn: Connection, command: Command):
+        """The serialization policy of received commands. Commands given the same lane
+        run one at a time, in the order they were received; None runs in parallel.
+        A frozenset of lanes orders the command in each of them, eg, for a batch.
 
-        Does not modify the object given.
-
-        obj - the object to control
-        custom - Either None (default), or a list of string names of functions that would
-            also be included in the functions being exposed for remote method control.
-        var_name - Acts as a key, that can represent the Remote Object. Helps avoid name conflicts.
+        By default, calls to the same registered object are serialized, and
+        other commands are ordered per connection. Override to allow more parallelism.
         """
-        caller = _MethodCaller(obj, custom=custom, var_name=var_name)
-        for method in caller.methods:
-            self._caller_methods[method] = caller
-        self._callers.append(caller)
+        if (caller := self._caller_retrieve_command(command)) is not None:
+            return caller.var_name
+        if command.func_name == '__batch':
+            return merge_lanes(self._caller_methods[name].var_name
+                               for name, _, _ in command.args[0] if name in self._caller_methods)
+        return conn
 
-    def _caller_retrieve_command(self, command: Command) -> _MethodCaller:
-        return self._caller_methods.get(command.func_name, None)
-
-    def _caller_supports_command(self, command: Command):
-        return command is not None and command.func_name in self._caller_methods.keys()
-
-    def _caller_execute(self, command: Command):
-        return self._caller_methods[command.func_name].execute(command)
-
-    def _execute(self, conn: Connection, command: Command):
-        """Executes a command and sends the result back to the remote brick (rem)"""
-        command._result_given = True
-
-        try:
-            if (caller := self._caller_retrieve_command(command)) is not None:
-                caller.execute(command)
-                conn.send(command)
-                return
-            elif command.func_name == '__initialize':
-                return
-            elif command.func_name == '__verify':
-                command.result = (
-                    f"I am sending back the command for {command.id}")
-                conn.send(command)
-                return
-            else:
-                command.result = str(UnsupportedCommand(
-                    f"Command '{command.func_name}' is not supported."))
-        except Exception as err:
-            command.result = str(f'{err.__class__.__name__}: {err}')
-
-        command._result_exception = True
-        conn.send(command)
+    def get_metrics(self):
+        """Returns the command queue depth and latency statistics of this server."""
+        return self.executor.get_metrics()
 
     def __del__(self):
         self.close()
@@ -787,6 +1543,7 @@ class RemoteServer(MessageReceiver):
         self._isclosed = True
         self.run_event.clear()
         self.close_connections()
+        self.executor.shutdown()
         try:
             self.sock.shutdown(socket.SHUT_RDWR)
             self.sock.close()
@@ -796,3 +1553,301 @@ class RemoteServer(MessageReceiver):
     def isclosed(self):
         """Returns True if this server has been closed by .close()"""
         return self._isclosed
+
+
+async def _read_frame(reader: asyncio.StreamReader) -> bytes:
+    """Read the data of one frame. Raises asyncio.IncompleteReadError at the end of the stream."""
+    size, = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    return await reader.readexactly(size)
+
+
+class _AsyncConnection:
+    """One client connection of an AsyncRemoteServer. Like a Connection, it has a send
+    method and a session codec, so _ObjectHost can reply through it. Not thread-safe:
+    only use it from the event loop."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, password):
+        self.reader = reader
+        self.writer = writer
+        self.password = password
+        self.codec: BinaryCodec = None
+
+    def send(self, obj):
+        """Queue an object to be sent. Only accepts objects of the type PasswordProtected."""
+        if isinstance(obj, PasswordProtected) and not self.writer.is_closing():
+            self.writer.write(_encode_frame(obj, self.codec, self.password))
+
+    def start_session(self, reply, codec: BinaryCodec):
+        """Send the reply to '__session', the last brickle frame, and switch to the codec."""
+        self.writer.write(_encode_frame(reply, None, self.password))
+        self.codec = codec
+
+    def close(self):
+        self.writer.close()
+
+    def isclosed(self):
+        return self.writer.is_closing()
+
+
+class _DeferredReplies:
+    """Stands in for an _AsyncConnection while a blocking method runs in a worker thread,
+    keeping the replies to send from the event loop afterwards."""
+
+    def __init__(self, conn: _AsyncConnection):
+        self.codec = conn.codec
+        self.replies = []
+
+    def send(self, obj):
+        self.replies.append(obj)
+
+
+class AsyncRemoteServer(MessageReceiver, _ObjectHost):
+    """The asyncio version of RemoteServer: every client connection is a coroutine
+    on one event loop, instead of a thread per connection and worker threads.
+
+    Registered methods run directly on the event loop, one at a time, so they must not
+    block. Methods listed as blocking in register_object run in the default executor.
+
+    server = await AsyncRemoteServer(password).start()
+    server.register_object(obj, var_name='brick')
+    await server.serve_forever()
+    """
+
+    def __init__(self, password, port=None):
+        super(AsyncRemoteServer, self).__init__()
+        self.password = (DEFAULT_PASSWORD if password is None else password)
+        self.port = (DEFAULT_PORT if port is None else port)
+
+        self._callers: List[_MethodCaller] = []
+        self._caller_methods: Dict[str, _MethodCaller] = {}
+        self.blocking = set()
+
+        self.connections = set()
+        self.server: asyncio.AbstractServer = None
+
+    async def start(self):
+        """Start accepting connections. Returns this server."""
+        reuse_port = (hasattr(_socket, "SO_REUSEPORT"))
+        self.server = await asyncio.start_server(self._handle, '0.0.0.0', self.port, reuse_port=reuse_port)
+        return self
+
+    async def serve_forever(self):
+        await self.server.serve_forever()
+
+    async def close(self):
+        """Close this server and all client connections."""
+        if self.server is not None:
+            self.server.close()
+        for conn in list(self.connections):
+            conn.close()
+        if self.server is not None:
+            await self.server.wait_closed()
+
+    def register_object(self, obj, custom=None, var_name='', blocking=()):
+        """Accepts an object to be controlled by this remote method invocation host.
+        See RemoteServer.register_object.
+
+        blocking - names of methods that may block, eg, wait_ready, which run in a
+            worker thread so that they do not stall the event loop.
+        """
+        super(AsyncRemoteServer, self).register_object(obj, custom=custom, var_name=var_name)
+        self.blocking.update(f'{var_name}.{name}' for name in blocking)
+
+    async def _handle(self, reader, writer):
+        conn = _AsyncConnection(reader, writer, self.password)
+        self.connections.add(conn)
+        try:
+            while True:
+                obj = _decode_frame(await _read_frame(reader), conn.codec, self.password)
+                if isinstance(obj, Command):
+                    if obj.func_name in self.blocking:
+                        asyncio.ensure_future(self._execute_blocking(conn, obj))
+                    else:
+                        self._execute(conn, obj)
+                elif isinstance(obj, Message):
+                    with self.lock_messages:
+                        obj.sender = conn
+                        self.messages.append(obj)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.connections.discard(conn)
+            conn.close()
+
+    async def _execute_blocking(self, conn: _AsyncConnection, command: Command):
+        deferred = _DeferredReplies(conn)
+        await asyncio.get_running_loop().run_in_executor(None, self._execute, deferred, command)
+        for reply in deferred.replies:
+            conn.send(reply)
+
+
+class _AsyncRemoteCaller:
+    """The asyncio version of _RemoteCaller. The methods of the altered object return
+    awaitables, or block for the result if sync is True."""
+
+    def create_caller(obj, remote_client, custom=None, var_name='', sync=False):
+        """Alters the given object (obj) such it represents a Remote Object. See _RemoteCaller.create_caller."""
+        caller = _AsyncRemoteCaller(remote_client, var_name)
+
+        if custom is None:
+            custom = []
+
+        for name in dir(obj):
+            attr = getattr(obj, name)
+            if name in custom or (callable(attr) and not name.startswith('__')):
+                setattr(obj, name, caller._generate(name, sync))
+
+        obj.__remote__ = caller
+        return obj
+
+    def __init__(self, remote_client, var_name):
+        self.remote_client: AsyncRemoteClient = remote_client
+        self.var_name = var_name
+
+    def _generate(self, func_name, sync):
+        func_name = f'{self.var_name}.{func_name}'
+        client = self.remote_client
+
+        if not sync:
+            def func(*args, **kwargs):
+                return client.call(func_name, *args, **kwargs)
+            return func
+
+        async def call(args, kwargs):
+            return await client.call(func_name, *args, **kwargs)
+
+        def sync_func(*args, wait_for_data=60, **kwargs):
+            if client.loop.is_running() and client.in_loop_thread():
+                raise RuntimeError("Synchronous remote calls cannot be made from the client's event loop")
+            return asyncio.run_coroutine_threadsafe(call(args, kwargs), client.loop).result(wait_for_data)
+        return sync_func
+
+
+class AsyncRemoteClient:
+    """The asyncio version of RemoteClient.
+
+    client = await AsyncRemoteClient.connect(address, password)
+    brick = client.create_caller(dummy.Brick(), var_name='brick')
+    distance = await brick.get_sensor(brick.PORT_1)
+
+    Calls are sent as soon as they are made, so several can be in flight at once:
+    values = await asyncio.gather(brick.get_sensor(1), brick.get_sensor(2))
+
+    Synchronous code can use connect_threaded, which runs the event loop in a
+    background thread, and create_caller(..., sync=True) for blocking methods.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, password):
+        """Use connect or connect_threaded to create a client."""
+        self.reader = reader
+        self.writer = writer
+        self.password = DEFAULT_PASSWORD if password is None else password
+        self.codec: BinaryCodec = None
+        self.ids = itertools.count(1)
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.handlers = {}
+        self.messages = deque()
+        self.loop = asyncio.get_running_loop()
+        self._thread_id = threading.get_ident()
+        self.reader_task = self.loop.create_task(self._read_loop())
+
+    @classmethod
+    async def connect(cls, address, password, port=None, compact=True):
+        """Connect to a RemoteServer or AsyncRemoteServer. See RemoteClient for the arguments."""
+        reader, writer = await asyncio.open_connection(address, DEFAULT_PORT if port is None else port)
+        client = cls(reader, writer, password)
+        if compact:
+            await client.start_session()
+        return client
+
+    @classmethod
+    def connect_threaded(cls, address, password, port=None, compact=True):
+        """Start an event loop in a daemon thread and connect on it, for use from synchronous code."""
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(cls.connect(address, password, port, compact), loop).result()
+
+    async def start_session(self, timeout=5):
+        """Switch to the compact BinaryCodec. See RemoteClient.start_session."""
+        try:
+            await asyncio.wait_for(self.call('__session'), timeout)
+        except (RemoteException, asyncio.TimeoutError):
+            pass
+        return self.codec is not None
+
+    def in_loop_thread(self):
+        return threading.get_ident() == self._thread_id
+
+    def create_caller(self, obj, custom=None, var_name='', sync=False):
+        """Alters the given object (obj) such that it represents a Remote Object, whose methods
+        return awaitables. If sync is True, they block for the result instead, which needs the
+        event loop to run in another thread (see connect_threaded).
+        See RemoteClient.create_caller for the other arguments."""
+        return _AsyncRemoteCaller.create_caller(obj, self, custom=custom, var_name=var_name, sync=sync)
+
+    def register_handler(self, func_name, handler):
+        """See RemoteClient.register_handler. handler(command) runs on the event loop."""
+        self.handlers[func_name] = handler
+
+    def call(self, func, *args, **kwargs) -> asyncio.Future:
+        """Send a command to the host right away, and return an awaitable Future for its result.
+        Raises RemoteException if the call raised an exception on the host.
+        Must be called from the event loop.
+
+        func - the full method name, eg, 'brick.get_sensor'
+        """
+        c = Command(func, *args, **kwargs)
+        c.id = next(self.ids) & 0xFFFFFFFF
+        future = self.loop.create_future()
+        if self.writer.is_closing():
+            future.set_exception(ConnectionError("Connection closed"))
+            return future
+        self.pending[c.id] = future
+        self.writer.write(_encode_frame(c, self.codec, self.password))
+        return future
+
+    def send_message(self, text):
+        """Sends a string text message to the host"""
+        self.writer.write(_encode_frame(Message(text), self.codec, self.password))
+
+    async def close(self):
+        """Closes this connection to the host."""
+        self.writer.close()
+        try:
+            await self.reader_task
+        except asyncio.CancelledError:
+            pass
+
+    async def _read_loop(self):
+        try:
+            while True:
+                obj = _decode_frame(await _read_frame(self.reader), self.codec, self.password)
+                if isinstance(obj, Command):
+                    self._receive_command(obj)
+                elif isinstance(obj, Message):
+                    self.messages.append(obj)
+        except (asyncio.IncompleteReadError, ConnectionError, OSError):
+            pass
+        finally:
+            self.writer.close()
+            for future in self.pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Connection closed"))
+            self.pending.clear()
+
+    def _receive_command(self, command: Command):
+        if command.func_name == '__session' and not command._result_exception:
+            # Switch codecs here, before the next frame is read
+            self.codec = BinaryCodec(command.result)
+        handler = self.handlers.get(command.func_name, None)
+        if handler is not None:
+            handler(command)
+            return
+        future = self.pending.pop(command.id, None)
+        if future is None or future.done():
+            return
+        if command._result_exception:
+            future.set_exception(RemoteException(str(command.result)))
+        else:
+            future.set_result(command.result)